@@ -0,0 +1,47 @@
+import logging
+from fastapi import APIRouter, Depends
+
+from app.utils.catalog import catalog
+from app.utils.facet_index import facet_index
+from app.utils.password_hasher import password_hasher
+from app.utils.principal_cache import principal_cache
+from app.utils.rate_limiter import rate_limiter
+from app.utils.rbac import require_admin
+
+logger = logging.getLogger(__name__)
+ADMIN_CONTROLLER = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@ADMIN_CONTROLLER.get("/password-hashing")
+def get_password_hashing_stats():
+    """
+    Current password hashing configuration
+
+    - bcrypt cost chosen at startup and its measured hash latency
+    - Process pool size and queue depth
+    """
+    return password_hasher.stats()
+
+
+@ADMIN_CONTROLLER.get("/principal-cache")
+def get_principal_cache_stats():
+    """Size and hit/miss counters of the authenticated principal cache"""
+    return principal_cache.stats()
+
+
+@ADMIN_CONTROLLER.get("/rate-limiter")
+def get_rate_limiter_stats():
+    """Tracked keys, LRU evictions and timer-wheel expirations of the rate limiter"""
+    return rate_limiter.stats()
+
+
+@ADMIN_CONTROLLER.get("/restaurant-catalog")
+def get_restaurant_catalog_stats():
+    """
+    In-memory restaurant catalog of this worker
+
+    - Rows, snapshot generation and time since the last rebuild
+    - Memory footprint, also scaled per 100k restaurants
+    - Facet cache counters
+    """
+    return {**catalog.stats(), "facets": facet_index.stats()}
@@ -1,23 +1,40 @@
 import os
 import logging
 from datetime import datetime, timezone, timedelta
+from typing import Optional
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 
 from app.utils.jwt_utils import (
     create_access_token,
-    create_refresh_token,
-    verify_token,
+    issue_refresh_token,
     verify_and_get_refresh_token,
     revoke_refresh_token,
     revoke_all_user_tokens,
+    rotate_refresh_token,
 )
-from app.utils.email_service import email_service
-from app.utils.rate_limiter import rate_limit_auth_endpoints, rate_limit_strict
-from app.db import get_db
+from app.utils.email_service import (
+    PASSWORD_RESET_TEMPLATE,
+    VERIFY_EMAIL_TEMPLATE,
+    email_service,
+)
+from app.utils.email_worker import enqueue_email
+from app.utils.password_hasher import password_hasher
+from app.utils.principal_cache import Principal, principal_cache
+from app.utils.token_versions import bump_token_version, token_versions
+from app.utils.rbac import get_current_user
+from app.utils.rate_limiter import get_client_ip
+from app.utils.login_attempts import (
+    ACCOUNT_LOCK_MINUTES,
+    MAX_FAILED_ATTEMPTS_PER_ACCOUNT,
+    MAX_FAILED_ATTEMPTS_PER_IP,
+    account_key,
+    ip_key,
+    login_attempts,
+)
+from app.db import SessionRunner, get_db_runner, session_runner
 from app.models.user import User
 from app.models.password_reset_token import PasswordResetToken
 from app.schemas.user_schema import (
@@ -34,37 +51,53 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 AUTH_CONTROLLER = APIRouter(prefix="/authentication")
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="authentication/login")
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt_context.verify(plain_password, hashed_password)
+# DB work is written once against a sync Session and awaited through a
+# SessionRunner, which runs it in the threadpool or, with DB_ASYNC=true,
+# on the asyncio engine. Helpers return plain values, not ORM objects.
 
 
-def get_password_hash(password: str) -> str:
-    return bcrypt_context.hash(password)
+def _store_rehashed_password(user_id: int, old_hash: str, new_hash: str, db: Session) -> None:
+    try:
+        # Only replace the hash we verified against, so a concurrent password reset wins
+        updated = (
+            db.query(User)
+            .filter(User.id == user_id, User.user_password == old_hash)
+            .update({"user_password": new_hash}, synchronize_session=False)
+        )
+        db.commit()
+        if updated:
+            logger.info(f"Rehashed password for user {user_id} at the current bcrypt cost")
+    except Exception as e:
+        logger.error(f"Error rehashing password for user {user_id}: {str(e)}")
+        db.rollback()
 
 
-@AUTH_CONTROLLER.post("/register", dependencies=[Depends(rate_limit_auth_endpoints)])
-def register(user: UserRegister, db: Session = Depends(get_db)):
+async def rehash_password(user_id: int, old_hash: str, plain_password: str) -> None:
     """
-    Register a new user with email verification
+    Background task: upgrade a stored hash to the current bcrypt cost
 
-    - Validates password strength (8 chars, uppercase, lowercase, number)
-    - Sends verification email
-    - User must verify email before login
+    Runs after a successful login, so stored hashes converge on the
+    calibrated cost without a mass migration.
     """
-    existing_user = db.query(User).filter(User.user_email == user.user_email).first()
-    if existing_user:
-        logger.warning(f"User with email {user.user_email} already exists.")
-        raise HTTPException(status_code=400, detail="Email already registered")
+    try:
+        new_hash = await password_hasher.hash(plain_password)
+    except HTTPException:
+        logger.info(f"Password hashing pool busy, skipping rehash for user {user_id}")
+        return
+    async with session_runner() as db:
+        await db.run(_store_rehashed_password, user_id, old_hash, new_hash)
 
-    hashed_password = get_password_hash(user.user_password)
 
+def _email_registered(user_email: str, db: Session) -> bool:
+    return db.query(User.id).filter(User.user_email == user_email).first() is not None
+
+
+def _create_user(user: UserRegister, hashed_password: str, db: Session) -> None:
     # Generate email verification token
     verification_token = email_service.generate_verification_token()
 
@@ -76,12 +109,10 @@ def register(user: UserRegister, db: Session = Depends(get_db)):
         phone_number=user.phone_number,
         role=user.role,
         email_verified=True,  # SET TO TRUE FOR EASIER TESTING - CHANGE TO FALSE IN PRODUCTION
-        failed_login_attempts=0,
         registered_at=datetime.now(timezone.utc),
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()
 
     # Store verification token in password_reset_tokens table (reuse for email verification)
     # We'll use a separate field to distinguish verification vs password reset
@@ -92,17 +123,33 @@ def register(user: UserRegister, db: Session = Depends(get_db)):
         is_used=False,
     )
     db.add(verification_db_token)
+
+    # Queue the verification email; user, token and email commit together
+    enqueue_email(
+        db,
+        user.user_email,
+        VERIFY_EMAIL_TEMPLATE,
+        {"verification_token": verification_token},
+    )
     db.commit()
 
-    # Send verification email
-    try:
-        email_service.send_verification_email(new_user.user_email, verification_token)
-        logger.info(f"Verification email sent to {user.user_email}")
-    except Exception as e:
-        logger.error(
-            f"Failed to send verification email to {user.user_email}: {str(e)}"
-        )
-        # Don't fail registration if email fails to send
+
+@AUTH_CONTROLLER.post("/register")
+async def register(user: UserRegister, db: SessionRunner = Depends(get_db_runner)):
+    """
+    Register a new user with email verification
+
+    - Validates password strength (8 chars, uppercase, lowercase, number)
+    - Queues verification email (sent by the email outbox worker)
+    - User must verify email before login
+    """
+    # bcrypt goes to the process pool, so the event loop waits on neither it nor the DB
+    if await db.run(_email_registered, user.user_email):
+        logger.warning(f"User with email {user.user_email} already exists.")
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    hashed_password = await password_hasher.hash(user.user_password)
+    await db.run(_create_user, user, hashed_password)
 
     logger.info(
         f"User {user.user_email} registered successfully. Email verification disabled for testing."
@@ -113,22 +160,81 @@ def register(user: UserRegister, db: Session = Depends(get_db)):
     }
 
 
-@AUTH_CONTROLLER.post(
-    "/login",
-    response_model=TokenResponse,
-    dependencies=[Depends(rate_limit_auth_endpoints)],
-)
-def login(user: UserLogin, db: Session = Depends(get_db)):
+def _get_login_user(user_email: str, db: Session):
+    """(id, user_email, user_password, token_version, locked_until) of the user, or None"""
+    return db.query(
+        User.id, User.user_email, User.user_password, User.token_version, User.locked_until
+    ).filter(User.user_email == user_email).first()
+
+
+def _record_failed_login(client_ip: str, user_email: Optional[str] = None) -> int:
+    """Count a failure for the IP and, if given, the account; returns the account's count"""
+    login_attempts.increment(ip_key(client_ip))
+    if user_email is None:
+        return 0
+    return login_attempts.increment(account_key(user_email))
+
+
+def _lock_account(user_id: int, db: Session) -> None:
+    db.query(User).filter(User.id == user_id).update(
+        {"locked_until": datetime.now(timezone.utc) + timedelta(minutes=ACCOUNT_LOCK_MINUTES)},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def _complete_login(user_id: int, clear_lock: bool, db: Session) -> str:
+    """Clear an expired lock and issue a refresh token in a single commit"""
+    # Only write when there is something to clear. The WHERE clause keeps the
+    # UPDATE a no-op if another request already cleared it.
+    if clear_lock:
+        db.query(User).filter(User.id == user_id, User.locked_until.isnot(None)).update(
+            {"locked_until": None}, synchronize_session=False
+        )
+
+    try:
+        refresh_token = issue_refresh_token(user_id, db)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error creating refresh token for user {user_id}: {str(e)}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Error creating refresh token")
+    return refresh_token
+
+
+@AUTH_CONTROLLER.post("/login", response_model=TokenResponse)
+async def login(
+    user: UserLogin,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: SessionRunner = Depends(get_db_runner),
+):
     """
     Login endpoint with security features:
     - Email verification check
-    - Brute force protection (account lockout after 5 failed attempts)
+    - Brute force protection (account lockout after 5 failed attempts,
+      per-IP failure limit)
     - Rate limiting
+    - Transparent rehash when the stored hash uses an outdated bcrypt cost
+
+    Failed attempts are counted in the login attempt store, not the users
+    table; the user row is only written when an account gets locked.
     """
-    db_user = db.query(User).filter(User.user_email == user.user_email).first()
+    # Attempt store calls block, so they run in the threadpool; bcrypt runs
+    # in the process pool, and the event loop never waits on either
+    client_ip = get_client_ip(request)
+    if await run_in_threadpool(login_attempts.get, ip_key(client_ip)) >= MAX_FAILED_ATTEMPTS_PER_IP:
+        logger.warning(f"Too many failed logins from IP {client_ip}.")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed login attempts. Please try again later.",
+        )
+
+    db_user = await db.run(_get_login_user, user.user_email)
 
     # Check if user exists
     if not db_user:
+        await run_in_threadpool(_record_failed_login, client_ip)
         logger.warning(f"Login attempt for non-existent user '{user.user_email}'.")
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
@@ -145,21 +251,20 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
                 detail=f"Account is temporarily locked due to multiple failed login attempts. "
                 f"Please try again in {remaining_time} minutes.",
             )
-        else:
-            # Lock period expired, reset the counter
-            db_user.failed_login_attempts = 0
-            db_user.locked_until = None
-            db.commit()
+
+    user_id, user_email = db_user.id, db_user.user_email
+    token_version = db_user.token_version
+    clear_lock = db_user.locked_until is not None
 
     # Verify password
-    if not verify_password(user.user_password, db_user.user_password):
-        # Increment failed login attempts
-        db_user.failed_login_attempts += 1
+    stored_hash = db_user.user_password
+    if not await password_hasher.verify(user.user_password, stored_hash):
+        failed_attempts = await run_in_threadpool(_record_failed_login, client_ip, user_email)
 
         # Lock account after 5 failed attempts
-        if db_user.failed_login_attempts >= 5:
-            db_user.locked_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-            db.commit()
+        if failed_attempts >= MAX_FAILED_ATTEMPTS_PER_ACCOUNT:
+            await db.run(_lock_account, user_id)
+            await run_in_threadpool(login_attempts.reset, account_key(user_email))
             logger.warning(
                 f"Account '{user.user_email}' locked after 5 failed login attempts."
             )
@@ -168,9 +273,8 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
                 detail="Account locked due to multiple failed login attempts. Please try again in 15 minutes.",
             )
 
-        db.commit()
         logger.warning(
-            f"Login failed for user '{user.user_email}'. Failed attempts: {db_user.failed_login_attempts}"
+            f"Login failed for user '{user.user_email}'. Failed attempts: {failed_attempts}"
         )
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
@@ -183,13 +287,17 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
     #         detail="Email not verified. Please check your email for verification link.",
     #     )
 
-    # Reset failed login attempts on successful login
-    db_user.failed_login_attempts = 0
-    db_user.locked_until = None
-    db.commit()
+    await run_in_threadpool(login_attempts.reset, account_key(user_email))
+
+    # Lock reset and token issuance share a single commit
+    refresh_token = await db.run(_complete_login, user_id, clear_lock)
 
-    access_token = create_access_token(data={"sub": db_user.user_email})
-    refresh_token = create_refresh_token(user_id=db_user.id, db=db)
+    access_token = create_access_token(data={"sub": user_email, "ver": token_version})
+
+    if password_hasher.needs_update(stored_hash):
+        background_tasks.add_task(
+            rehash_password, user_id, stored_hash, user.user_password
+        )
 
     logger.info(f"User '{user.user_email}' logged in successfully.")
     return {
@@ -200,39 +308,25 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
 
 
 @AUTH_CONTROLLER.post("/refresh", response_model=TokenResponse)
-def refresh_token(refresh_request: TokenRefreshRequest, db: Session = Depends(get_db)):
-    try:
-        # Start transaction to prevent race conditions
-        db_token = verify_and_get_refresh_token(refresh_request.refresh_token, db)
-        user = db_token.user
-
-        # Revoke the used token first
-        revoke_refresh_token(refresh_request.refresh_token, db)
-
-        # Create new tokens
-        access_token = create_access_token(data={"sub": user.user_email})
-        new_refresh_token = create_refresh_token(user_id=user.id, db=db)
-
-        logger.info(f"Tokens refreshed for user '{user.user_email}'.")
-        return {
-            "access_token": access_token,
-            "refresh_token": new_refresh_token,
-            "token_type": "bearer",
-        }
+async def refresh_token(
+    refresh_request: TokenRefreshRequest, db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Exchange a refresh token for a new token pair
 
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error during token refresh: {str(e)}")
-        raise
+    Verify, revoke and reissue happen in one transaction, so a token can
+    only be redeemed once even under concurrent requests.
+    """
+    return await db.run(rotate_refresh_token, refresh_request.refresh_token)
 
 
 @AUTH_CONTROLLER.post("/logout", response_model=LogoutResponse)
-def logout(refresh_request: TokenRefreshRequest, db: Session = Depends(get_db)):
+async def logout(refresh_request: TokenRefreshRequest, db: SessionRunner = Depends(get_db_runner)):
     """
     Logout endpoint that revokes the provided refresh token
     """
     try:
-        revoke_refresh_token(refresh_request.refresh_token, db)
+        await db.run(revoke_refresh_token, refresh_request.refresh_token)
         logger.info("User logged out successfully")
     except Exception as e:
         logger.warning(f"Logout attempt with potentially invalid token: {str(e)}")
@@ -240,17 +334,32 @@ def logout(refresh_request: TokenRefreshRequest, db: Session = Depends(get_db)):
     return {"message": "Successfully logged out"}
 
 
+def _logout_all(token: str, db: Session) -> tuple:
+    """Revoke every token of the token's user; returns (user id, email, token version, revoked count)"""
+    db_token = verify_and_get_refresh_token(token, db)
+    user_id = db_token.user_id
+    user_email = db_token.user.user_email
+
+    # Revoke issued access tokens too; revoke_all_user_tokens commits the bump
+    token_version = bump_token_version(db_token.user)
+    revoked_count = revoke_all_user_tokens(user_id, db)
+    return user_id, user_email, token_version, revoked_count
+
+
 @AUTH_CONTROLLER.post("/logout-all", response_model=LogoutResponse)
-def logout_all(refresh_request: TokenRefreshRequest, db: Session = Depends(get_db)):
+async def logout_all(
+    refresh_request: TokenRefreshRequest, db: SessionRunner = Depends(get_db_runner)
+):
     """
     Logout endpoint that revokes all refresh tokens for the user
     Always returns success, even if tokens are already invalid
     """
     try:
-        db_token = verify_and_get_refresh_token(refresh_request.refresh_token, db)
-        user_id = db_token.user_id
-
-        revoked_count = revoke_all_user_tokens(user_id, db)
+        user_id, user_email, token_version, revoked_count = await db.run(
+            _logout_all, refresh_request.refresh_token
+        )
+        token_versions.observe(user_email, token_version)
+        principal_cache.invalidate(user_email)
         logger.info(
             f"User {user_id} logged out from all devices successfully, revoked {revoked_count} tokens"
         )
@@ -261,31 +370,16 @@ def logout_all(refresh_request: TokenRefreshRequest, db: Session = Depends(get_d
 
 
 @AUTH_CONTROLLER.get("/me", response_model=UserProfile)
-def get_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = verify_token(token)
-    user_email = payload.get("sub")
-    user = db.query(User).filter(User.user_email == user_email).first()
-    if not user:
-        raise HTTPException(
-            status_code=401, detail="Invalid authentication credentials"
-        )
-    return user
+def get_me(current_user: Principal = Depends(get_current_user)):
+    return current_user
 
 
-@AUTH_CONTROLLER.post("/verify-email")
-def verify_email(verification: EmailVerificationRequest, db: Session = Depends(get_db)):
-    """
-    Verify user email with token sent via email
-
-    - Single-use token
-    - 24-hour expiration
-    """
+def _verify_email(token: str, db: Session) -> str:
+    """Mark the token's user as verified and use up the token; returns the email"""
     # Find the verification token
     db_token = (
         db.query(PasswordResetToken)
-        .filter(
-            PasswordResetToken.token == verification.token, ~PasswordResetToken.is_used
-        )
+        .filter(PasswordResetToken.token == token, ~PasswordResetToken.is_used)
         .first()
     )
 
@@ -313,25 +407,33 @@ def verify_email(verification: EmailVerificationRequest, db: Session = Depends(g
     user.email_verified = True
     db_token.is_used = True
     db_token.used_at = datetime.now(timezone.utc)
+    user_email = user.user_email
     db.commit()
+    return user_email
 
-    logger.info(f"Email verified for user {user.user_email}")
+
+@AUTH_CONTROLLER.post("/verify-email")
+async def verify_email(
+    verification: EmailVerificationRequest, db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Verify user email with token sent via email
+
+    - Single-use token
+    - 24-hour expiration
+    """
+    user_email = await db.run(_verify_email, verification.token)
+
+    logger.info(f"Email verified for user {user_email}")
     return {
         "message": "Email verified successfully. You can now log in.",
-        "email": user.user_email,
+        "email": user_email,
     }
 
 
-@AUTH_CONTROLLER.post("/forgot-password", dependencies=[Depends(rate_limit_strict)])
-def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
-    """
-    Request password reset email
-
-    - Rate limited to 3 requests per minute
-    - Generates secure reset token (1-hour expiration)
-    - Always returns success to prevent email enumeration
-    """
-    user = db.query(User).filter(User.user_email == request.user_email).first()
+def _queue_password_reset(user_email: str, db: Session) -> bool:
+    """Store a reset token and queue its email if the user exists"""
+    user = db.query(User).filter(User.user_email == user_email).first()
 
     if user:
         # Generate password reset token
@@ -345,16 +447,28 @@ def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db
             is_used=False,
         )
         db.add(reset_db_token)
+
+        # Queue the password reset email in the same transaction as the token
+        enqueue_email(
+            db, user.user_email, PASSWORD_RESET_TEMPLATE, {"reset_token": reset_token}
+        )
         db.commit()
+    return user is not None
 
-        # Send password reset email
-        try:
-            email_service.send_password_reset_email(user.user_email, reset_token)
-            logger.info(f"Password reset email sent to {user.user_email}")
-        except Exception as e:
-            logger.error(
-                f"Failed to send password reset email to {user.user_email}: {str(e)}"
-            )
+
+@AUTH_CONTROLLER.post("/forgot-password")
+async def forgot_password(
+    request: ForgotPasswordRequest, db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Request password reset email
+
+    - Rate limited to 3 requests per minute
+    - Generates secure reset token (1-hour expiration)
+    - Always returns success to prevent email enumeration
+    """
+    if await db.run(_queue_password_reset, request.user_email):
+        logger.info(f"Password reset email queued for {request.user_email}")
 
     # Always return success to prevent email enumeration
     return {
@@ -362,21 +476,11 @@ def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db
     }
 
 
-@AUTH_CONTROLLER.post(
-    "/reset-password", dependencies=[Depends(rate_limit_auth_endpoints)]
-)
-def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
-    """
-    Reset password with token from email
-
-    - Single-use token
-    - 1-hour expiration
-    - Validates new password strength
-    """
-    # Find the reset token
+def _get_reset_token(token: str, db: Session) -> PasswordResetToken:
+    """Unused, unexpired password reset token, or 400"""
     db_token = (
         db.query(PasswordResetToken)
-        .filter(PasswordResetToken.token == request.token, ~PasswordResetToken.is_used)
+        .filter(PasswordResetToken.token == token, ~PasswordResetToken.is_used)
         .first()
     )
 
@@ -393,6 +497,13 @@ def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db))
             status_code=400,
             detail="Password reset token has expired. Please request a new one.",
         )
+    return db_token
+
+
+def _apply_password_reset(token: str, new_hash: str, db: Session) -> tuple:
+    """Store the new hash, use up the token and revoke all tokens; returns (email, token version)"""
+    # Checked again: the token may have been used while the new password was hashed
+    db_token = _get_reset_token(token, db)
 
     # Get the user
     user = db.query(User).filter(User.id == db_token.user_id).first()
@@ -401,20 +512,43 @@ def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db))
         raise HTTPException(status_code=404, detail="User not found")
 
     # Update password
-    user.user_password = get_password_hash(request.new_password)
-    user.failed_login_attempts = 0  # Reset failed attempts
+    user.user_password = new_hash
     user.locked_until = None  # Unlock account if it was locked
 
     # Mark token as used
     db_token.is_used = True
     db_token.used_at = datetime.now(timezone.utc)
 
-    # Revoke all existing refresh tokens for security
+    # Revoke all existing refresh and access tokens for security
+    token_version = bump_token_version(user)
+    user_email = user.user_email
     revoke_all_user_tokens(user.id, db)
 
     db.commit()
+    return user_email, token_version
+
+
+@AUTH_CONTROLLER.post("/reset-password")
+async def reset_password(
+    request: ResetPasswordRequest, db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Reset password with token from email
+
+    - Single-use token
+    - 1-hour expiration
+    - Validates new password strength
+    """
+    # Rejects a bad token before spending a hash on it
+    await db.run(_get_reset_token, request.token)
+
+    new_hash = await password_hasher.hash(request.new_password)
+    user_email, token_version = await db.run(_apply_password_reset, request.token, new_hash)
+    await run_in_threadpool(login_attempts.reset, account_key(user_email))
+    token_versions.observe(user_email, token_version)
+    principal_cache.invalidate(user_email)
 
-    logger.info(f"Password reset successfully for user {user.user_email}")
+    logger.info(f"Password reset successfully for user {user_email}")
     return {
         "message": "Password reset successfully. You can now log in with your new password."
     }
@@ -0,0 +1,391 @@
+import base64
+import json
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models.restaurant import Restaurant
+from app.schemas.restaurant_schema import (
+    AvailabilitySlot,
+    FacetValue,
+    AutocompleteResponse,
+    AutocompleteSuggestion,
+    MapCluster,
+    MapTileResponse,
+    NearbyRestaurant,
+    NearbyRestaurantsResponse,
+    RestaurantAvailabilityResponse,
+    RestaurantMatch,
+    RestaurantBrowseResponse,
+    RestaurantFacetsResponse,
+    RestaurantMatchesResponse,
+    RestaurantSearchResponse,
+    RestaurantsInBoundsResponse,
+    RestaurantSort,
+    RestaurantSummary,
+)
+from app.utils.autocomplete_index import AUTOCOMPLETE_TOP_K, autocomplete_index
+from app.utils.availability import restaurant_availability
+from app.utils.catalog import catalog
+from app.utils.cluster_index import cluster_index
+from app.utils.facet_index import facet_index
+from app.utils.geo_index import geo_index
+from app.utils.text_index import text_index
+
+logger = logging.getLogger(__name__)
+RESTAURANT_CONTROLLER = APIRouter(prefix="/restaurants")
+
+
+def _encode_cursor(sort: RestaurantSort, restaurant: Restaurant) -> str:
+    value = restaurant.rating if sort == RestaurantSort.RATING else restaurant.name
+    raw = json.dumps([sort.value, value, restaurant.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: RestaurantSort) -> tuple:
+    """Return the (sort value, id) of the last row of the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+        valid = cursor_sort == sort.value and isinstance(last_id, int) and (
+            isinstance(value, str)
+            if sort == RestaurantSort.NAME
+            else value is None or isinstance(value, (int, float))
+        )
+    except (ValueError, TypeError):
+        valid = False
+
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+
+def _after_cursor(sort: RestaurantSort, value, last_id: int) -> list:
+    """
+    (WHERE clause, ORDER BY) segments holding the rows after the cursor, in order
+
+    Rows tied with the cursor's sort value come first, then the rows past
+    it. Each segment is a single seek into the composite index; a combined
+    "key >= value AND (key > value OR id > last_id)" only seeks to the
+    value and then walks every row tied with it, which grows with page
+    depth when values repeat (e.g. ratings).
+
+    Rating order is rating DESC, id DESC. MySQL and SQLite both sort NULL
+    lowest, so unrated restaurants come last, in a segment of their own.
+    """
+    if sort == RestaurantSort.NAME:
+        return [
+            (and_(Restaurant.name == value, Restaurant.id > last_id), (Restaurant.id,)),
+            (Restaurant.name > value, (Restaurant.name, Restaurant.id)),
+        ]
+
+    by_id = (Restaurant.id.desc(),)
+    if value is None:
+        return [(and_(Restaurant.rating.is_(None), Restaurant.id < last_id), by_id)]
+    return [
+        (and_(Restaurant.rating == value, Restaurant.id < last_id), by_id),
+        (Restaurant.rating < value, (Restaurant.rating.desc(), Restaurant.id.desc())),
+        (Restaurant.rating.is_(None), by_id),
+    ]
+
+
+@RESTAURANT_CONTROLLER.get("", response_model=RestaurantSearchResponse)
+def search_restaurants(
+    city: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    price_range: Optional[int] = Query(None, ge=1, le=4),
+    is_active: Optional[bool] = True,
+    sort: RestaurantSort = RestaurantSort.RATING,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Search restaurants with keyset pagination
+
+    - Filters by city, cuisine, price_range and is_active (default: active only)
+    - Sorts by rating (best first, unrated last) or name
+    - Pass next_cursor back as cursor for the next page; cost does not
+      grow with page depth as with OFFSET
+    """
+    query = select(Restaurant)
+    if is_active is not None:
+        query = query.where(Restaurant.is_active == is_active)
+    if city is not None:
+        query = query.where(Restaurant.city == city)
+    if cuisine is not None:
+        query = query.where(Restaurant.cuisine == cuisine)
+    if price_range is not None:
+        query = query.where(Restaurant.price_range == price_range)
+
+    if sort == RestaurantSort.NAME:
+        order_by = (Restaurant.name, Restaurant.id)
+    else:
+        order_by = (Restaurant.rating.desc(), Restaurant.id.desc())
+
+    if cursor is not None:
+        value, last_id = _decode_cursor(cursor, sort)
+        segments = [
+            query.where(where).order_by(*segment_order)
+            for where, segment_order in _after_cursor(sort, value, last_id)
+        ]
+    else:
+        segments = [query.order_by(*order_by)]
+
+    # One extra row tells whether there is a next page
+    restaurants = []
+    for segment in segments:
+        restaurants += db.scalars(segment.limit(limit + 1 - len(restaurants)))
+        if len(restaurants) > limit:
+            break
+
+    next_cursor = None
+    if len(restaurants) > limit:
+        restaurants = restaurants[:limit]
+        next_cursor = _encode_cursor(sort, restaurants[-1])
+
+    return RestaurantSearchResponse(
+        items=[RestaurantSummary.model_validate(r) for r in restaurants],
+        next_cursor=next_cursor,
+    )
+
+
+def _load_in_order(db: Session, ids: List[int]) -> List[Restaurant]:
+    """Fetch restaurants by primary key, keeping the order of ids"""
+    if not ids:
+        return []
+    by_id: Dict[int, Restaurant] = {
+        r.id: r for r in db.scalars(select(Restaurant).where(Restaurant.id.in_(ids)))
+    }
+    # An index may briefly list a restaurant deleted by another worker
+    return [by_id[i] for i in ids if i in by_id]
+
+
+@RESTAURANT_CONTROLLER.get("/browse", response_model=RestaurantBrowseResponse)
+def browse_restaurants(
+    city: Optional[List[str]] = Query(None),
+    cuisine: Optional[List[str]] = Query(None),
+    price_range: Optional[List[int]] = Query(None),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    sort: RestaurantSort = RestaurantSort.RATING,
+    offset: int = Query(0, ge=0, le=10_000),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Browse active restaurants from the in-memory catalog
+
+    - Repeat city, cuisine or price_range to select several values
+    - sort=rating orders like GET /restaurants. sort=name ignores case and
+      accents ("beta" and "Épice" before "Gamma"), which the database
+      collation behind GET /restaurants may not
+    - total counts every match
+    - No database query; changes from other workers show up within
+      RESTAURANT_INDEX_POLL_SECONDS
+    """
+    if price_range and not all(1 <= p <= 4 for p in price_range):
+        raise HTTPException(status_code=400, detail="price_range must be between 1 and 4")
+
+    snapshot = catalog.snapshot
+    mask = snapshot.mask(city=city, cuisine=cuisine, price_range=price_range, min_rating=min_rating)
+    rows = snapshot.sorted_rows(mask, sort == RestaurantSort.NAME, offset, limit)
+    return RestaurantBrowseResponse(
+        items=[RestaurantSummary(**record) for record in snapshot.records(rows)],
+        total=int(mask.sum()),
+    )
+
+
+@RESTAURANT_CONTROLLER.get("/facets", response_model=RestaurantFacetsResponse)
+def get_restaurant_facets(
+    cuisine: Optional[List[str]] = Query(None),
+    price_range: Optional[List[int]] = Query(None),
+    city: Optional[List[str]] = Query(None),
+):
+    """
+    Counts for every filter option of the active restaurants
+
+    - Repeat a parameter to select several options (?cuisine=Italian&cuisine=Thai)
+    - Computed from the in-memory catalog and cached per selection; no database query
+    """
+    if price_range and not all(1 <= p <= 4 for p in price_range):
+        raise HTTPException(status_code=400, detail="price_range must be between 1 and 4")
+
+    total, counts = facet_index.counts(cuisine=cuisine, price_range=price_range, city=city)
+    return RestaurantFacetsResponse(
+        total=total,
+        **{
+            facet: [FacetValue(value=value, count=count) for value, count in values]
+            for facet, values in counts.items()
+        },
+    )
+
+
+@RESTAURANT_CONTROLLER.get("/search", response_model=RestaurantMatchesResponse)
+def full_text_search_restaurants(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text search over active restaurants' name, cuisine and description
+
+    - Ranked by relevance, name matches first
+    - Tolerates typos ("pizzeira") and missing diacritics ("kaviaren")
+    """
+    matches = text_index.search(q, limit)
+    scores = dict(matches)
+    return RestaurantMatchesResponse(
+        items=[
+            RestaurantMatch(
+                **RestaurantSummary.model_validate(r).model_dump(),
+                score=round(scores[r.id], 4),
+            )
+            for r in _load_in_order(db, [restaurant_id for restaurant_id, _ in matches])
+        ]
+    )
+
+
+@RESTAURANT_CONTROLLER.get("/autocomplete", response_model=AutocompleteResponse)
+def autocomplete_restaurants(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(AUTOCOMPLETE_TOP_K, ge=1, le=AUTOCOMPLETE_TOP_K),
+):
+    """
+    City and restaurant name suggestions for a typed prefix, most popular first
+
+    - Matches the start of any word: "napo" suggests "Pizzeria Napoli"
+    - Served from memory; no database query
+    """
+    return AutocompleteResponse(
+        items=[
+            AutocompleteSuggestion(**suggestion._asdict())
+            for suggestion in autocomplete_index.suggest(q, limit)
+        ]
+    )
+
+
+def _nearby_response(db: Session, ids, distances) -> NearbyRestaurantsResponse:
+    distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+    return NearbyRestaurantsResponse(
+        items=[
+            NearbyRestaurant(
+                **RestaurantSummary.model_validate(r).model_dump(),
+                distance_m=round(distance_by_id[r.id], 1),
+            )
+            for r in _load_in_order(db, ids.tolist())
+        ]
+    )
+
+
+@RESTAURANT_CONTROLLER.get("/nearby", response_model=NearbyRestaurantsResponse)
+def get_restaurants_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(2000, gt=0, le=200_000),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Active restaurants within radius_m of a point, nearest first"""
+    ids, distances = geo_index.radius(lat, lon, radius_m, limit)
+    return _nearby_response(db, ids, distances)
+
+
+@RESTAURANT_CONTROLLER.get("/nearest", response_model=NearbyRestaurantsResponse)
+def get_nearest_restaurants(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """The k active restaurants nearest to a point"""
+    ids, distances = geo_index.nearest(lat, lon, k)
+    return _nearby_response(db, ids, distances)
+
+
+@RESTAURANT_CONTROLLER.get("/in-bounds", response_model=RestaurantsInBoundsResponse)
+def get_restaurants_in_bounds(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(200, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """
+    Active restaurants inside a map viewport
+
+    - min_lon > max_lon means the viewport crosses the antimeridian
+    - truncated is set when more than limit restaurants are inside
+    """
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+
+    ids = geo_index.bbox(min_lat, min_lon, max_lat, max_lon, limit + 1)
+    return RestaurantsInBoundsResponse(
+        items=[
+            RestaurantSummary.model_validate(r)
+            for r in _load_in_order(db, ids[:limit].tolist())
+        ],
+        truncated=len(ids) > limit,
+    )
+
+
+@RESTAURANT_CONTROLLER.get("/clusters/{zoom}/{x}/{y}", response_model=MapTileResponse)
+def get_restaurant_clusters(zoom: int, x: int, y: int):
+    """
+    Pre-clustered restaurant markers of one XYZ map tile
+
+    - At most 64 markers per tile, however many restaurants it covers
+    - Served from memory; no database query
+    """
+    if not 0 <= zoom <= 22:
+        raise HTTPException(status_code=400, detail="zoom must be between 0 and 22")
+    if not (0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+        raise HTTPException(status_code=400, detail="Tile is outside the map")
+
+    return MapTileResponse(
+        zoom=zoom,
+        x=x,
+        y=y,
+        clusters=[
+            MapCluster(latitude=lat, longitude=lon, count=count, restaurant_id=restaurant_id)
+            for lat, lon, count, restaurant_id in cluster_index.tile(zoom, x, y)
+        ],
+    )
+
+
+@RESTAURANT_CONTROLLER.get("/{restaurant_id}/availability", response_model=RestaurantAvailabilityResponse)
+def get_restaurant_availability(
+    restaurant_id: int,
+    day: date = Query(..., alias="date"),
+    party_size: int = Query(2, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """
+    Reservation start times of one day and whether party_size guests can book them
+
+    - Computed from the restaurant's capacity for that weekday and the day's
+      reservations that still hold seats (not cancelled or no-show)
+    - open is False and slots empty on weekdays without a capacity
+    """
+    if day < date.today():
+        raise HTTPException(status_code=400, detail="date must not be in the past")
+
+    restaurant = db.get(Restaurant, restaurant_id)
+    if restaurant is None or not restaurant.is_active:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+
+    slots = restaurant_availability(db, restaurant_id, day, party_size)
+    return RestaurantAvailabilityResponse(
+        restaurant_id=restaurant_id,
+        date=day,
+        party_size=party_size,
+        open=slots is not None,
+        slots=[
+            AvailabilitySlot(time=start, available=available, free_covers=free)
+            for start, available, free in slots or []
+        ],
+    )
@@ -1,3 +1,23 @@
-from .database import engine, SessionLocal, Base, get_db
+from .database import (
+    engine,
+    SessionLocal,
+    async_engine,
+    AsyncSessionLocal,
+    Base,
+    SessionRunner,
+    get_db,
+    get_db_runner,
+    session_runner,
+)
 
-__all__ = ["engine", "SessionLocal", "Base", "get_db"]
+__all__ = [
+    "engine",
+    "SessionLocal",
+    "async_engine",
+    "AsyncSessionLocal",
+    "Base",
+    "SessionRunner",
+    "get_db",
+    "get_db_runner",
+    "session_runner",
+]
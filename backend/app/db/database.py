@@ -1,6 +1,9 @@
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, TypeVar
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,9 +12,43 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL not set in .env")
 
+# DB_ASYNC=true runs the auth endpoints' queries on an asyncio engine instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart"""
+    if url.startswith("mysql+pymysql://"):
+        return "mysql+aiomysql://" + url[len("mysql+pymysql://"):]
+    if url.startswith("mysql://"):
+        return "mysql+aiomysql://" + url[len("mysql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    # Imported lazily: the asyncio extension needs greenlet, which sync-only setups may lack
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    engine_options = {"pool_pre_ping": True}
+    if not ASYNC_DATABASE_URL.startswith("sqlite"):
+        engine_options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options)
+    # expire_on_commit=False: attributes stay readable after commit without lazy IO
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
 
 class Base(DeclarativeBase):
     pass
@@ -23,3 +60,50 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+T = TypeVar("T")
+
+
+class SessionRunner:
+    """
+    Runs DB code written against a sync Session without blocking the event loop
+
+    Wraps a Session, whose work goes to the threadpool, or with DB_ASYNC=true
+    an AsyncSession, whose run_sync() executes it in a greenlet with every
+    query awaited on the asyncio driver. The DB code itself is written once,
+    as plain functions taking the session as their db argument.
+
+    Functions should return plain values rather than ORM objects: with an
+    AsyncSession, attributes that need a lazy load cannot be read outside.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Await fn(*args, db=session)"""
+        if isinstance(self.session, Session):
+            return await run_in_threadpool(fn, *args, db=self.session)
+        return await self.session.run_sync(lambda session: fn(*args, db=session))
+
+
+@asynccontextmanager
+async def session_runner() -> AsyncIterator[SessionRunner]:
+    """A SessionRunner on a new session of the configured kind"""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield SessionRunner(db)
+        return
+
+    db = SessionLocal()
+    try:
+        yield SessionRunner(db)
+    finally:
+        # Returning the connection to the pool may roll back, i.e. do I/O
+        await run_in_threadpool(db.close)
+
+
+async def get_db_runner() -> AsyncIterator[SessionRunner]:
+    async with session_runner() as runner:
+        yield runner
@@ -33,6 +33,8 @@ import app.models.refresh_token      # noqa: F401,E402
 import app.models.password_reset_token  # noqa: F401,E402
 import app.models.restaurant        # noqa: F401,E402
 import app.models.reservation       # noqa: F401,E402
+import app.models.restaurant_capacity  # noqa: F401,E402
+import app.models.email_outbox      # noqa: F401,E402
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,51 @@
+"""refresh_token_digest
+
+Revision ID: 55e312b54b72
+Revises: c0b6d44b025d
+Create Date: 2026-10-17 10:12:41.308214
+
+"""
+
+import hashlib
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '55e312b54b72'
+down_revision = 'c0b6d44b025d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.add_column('refresh_tokens', sa.Column('token_hash', sa.BINARY(length=32), nullable=True))
+
+    # Backfill digests for existing rows so issued refresh tokens keep working
+    conn = op.get_bind()
+    rows = conn.execute(sa.text('SELECT id, token FROM refresh_tokens')).fetchall()
+    if rows:
+        conn.execute(
+            sa.text('UPDATE refresh_tokens SET token_hash = :token_hash WHERE id = :id'),
+            [
+                {'id': row.id, 'token_hash': hashlib.sha256(row.token.encode()).digest()}
+                for row in rows
+            ],
+        )
+
+    op.alter_column('refresh_tokens', 'token_hash', existing_type=sa.BINARY(length=32), nullable=False)
+    op.create_index(op.f('ix_refresh_tokens_token_hash'), 'refresh_tokens', ['token_hash'], unique=True)
+    op.drop_index(op.f('ix_refresh_tokens_token'), table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'token')
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    # Digests cannot be turned back into tokens, so existing sessions are dropped
+    op.execute('DELETE FROM refresh_tokens')
+    op.add_column('refresh_tokens', sa.Column('token', sa.String(length=255), nullable=False))
+    op.create_index(op.f('ix_refresh_tokens_token'), 'refresh_tokens', ['token'], unique=False)
+    op.drop_index(op.f('ix_refresh_tokens_token_hash'), table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'token_hash')
@@ -0,0 +1,29 @@
+"""restaurant_change_indexes
+
+Revision ID: 5b7d2e9c1a40
+Revises: 8a41f2c9d6e3
+Create Date: 2026-10-17 21:06:37.184522
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7d2e9c1a40'
+down_revision = '8a41f2c9d6e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.create_index(op.f('ix_restaurants_created_at'), 'restaurants', ['created_at'], unique=False)
+    op.create_index(op.f('ix_restaurants_updated_at'), 'restaurants', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    op.drop_index(op.f('ix_restaurants_updated_at'), table_name='restaurants')
+    op.drop_index(op.f('ix_restaurants_created_at'), table_name='restaurants')
@@ -0,0 +1,27 @@
+"""drop_user_failed_login_attempts
+
+Revision ID: 7c3f9a2e5d18
+Revises: e4a9c37b1f05
+Create Date: 2026-10-18 09:12:40.518734
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f9a2e5d18'
+down_revision = 'e4a9c37b1f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.drop_column('users', 'failed_login_attempts')
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    op.add_column('users', sa.Column('failed_login_attempts', sa.Integer(), server_default='0', nullable=False))
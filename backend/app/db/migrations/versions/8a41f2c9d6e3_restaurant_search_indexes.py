@@ -0,0 +1,35 @@
+"""restaurant_search_indexes
+
+Revision ID: 8a41f2c9d6e3
+Revises: 3c8e51a0f7b2
+Create Date: 2026-10-17 17:48:12.730415
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8a41f2c9d6e3'
+down_revision = '3c8e51a0f7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.create_index('ix_restaurants_active_rating', 'restaurants', ['is_active', 'rating', 'id'], unique=False)
+    op.create_index('ix_restaurants_active_name', 'restaurants', ['is_active', 'name', 'id'], unique=False)
+    op.create_index('ix_restaurants_active_city_rating', 'restaurants', ['is_active', 'city', 'rating', 'id'], unique=False)
+    op.create_index('ix_restaurants_active_city_name', 'restaurants', ['is_active', 'city', 'name', 'id'], unique=False)
+    op.create_index('ix_restaurants_active_cuisine_rating', 'restaurants', ['is_active', 'cuisine', 'rating', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    op.drop_index('ix_restaurants_active_cuisine_rating', table_name='restaurants')
+    op.drop_index('ix_restaurants_active_city_name', table_name='restaurants')
+    op.drop_index('ix_restaurants_active_city_rating', table_name='restaurants')
+    op.drop_index('ix_restaurants_active_name', table_name='restaurants')
+    op.drop_index('ix_restaurants_active_rating', table_name='restaurants')
@@ -0,0 +1,29 @@
+"""restaurant_rating_double
+
+Revision ID: b6e1d4a7c932
+Revises: 7c3f9a2e5d18
+Create Date: 2026-10-19 10:41:05.207316
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d4a7c932'
+down_revision = '7c3f9a2e5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.alter_column('restaurants', 'rating', existing_type=sa.Float(), type_=sa.Double(), existing_nullable=True)
+    # Drop the single-precision noise the FLOAT values carry over, e.g. 4.300000190734863
+    op.execute('UPDATE restaurants SET rating = ROUND(rating, 2) WHERE rating IS NOT NULL')
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    op.alter_column('restaurants', 'rating', existing_type=sa.Double(), type_=sa.Float(), existing_nullable=True)
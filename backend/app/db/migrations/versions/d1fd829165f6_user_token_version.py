@@ -0,0 +1,27 @@
+"""user_token_version
+
+Revision ID: d1fd829165f6
+Revises: 55e312b54b72
+Create Date: 2026-10-17 14:03:27.551806
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1fd829165f6'
+down_revision = '55e312b54b72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,47 @@
+"""restaurant_capacity
+
+Revision ID: e4a9c37b1f05
+Revises: 5b7d2e9c1a40
+Create Date: 2026-10-17 22:14:51.603278
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9c37b1f05'
+down_revision = '5b7d2e9c1a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.create_table('restaurant_capacities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('day_of_week', sa.Integer(), nullable=False),
+    sa.Column('opens_at', sa.Time(), nullable=False),
+    sa.Column('closes_at', sa.Time(), nullable=False),
+    sa.Column('slot_minutes', sa.Integer(), nullable=False),
+    sa.Column('turn_minutes', sa.Integer(), nullable=False),
+    sa.Column('max_covers', sa.Integer(), nullable=False),
+    sa.Column('max_arrivals_per_slot', sa.Integer(), nullable=True),
+    sa.Column('max_party_size', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('restaurant_id', 'day_of_week', name='uq_restaurant_capacities_restaurant_day')
+    )
+    op.create_index(op.f('ix_restaurant_capacities_restaurant_id'), 'restaurant_capacities', ['restaurant_id'], unique=False)
+    op.create_index('ix_reservations_restaurant_date', 'reservations', ['restaurant_id', 'reservation_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    op.drop_index('ix_reservations_restaurant_date', table_name='reservations')
+    op.drop_index(op.f('ix_restaurant_capacities_restaurant_id'), table_name='restaurant_capacities')
+    op.drop_table('restaurant_capacities')
@@ -0,0 +1,29 @@
+"""user_token_version_changed_at
+
+Revision ID: f3a8c1d94b27
+Revises: b6e1d4a7c932
+Create Date: 2026-10-19 16:12:48.930114
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d94b27'
+down_revision = 'b6e1d4a7c932'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Použije sa pri `alembic upgrade ...`."""
+    op.add_column('users', sa.Column('token_version_changed_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_users_token_version_changed_at'), 'users', ['token_version_changed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Použije sa pri `alembic downgrade ...`."""
+    op.drop_index(op.f('ix_users_token_version_changed_at'), table_name='users')
+    op.drop_column('users', 'token_version_changed_at')
@@ -3,3 +3,5 @@ from app.models.refresh_token import RefreshToken  # noqa: F401
 from app.models.password_reset_token import PasswordResetToken  # noqa: F401
 from app.models.restaurant import Restaurant  # noqa: F401
 from app.models.reservation import Reservation  # noqa: F401
+from app.models.restaurant_capacity import RestaurantCapacity  # noqa: F401
+from app.models.email_outbox import EmailOutbox  # noqa: F401
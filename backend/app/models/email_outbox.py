@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+from sqlalchemy import DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.database import Base
+import enum
+from typing import Optional
+
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    # Claimed by a worker, which is sending it outside of any transaction
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+def get_utc_now():
+    return datetime.now(timezone.utc)
+
+
+class EmailOutbox(Base):
+    """Email queued in the same transaction as the data it refers to, sent by email_worker"""
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The worker polls for due pending rows and expired claims
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    to_email: Mapped[str] = mapped_column(String(255), nullable=False)
+    # EmailService template name, e.g. "verify_email"
+    template: Mapped[str] = mapped_column(String(50), nullable=False)
+    # JSON-encoded template variables; emptied once the email is sent or given up on
+    context: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(
+        String(20), nullable=False, default=OutboxStatus.PENDING
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, default=get_utc_now, nullable=False
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(default=get_utc_now, nullable=False)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
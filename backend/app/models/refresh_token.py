@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import String, ForeignKey, Enum as SQLEnum
+from sqlalchemy import BINARY, String, ForeignKey, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.database import Base
 import enum
@@ -23,8 +23,9 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    token: Mapped[str] = mapped_column(
-        String(255), unique=True, nullable=False, index=True
+    # SHA-256 digest of the encoded JWT; the token itself is never stored
+    token_hash: Mapped[bytes] = mapped_column(
+        BINARY(32), unique=True, nullable=False, index=True
     )
     expires_at: Mapped[datetime] = mapped_column(nullable=False)
     status: Mapped[str] = mapped_column(
@@ -1,6 +1,6 @@
 import enum
 from datetime import datetime, timezone, date, time
-from sqlalchemy import String, Integer, Text, Date, Time, ForeignKey, DateTime
+from sqlalchemy import String, Integer, Text, Date, Time, ForeignKey, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.database import Base
 from typing import Optional, TYPE_CHECKING
@@ -24,6 +24,10 @@ class ReservationStatus(str, enum.Enum):
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        # Availability reads one restaurant's reservations of one day
+        Index("ix_reservations_restaurant_date", "restaurant_id", "reservation_date"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
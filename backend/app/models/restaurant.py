@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import String, Integer, Float, Boolean, Text, ForeignKey, DateTime
+from sqlalchemy import String, Integer, Float, Double, Boolean, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.database import Base
 from typing import Optional, TYPE_CHECKING
@@ -7,6 +7,7 @@ from typing import Optional, TYPE_CHECKING
 if TYPE_CHECKING:
     from app.models.user import User
     from app.models.reservation import Reservation
+    from app.models.restaurant_capacity import RestaurantCapacity
 
 
 def get_utc_now():
@@ -15,6 +16,14 @@ def get_utc_now():
 
 class Restaurant(Base):
     __tablename__ = "restaurants"
+    __table_args__ = (
+        # Search: equality filters first, then the sort key and id for keyset paging
+        Index("ix_restaurants_active_rating", "is_active", "rating", "id"),
+        Index("ix_restaurants_active_name", "is_active", "name", "id"),
+        Index("ix_restaurants_active_city_rating", "is_active", "city", "rating", "id"),
+        Index("ix_restaurants_active_city_name", "is_active", "city", "name", "id"),
+        Index("ix_restaurants_active_cuisine_rating", "is_active", "cuisine", "rating", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -42,16 +51,19 @@ class Restaurant(Base):
 
     cover_image: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
 
-    rating: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # DOUBLE, not FLOAT: MySQL stores FLOAT in single precision, so the value
+    # read back would not compare equal to itself in a keyset cursor
+    rating: Mapped[Optional[float]] = mapped_column(Double, nullable=True)
     review_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
 
+    # Indexed for the catalog's incremental refresh (changed since a watermark)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime, default=get_utc_now, nullable=False
+        DateTime, default=get_utc_now, nullable=False, index=True
     )
     updated_at: Mapped[Optional[datetime]] = mapped_column(
-        DateTime, onupdate=get_utc_now, nullable=True
+        DateTime, onupdate=get_utc_now, nullable=True, index=True
     )
 
 
@@ -60,3 +72,6 @@ class Restaurant(Base):
     reservations: Mapped[list["Reservation"]] = relationship(
         "Reservation", back_populates="restaurant", cascade="all, delete-orphan"
     )
+    capacities: Mapped[list["RestaurantCapacity"]] = relationship(
+        "RestaurantCapacity", back_populates="restaurant", cascade="all, delete-orphan"
+    )
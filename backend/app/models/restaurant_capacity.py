@@ -0,0 +1,57 @@
+from datetime import datetime, timezone, time
+from sqlalchemy import Integer, Time, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.db.database import Base
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.models.restaurant import Restaurant
+
+
+def get_utc_now():
+    return datetime.now(timezone.utc)
+
+
+class RestaurantCapacity(Base):
+    """Seating capacity of a restaurant on one weekday; a weekday without a row is closed"""
+
+    __tablename__ = "restaurant_capacities"
+    __table_args__ = (
+        UniqueConstraint("restaurant_id", "day_of_week", name="uq_restaurant_capacities_restaurant_day"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    restaurant_id: Mapped[int] = mapped_column(
+        ForeignKey("restaurants.id"), nullable=False, index=True
+    )
+    # 0 = Monday ... 6 = Sunday, as date.weekday()
+    day_of_week: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # Same day; the last reservation starts turn_minutes before closes_at
+    opens_at: Mapped[time] = mapped_column(Time, nullable=False)
+    closes_at: Mapped[time] = mapped_column(Time, nullable=False)
+
+    # Reservations start every slot_minutes from opens_at
+    slot_minutes: Mapped[int] = mapped_column(Integer, nullable=False, default=15)
+    # How long a party keeps its seats
+    turn_minutes: Mapped[int] = mapped_column(Integer, nullable=False, default=90)
+
+    # Guests seated at the same time
+    max_covers: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Guests arriving in one slot (kitchen pacing); None means no limit
+    max_arrivals_per_slot: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    max_party_size: Mapped[int] = mapped_column(Integer, nullable=False, default=8)
+
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=get_utc_now, nullable=False
+    )
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, onupdate=get_utc_now, nullable=True
+    )
+
+
+    restaurant: Mapped["Restaurant"] = relationship(
+        "Restaurant", back_populates="capacities"
+    )
@@ -36,11 +36,16 @@ class User(Base):
     phone_number: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
     email_verified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
-    failed_login_attempts: Mapped[int] = mapped_column(
-        Integer, default=0, nullable=False
-    )
+    # Failed attempts are counted in app.utils.login_attempts; only the lock is stored
     locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
+    # Embedded in access tokens; bumping it revokes every token issued before
+    token_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Lets workers reload only the versions bumped since their last refresh
+    token_version_changed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True, index=True
+    )
+
     registered_at: Mapped[datetime] = mapped_column(default=get_utc_now)
     edited_at: Mapped[datetime] = mapped_column(onupdate=get_utc_now, nullable=True)
 
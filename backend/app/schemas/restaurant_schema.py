@@ -0,0 +1,126 @@
+from datetime import date, time
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Union
+from enum import Enum
+
+
+class RestaurantSort(str, Enum):
+    RATING = "rating"  # best rated first, unrated last
+    NAME = "name"
+
+
+class SuggestionKind(str, Enum):
+    CITY = "city"
+    RESTAURANT = "restaurant"
+
+
+class RestaurantSummary(BaseModel):
+    id: int
+    name: str
+    slug: str
+    cuisine: str
+    price_range: int
+    address: str
+    city: str
+    country: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    cover_image: Optional[str] = None
+    rating: Optional[float] = None
+    review_count: int
+    is_active: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RestaurantSearchResponse(BaseModel):
+    items: List[RestaurantSummary]
+    # Opaque; pass back as ?cursor= to get the next page, None on the last page
+    next_cursor: Optional[str] = None
+
+
+class NearbyRestaurant(RestaurantSummary):
+    distance_m: float
+
+
+class NearbyRestaurantsResponse(BaseModel):
+    items: List[NearbyRestaurant]
+
+
+class RestaurantsInBoundsResponse(BaseModel):
+    items: List[RestaurantSummary]
+    # More restaurants are in the box than limit; zoom in or cluster
+    truncated: bool = False
+
+
+class MapCluster(BaseModel):
+    # Centroid of the restaurants in the cluster
+    latitude: float
+    longitude: float
+    count: int
+    # Set when the cluster is a single restaurant
+    restaurant_id: Optional[int] = None
+
+
+class MapTileResponse(BaseModel):
+    zoom: int
+    x: int
+    y: int
+    clusters: List[MapCluster]
+
+
+class RestaurantMatch(RestaurantSummary):
+    # BM25 relevance; only comparable within one query
+    score: float
+
+
+class RestaurantMatchesResponse(BaseModel):
+    items: List[RestaurantMatch]
+
+
+class AutocompleteSuggestion(BaseModel):
+    kind: SuggestionKind
+    text: str
+    # Set for restaurant suggestions
+    restaurant_id: Optional[int] = None
+    slug: Optional[str] = None
+
+
+class AutocompleteResponse(BaseModel):
+    items: List[AutocompleteSuggestion]
+
+
+class FacetValue(BaseModel):
+    value: Union[int, str]
+    count: int
+
+
+class RestaurantFacetsResponse(BaseModel):
+    # Restaurants matching every selected filter
+    total: int
+    # Each facet ignores its own selection, so unselected options keep their counts
+    cuisine: List[FacetValue]
+    price_range: List[FacetValue]
+    city: List[FacetValue]
+
+
+class RestaurantBrowseResponse(BaseModel):
+    items: List[RestaurantSummary]
+    # Restaurants matching the filters, across all pages
+    total: int
+
+
+class AvailabilitySlot(BaseModel):
+    time: time
+    available: bool
+    # Seats free for the whole stay of a party starting at this time
+    free_covers: int
+
+
+class RestaurantAvailabilityResponse(BaseModel):
+    restaurant_id: int
+    date: date
+    party_size: int
+    # False when the restaurant does not open on this weekday
+    open: bool
+    slots: List[AvailabilitySlot]
@@ -0,0 +1,331 @@
+"""
+Typeahead suggestions for the search box
+
+Suggestions are cities and restaurant names, each weighted by popularity
+(a restaurant by its reviews and rating, a city by the sum over its
+restaurants). Every word start of a suggestion becomes a folded key, so
+"napo" finds "Pizzeria Napoli", and the keys are kept in one sorted list.
+A prefix matches the contiguous key range found with two bisects.
+
+Short prefixes match too many keys to rank per request, so the top
+AUTOCOMPLETE_TOP_K suggestions of every prefix up to
+AUTOCOMPLETE_PRECOMPUTED_PREFIX characters are computed at build time.
+
+Committed changes are applied per restaurant: its keys are bisected out of
+and into the sorted list, its city's weight is adjusted, and the short
+prefixes it falls under have their top lists patched. A top list is only
+ranked again from its key range when an entry in it is removed or loses
+weight. The full build runs only at startup and with the periodic rebuild.
+"""
+
+import bisect
+import logging
+from array import array
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.utils.restaurant_events import RestaurantIndex, RestaurantRecord, register_index
+from app.utils.text_index import fold
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_TOP_K = 10
+AUTOCOMPLETE_PRECOMPUTED_PREFIX = 3
+# Keys per suggestion, one per word start; the rest of a long name is not indexed
+AUTOCOMPLETE_MAX_WORD_STARTS = 4
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+class Suggestion(NamedTuple):
+    kind: str  # "city" or "restaurant"
+    text: str
+    restaurant_id: Optional[int] = None
+    slug: Optional[str] = None
+
+
+def normalize(text: str) -> str:
+    """Folded text with punctuation runs collapsed to one space"""
+    return _SEPARATORS.sub(" ", fold(text)).strip()
+
+
+def popularity(record: RestaurantRecord) -> float:
+    return (record.review_count + 1) * (1 + (record.rating or 0))
+
+
+def _word_start_keys(text: str) -> List[str]:
+    key = normalize(text)
+    keys = [key]
+    position = key.find(" ")
+    while position != -1 and len(keys) < AUTOCOMPLETE_MAX_WORD_STARTS:
+        keys.append(key[position + 1:])
+        position = key.find(" ", position + 1)
+    return [k for k in keys if k]
+
+
+def _top(entries: np.ndarray, weights: np.ndarray, k: int) -> List[int]:
+    """Up to k distinct entries with the highest weights, best first"""
+    # An entry has at most AUTOCOMPLETE_MAX_WORD_STARTS keys in a range, so
+    # the best k * AUTOCOMPLETE_MAX_WORD_STARTS keys hold the best k entries
+    candidates = k * AUTOCOMPLETE_MAX_WORD_STARTS
+    if len(entries) > candidates:
+        keep = np.argpartition(-weights, candidates - 1)[:candidates]
+        entries, weights = entries[keep], weights[keep]
+    order = np.lexsort((entries, -weights))
+    top: List[int] = []
+    for entry in entries[order].tolist():
+        if entry not in top:
+            top.append(entry)
+            if len(top) == k:
+                break
+    return top
+
+
+class _Suggestions:
+    """
+    Sorted keys of all suggestions plus the precomputed short-prefix answers
+
+    keys[i] is a word-start key of suggestion entries[i]; both stay sorted
+    by key as suggestions are added, removed and reweighted. entries is an
+    int64 array, so ranking a key range reads it through a numpy view
+    instead of converting a list slice. Removed entries leave None in
+    suggestions until the next rebuild.
+    """
+
+    def __init__(self, suggestions: List[Suggestion], weights: List[float]):
+        self.suggestions: List[Optional[Suggestion]] = list(suggestions)
+        self.weights = np.zeros(max(len(weights), 16), dtype=np.float64)
+        self.weights[:len(weights)] = weights
+        pairs = sorted(
+            (key, entry)
+            for entry, suggestion in enumerate(suggestions)
+            for key in _word_start_keys(suggestion.text)
+        )
+        self.keys = [key for key, _ in pairs]
+        self.entries = array("q", (entry for _, entry in pairs))
+
+        entries = np.frombuffer(self.entries, dtype=np.int64)
+        key_weights = self.weights[entries]
+        self.top: Dict[str, List[int]] = {}
+        for length in range(1, AUTOCOMPLETE_PRECOMPUTED_PREFIX + 1):
+            start = 0
+            while start < len(self.keys):
+                prefix = self.keys[start][:length]
+                if len(prefix) < length:
+                    # A key shorter than the prefix length sorts first among its extensions
+                    start += 1
+                    continue
+                end = self._range_end(prefix, start)
+                self.top[prefix] = _top(entries[start:end], key_weights[start:end], AUTOCOMPLETE_TOP_K)
+                start = end
+
+    def _range_end(self, prefix: str, start: int = 0) -> int:
+        # "\U0010ffff" sorts after every character a key can continue with
+        return bisect.bisect_left(self.keys, prefix + "\U0010ffff", start)
+
+    def _ranked(self, prefix: str, limit: int) -> List[int]:
+        start = bisect.bisect_left(self.keys, prefix)
+        # The view must not outlive this call: entries cannot be resized while it exists
+        entries = np.frombuffer(self.entries, dtype=np.int64)[start:self._range_end(prefix, start)]
+        return _top(entries, self.weights[entries], limit)
+
+    def lookup(self, prefix: str, limit: int) -> List[Suggestion]:
+        top = self.top.get(prefix)
+        if top is None:
+            top = self._ranked(prefix, limit)
+        return [self.suggestions[entry] for entry in top[:limit]]
+
+    # Incremental changes
+
+    def add(self, suggestion: Suggestion, weight: float) -> int:
+        entry = len(self.suggestions)
+        self.suggestions.append(suggestion)
+        if entry == len(self.weights):
+            self.weights = np.concatenate([self.weights, np.zeros(entry)])
+        self.weights[entry] = weight
+
+        keys = _word_start_keys(suggestion.text)
+        for key in keys:
+            position = bisect.bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.entries.insert(position, entry)
+        for prefix in _short_prefixes(keys):
+            self._promote(prefix, entry)
+        return entry
+
+    def remove(self, entry: int) -> None:
+        keys = _word_start_keys(self.suggestions[entry].text)
+        for key in keys:
+            position = bisect.bisect_left(self.keys, key)
+            while self.entries[position] != entry:
+                position += 1
+            del self.keys[position]
+            del self.entries[position]
+        self.suggestions[entry] = None
+        for prefix in _short_prefixes(keys):
+            self._demote(prefix, entry)
+
+    def reweight(self, entry: int, weight: float) -> None:
+        previous = self.weights[entry]
+        self.weights[entry] = weight
+        for prefix in _short_prefixes(_word_start_keys(self.suggestions[entry].text)):
+            if weight >= previous:
+                self._promote(prefix, entry)
+            else:
+                self._demote(prefix, entry)
+
+    def _promote(self, prefix: str, entry: int) -> None:
+        """Place an entry that was added or gained weight in the prefix's top list"""
+        top = self.top.setdefault(prefix, [])
+        if entry in top:
+            top.remove(entry)
+        weights = self.weights
+        # Same order as _top: highest weight first, lower entry first on ties
+        position = bisect.bisect_left(
+            top, (-weights[entry], entry), key=lambda e: (-weights[e], e)
+        )
+        if position < AUTOCOMPLETE_TOP_K:
+            top.insert(position, entry)
+            del top[AUTOCOMPLETE_TOP_K:]
+
+    def _demote(self, prefix: str, entry: int) -> None:
+        """Re-rank a prefix whose top list holds an entry that was removed or lost weight"""
+        if entry not in self.top.get(prefix, ()):
+            return
+        top = self._ranked(prefix, AUTOCOMPLETE_TOP_K)
+        if top:
+            self.top[prefix] = top
+        else:
+            del self.top[prefix]
+
+
+def _short_prefixes(keys: List[str]) -> set:
+    """The precomputed prefixes the keys fall under"""
+    return {
+        key[:length]
+        for key in keys
+        for length in range(1, min(len(key), AUTOCOMPLETE_PRECOMPUTED_PREFIX) + 1)
+    }
+
+
+class AutocompleteIndex(RestaurantIndex):
+    """
+    Popularity-ranked prefix suggestions over city and restaurant names
+
+    Restaurant changes update their own entry and their city's entry in
+    place; only a rebuild builds the whole structure.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rebuild([])
+
+    def rebuild(self, records: List[RestaurantRecord]) -> None:
+        active = {r.id: r for r in records if r.is_active}
+        suggestions: List[Suggestion] = []
+        weights: List[float] = []
+        restaurant_entries: Dict[int, int] = {}
+        cities: Dict[str, List] = {}
+        for record in active.values():
+            weight = popularity(record)
+            restaurant_entries[record.id] = len(suggestions)
+            suggestions.append(Suggestion("restaurant", record.name, record.id, record.slug))
+            weights.append(weight)
+            city = cities.setdefault(normalize(record.city), [record.city, 0.0, 0])
+            city[1] += weight
+            city[2] += 1
+
+        city_entries: Dict[str, List] = {}
+        for key, (display, total, count) in cities.items():
+            # [entry, total weight, restaurants]
+            city_entries[key] = [len(suggestions), total, count]
+            suggestions.append(Suggestion("city", display))
+            weights.append(total)
+        built = _Suggestions(suggestions, weights)
+
+        with self._lock:
+            self._records = active
+            self._restaurant_entries = restaurant_entries
+            self._city_entries = city_entries
+            self._suggestions = built
+
+    def apply(self, upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+        with self._lock:
+            for restaurant_id in deleted_ids:
+                self._remove(restaurant_id)
+            for record in upserts:
+                if record.is_active:
+                    self._upsert(record)
+                else:
+                    self._remove(record.id)
+
+    def _upsert(self, record: RestaurantRecord) -> None:
+        previous = self._records.get(record.id)
+        weight = popularity(record)
+        suggestions = self._suggestions
+        if previous is None:
+            self._restaurant_entries[record.id] = suggestions.add(
+                Suggestion("restaurant", record.name, record.id, record.slug), weight
+            )
+        elif (previous.name, previous.slug) != (record.name, record.slug):
+            suggestions.remove(self._restaurant_entries[record.id])
+            self._restaurant_entries[record.id] = suggestions.add(
+                Suggestion("restaurant", record.name, record.id, record.slug), weight
+            )
+        elif popularity(previous) != weight:
+            suggestions.reweight(self._restaurant_entries[record.id], weight)
+
+        if previous is None:
+            self._add_to_city(record.city, weight, 1)
+        elif normalize(previous.city) == normalize(record.city):
+            self._add_to_city(record.city, weight - popularity(previous), 0)
+        else:
+            self._add_to_city(previous.city, -popularity(previous), -1)
+            self._add_to_city(record.city, weight, 1)
+        self._records[record.id] = record
+
+    def _remove(self, restaurant_id: int) -> None:
+        previous = self._records.pop(restaurant_id, None)
+        if previous is None:
+            return
+        self._suggestions.remove(self._restaurant_entries.pop(restaurant_id))
+        self._add_to_city(previous.city, -popularity(previous), -1)
+
+    def _add_to_city(self, city: str, weight: float, count: int) -> None:
+        key = normalize(city)
+        entry = self._city_entries.get(key)
+        if entry is None:
+            self._city_entries[key] = [
+                self._suggestions.add(Suggestion("city", city), weight), weight, count
+            ]
+            return
+        entry[1] += weight
+        entry[2] += count
+        if entry[2] == 0:
+            self._suggestions.remove(entry[0])
+            del self._city_entries[key]
+        elif weight:
+            self._suggestions.reweight(entry[0], entry[1])
+
+    def suggest(self, query: str, limit: int = AUTOCOMPLETE_TOP_K) -> List[Suggestion]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            return self._suggestions.lookup(prefix, min(limit, AUTOCOMPLETE_TOP_K))
+
+    def stats(self) -> dict:
+        with self._lock:
+            suggestions = self._suggestions
+            return {
+                "suggestions": sum(s is not None for s in suggestions.suggestions),
+                "keys": len(suggestions.keys),
+                "precomputed_prefixes": len(suggestions.top),
+            }
+
+
+# Global autocomplete index instance
+autocomplete_index = register_index(AutocompleteIndex())
@@ -0,0 +1,136 @@
+"""
+Bookable reservation times of a restaurant for one date and party size
+
+The day from opens_at is cut into slots of slot_minutes. Reservations
+start on slot boundaries, the last one turn_minutes before closes_at at the
+latest. Every reservation holds party_size seats from its time for
+turn_minutes, i.e. over a contiguous range of slots, counting a slot it
+only partly covers. Occupancy per slot is built without a loop over
+reservations or slots: party sizes are added at each range's first slot
+and subtracted after its last one (np.bincount), and a cumulative sum
+turns those changes into seated guests per slot.
+
+A party arriving in slot s needs its seats for the next turn slots, so
+the peak occupancy over that window (a sliding window maximum) decides
+whether it fits under max_covers. Arrivals per slot are counted the same
+way for the optional kitchen pacing limit.
+"""
+
+from datetime import date, time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.reservation import Reservation, ReservationStatus
+from app.models.restaurant_capacity import RestaurantCapacity
+
+# Reservations that no longer hold seats
+RELEASED_STATUSES = (ReservationStatus.CANCELLED.value, ReservationStatus.NO_SHOW.value)
+
+# (start time, bookable, seats still free over the whole stay)
+Slot = Tuple[time, bool, int]
+
+
+def _minutes(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def grid(capacity: RestaurantCapacity) -> Tuple[int, int]:
+    """Number of start times offered, and slots one stay covers"""
+    # A stay ending mid-slot still holds that slot
+    turn = -(-capacity.turn_minutes // capacity.slot_minutes)
+    open_minutes = _minutes(capacity.closes_at) - _minutes(capacity.opens_at)
+    if open_minutes < capacity.turn_minutes:
+        return 0, turn
+    # The last reservation starts turn_minutes before closes_at at the latest
+    return (open_minutes - capacity.turn_minutes) // capacity.slot_minutes + 1, turn
+
+
+def occupancy(
+    capacity: RestaurantCapacity, start_minutes: np.ndarray, party_sizes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Guests seated and guests arriving per slot, over every slot an offered stay covers"""
+    slot = capacity.slot_minutes
+    opens = _minutes(capacity.opens_at)
+    starts, turn = grid(capacity)
+    # The last slot may run past closes_at when turn_minutes is not a multiple of slot_minutes
+    slots = starts + turn - 1 if starts else 0
+
+    offsets = np.asarray(start_minutes, dtype=np.int64) - opens
+    party_sizes = np.asarray(party_sizes, dtype=np.int64)
+    # A reservation off the slot grid holds every slot it overlaps
+    first = np.clip(offsets // slot, 0, slots)
+    after_last = np.clip(-(-(offsets + capacity.turn_minutes) // slot), 0, slots)
+
+    changes = (
+        np.bincount(first, weights=party_sizes, minlength=slots + 1)
+        - np.bincount(after_last, weights=party_sizes, minlength=slots + 1)
+    )
+    seated = np.cumsum(changes[:slots]).astype(np.int64)
+
+    # Arrivals before opening or after closing do not count against any slot
+    inside = (offsets >= 0) & (offsets < slots * slot)
+    arrivals = np.bincount(
+        first[inside], weights=party_sizes[inside], minlength=slots
+    )[:slots].astype(np.int64)
+    return seated, arrivals
+
+
+def compute_slots(
+    capacity: RestaurantCapacity,
+    start_minutes: Sequence[int],
+    party_sizes: Sequence[int],
+    party_size: int,
+) -> List[Slot]:
+    """Every start time of the day with whether party_size guests can book it"""
+    seated, arrivals = occupancy(
+        capacity, np.asarray(start_minutes, dtype=np.int64), np.asarray(party_sizes, dtype=np.int64)
+    )
+    starts, turn = grid(capacity)
+    if not starts:
+        return []
+
+    peak = sliding_window_view(seated, turn).max(axis=1)
+    free = np.maximum(capacity.max_covers - peak, 0)
+    bookable = free >= party_size
+    if capacity.max_arrivals_per_slot is not None:
+        bookable &= arrivals[:len(free)] + party_size <= capacity.max_arrivals_per_slot
+    if party_size > capacity.max_party_size:
+        bookable[:] = False
+
+    opens = _minutes(capacity.opens_at)
+    return [
+        (time(*divmod(opens + i * capacity.slot_minutes, 60)), ok, seats)
+        for i, (ok, seats) in enumerate(zip(bookable.tolist(), free.tolist()))
+    ]
+
+
+def restaurant_availability(
+    db: Session, restaurant_id: int, day: date, party_size: int
+) -> Optional[List[Slot]]:
+    """Slots of one restaurant and date, or None if it is closed that weekday"""
+    capacity = db.scalar(
+        select(RestaurantCapacity).where(
+            RestaurantCapacity.restaurant_id == restaurant_id,
+            RestaurantCapacity.day_of_week == day.weekday(),
+        )
+    )
+    if capacity is None:
+        return None
+
+    rows = db.execute(
+        select(Reservation.reservation_time, Reservation.party_size).where(
+            Reservation.restaurant_id == restaurant_id,
+            Reservation.reservation_date == day,
+            Reservation.status.not_in(RELEASED_STATUSES),
+        )
+    ).all()
+    return compute_slots(
+        capacity,
+        [_minutes(reservation_time) for reservation_time, _ in rows],
+        [size for _, size in rows],
+        party_size,
+    )
@@ -0,0 +1,338 @@
+"""
+Columnar in-memory snapshot of the active restaurants
+
+Browsing reads the restaurants table far more often than it changes, so
+each worker keeps the active restaurants as numpy columns: numbers as
+typed arrays, city / cuisine / country as codes into interned string
+tables, and per-row strings (name, slug, ...) as object arrays. Browse and
+facet requests filter and sort these columns without touching the DB.
+
+The catalog is a restaurant index (see restaurant_events): built from the
+same startup scan as the geo and text indexes and kept current by the same
+change feed, so commits of this worker show up within a fraction of a
+second and those of other workers with the next poll. A change rewrites only the rows
+of the restaurants it touches; a rebuild replaces the whole snapshot.
+"""
+
+import bisect
+import logging
+import math
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.restaurant_events import RestaurantIndex, RestaurantRecord, register_index
+from app.utils.text_index import fold
+
+logger = logging.getLogger(__name__)
+
+INTERNED_COLUMNS = ("cuisine", "city", "country")
+OBJECT_COLUMNS = ("name", "slug", "address", "cover_image")
+NUMERIC_COLUMNS = {
+    "id": np.int64,
+    "price_range": np.int8,
+    "latitude": np.float64,
+    "longitude": np.float64,
+    "rating": np.float32,
+    "review_count": np.int32,
+}
+# Restaurant ids fit the 31 bits rating_key leaves for them (INT columns)
+MAX_ID = (1 << 31) - 1
+# Distance between neighbouring name_key labels after a relabel
+NAME_KEY_GAP = 1 << 32
+# Spare rows allocated at a rebuild, at least; the capacity doubles when they run out
+MIN_SPARE_ROWS = 1024
+
+
+class StringTable:
+    """Append-only interned strings; a column stores codes into values"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def lookup(self, values: Sequence[str]) -> np.ndarray:
+        """Codes of the values that are in the table"""
+        return np.array([self.codes[v] for v in values if v in self.codes], dtype=np.int32)
+
+
+def _to_columns(records: Sequence[RestaurantRecord], tables: Dict[str, StringTable]) -> Dict[str, np.ndarray]:
+    columns: Dict[str, np.ndarray] = {}
+    for name, dtype in NUMERIC_COLUMNS.items():
+        values = [getattr(record, name) for record in records]
+        if np.issubdtype(dtype, np.floating):
+            # NULL is stored as NaN
+            values = [np.nan if v is None else v for v in values]
+        columns[name] = np.array(values, dtype=dtype)
+    for name in INTERNED_COLUMNS:
+        columns[name] = np.fromiter(
+            (tables[name].code(getattr(record, name)) for record in records),
+            dtype=np.int32, count=len(records),
+        )
+    for name in OBJECT_COLUMNS:
+        column = np.empty(len(records), dtype=object)
+        column[:] = [getattr(record, name) for record in records]
+        columns[name] = column
+    columns["alive"] = np.fromiter(
+        (record.is_active for record in records), dtype=bool, count=len(records)
+    )
+    return columns
+
+
+def _rating_keys(rating: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """
+    int64 keys ascending in rating order: best first, unrated last, newest first on ties
+
+    The float32 bits of -rating (NaN as +inf) are made to order like
+    unsigned integers and put above 31 bits of reversed id.
+    """
+    negated = np.where(np.isnan(rating), np.float32(np.inf), -rating).astype(np.float32)
+    bits = negated.view(np.int32).astype(np.int64)
+    # Negative floats order backwards as integers; flip them, then shift all to unsigned
+    ordered = np.where(bits < 0, bits ^ 0x7FFFFFFF, bits) + (1 << 31)
+    return (ordered << 31) | (MAX_ID - ids)
+
+
+def _grow(columns: Dict[str, np.ndarray], capacity: int) -> Dict[str, np.ndarray]:
+    """Copies of the columns with room for capacity rows; the extra rows are not alive"""
+    grown = {}
+    for name, column in columns.items():
+        # Zeros, None and alive = False
+        if column.dtype == object:
+            new = np.empty(capacity, dtype=object)
+        else:
+            new = np.zeros(capacity, dtype=column.dtype)
+        new[:len(column)] = column
+        grown[name] = new
+    return grown
+
+
+class CatalogSnapshot:
+    """
+    Columns of the restaurants; row i of every column is one restaurant
+
+    A change writes only the rows it touches: updated restaurants in place,
+    new ones into spare capacity at the end, which doubles when it runs out.
+    Rows of deactivated or deleted restaurants stay in place with
+    alive = False until the next rebuild.
+
+    rating_key and name_key are int64 sort keys, so sorting a selection is
+    an integer argsort. rating_key is computed from the row alone. name_key
+    labels rows in name order with gaps; name_order lists the rows in that
+    order, so a new or renamed row is bisected in and labelled between its
+    neighbours, and only a full gap relabels every row.
+
+    Readers do not lock, so one running during a change can see part of it;
+    generation grows once the change is complete.
+    """
+
+    def __init__(self, records: Sequence[RestaurantRecord], generation: int = 0):
+        self.tables = {name: StringTable() for name in INTERNED_COLUMNS}
+        self.generation = generation
+        self.size = len(records)
+        columns = _to_columns(records, self.tables)
+        columns["rating_key"] = _rating_keys(columns["rating"], columns["id"])
+
+        # Case and accent insensitive; Python sorts the folded strings
+        folded = [fold(name) for name in columns["name"].tolist()]
+        id_list = columns["id"].tolist()
+        order = sorted(range(self.size), key=lambda i: (folded[i], id_list[i]))
+        self.name_order = array("q", order)
+        columns["name_key"] = np.empty(self.size, dtype=np.int64)
+        columns["name_key"][order] = np.arange(1, self.size + 1, dtype=np.int64) * NAME_KEY_GAP
+
+        self.columns = _grow(columns, self.size + max(MIN_SPARE_ROWS, self.size // 8))
+        # restaurant id -> row
+        self.rows: Dict[int, int] = dict(zip(id_list, range(self.size)))
+
+    @property
+    def capacity(self) -> int:
+        return len(self.columns["id"])
+
+    def apply(self, upserts: Sequence[RestaurantRecord], deleted_ids: Sequence[int]) -> bool:
+        """Update, add or mark deleted the rows of these restaurants; False if nothing changed"""
+        changed = _to_columns(upserts, self.tables)
+        positions = np.array([self.rows.get(i, -1) for i in changed["id"].tolist()], dtype=np.int64)
+        existing = positions >= 0
+        # New rows are only needed while active
+        added = ~existing & changed["alive"]
+        removed = [self.rows[i] for i in deleted_ids if i in self.rows]
+        if not existing.any() and not added.any() and not removed:
+            return False
+
+        new_rows = np.arange(self.size, self.size + int(added.sum()))
+        if self.size + len(new_rows) > self.capacity:
+            self.columns = _grow(self.columns, max(2 * self.capacity, self.size + len(new_rows)))
+        columns = self.columns
+
+        targets = np.concatenate([positions[existing], new_rows])
+        sources = np.concatenate([np.flatnonzero(existing), np.flatnonzero(added)])
+        renamed = positions[existing][
+            columns["name"][positions[existing]] != changed["name"][existing]
+        ].tolist()
+        for row in renamed:
+            self._unlink_name(row)
+
+        for name, values in changed.items():
+            if name != "alive":
+                columns[name][targets] = values[sources]
+        columns["rating_key"][targets] = _rating_keys(columns["rating"][targets], columns["id"][targets])
+        for row, restaurant_id in zip(new_rows.tolist(), changed["id"][added].tolist()):
+            self.rows[restaurant_id] = row
+        self.size += len(new_rows)
+        for row in renamed + new_rows.tolist():
+            self._link_name(row)
+
+        # Last, so a row is only selected once its sort keys are set
+        columns["alive"][targets] = changed["alive"][sources]
+        columns["alive"][removed] = False
+        self.generation += 1
+        return True
+
+    def _unlink_name(self, row: int) -> None:
+        name_key = self.columns["name_key"]
+        position = bisect.bisect_left(self.name_order, name_key[row], key=lambda r: name_key[r])
+        del self.name_order[position]
+
+    def _link_name(self, row: int) -> None:
+        """Bisect a row into name_order and label it between its neighbours"""
+        names, ids, name_key = self.columns["name"], self.columns["id"], self.columns["name_key"]
+        key = (fold(names[row]), ids[row])
+        order = self.name_order
+        position = bisect.bisect_left(order, key, key=lambda r: (fold(names[r]), ids[r]))
+        low = name_key[order[position - 1]] if position > 0 else 0
+        high = name_key[order[position]] if position < len(order) else low + 2 * NAME_KEY_GAP
+        order.insert(position, row)
+        if high - low < 2:
+            # No label left between the neighbours
+            rows = np.frombuffer(order, dtype=np.int64)
+            name_key[rows] = np.arange(1, len(order) + 1, dtype=np.int64) * NAME_KEY_GAP
+        else:
+            name_key[row] = (low + high) // 2
+
+    # Filter and sort primitives
+
+    def mask(
+        self,
+        city: Optional[Sequence[str]] = None,
+        cuisine: Optional[Sequence[str]] = None,
+        price_range: Optional[Sequence[int]] = None,
+        min_rating: Optional[float] = None,
+    ) -> np.ndarray:
+        """Rows of active restaurants matching every given filter"""
+        columns = self.columns
+        mask = columns["alive"].copy()
+        if city:
+            mask &= np.isin(columns["city"], self.tables["city"].lookup(city))
+        if cuisine:
+            mask &= np.isin(columns["cuisine"], self.tables["cuisine"].lookup(cuisine))
+        if price_range:
+            mask &= np.isin(columns["price_range"], np.array(price_range, dtype=np.int8))
+        if min_rating is not None:
+            # NaN (unrated) compares False
+            mask &= columns["rating"] >= min_rating
+        return mask
+
+    def sorted_rows(self, mask: np.ndarray, by_name: bool, offset: int, limit: int) -> np.ndarray:
+        """Rows offset..offset + limit of the selection in name order, or else rating order"""
+        rows = np.flatnonzero(mask)
+        rank = self.columns["name_key" if by_name else "rating_key"][rows]
+        end = min(offset + limit, len(rows))
+        if end <= offset:
+            return rows[:0]
+        if end < len(rows):
+            # Only the first `end` rows need ordering
+            keep = np.argpartition(rank, end - 1)[:end]
+            rows, rank = rows[keep], rank[keep]
+        return rows[np.argsort(rank, kind="stable")][offset:end]
+
+    def records(self, rows: np.ndarray) -> List[dict]:
+        """Rows as RestaurantSummary fields"""
+        c, tables = self.columns, self.tables
+        out = []
+        for row in rows.tolist():
+            rating = float(c["rating"][row])
+            latitude = float(c["latitude"][row])
+            longitude = float(c["longitude"][row])
+            out.append({
+                "id": int(c["id"][row]),
+                "name": c["name"][row],
+                "slug": c["slug"][row],
+                "cuisine": tables["cuisine"].values[c["cuisine"][row]],
+                "price_range": int(c["price_range"][row]),
+                "address": c["address"][row],
+                "city": tables["city"].values[c["city"][row]],
+                "country": tables["country"].values[c["country"][row]],
+                "latitude": None if math.isnan(latitude) else latitude,
+                "longitude": None if math.isnan(longitude) else longitude,
+                "cover_image": c["cover_image"][row],
+                # Stored as float32; round off the conversion noise
+                "rating": None if math.isnan(rating) else round(rating, 2),
+                "review_count": int(c["review_count"][row]),
+                "is_active": bool(c["alive"][row]),
+            })
+        return out
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint: arrays, the strings they reference and the lookup tables"""
+        total = sum(column.nbytes for column in self.columns.values())
+        total += self.name_order.itemsize * len(self.name_order) + sys.getsizeof(self.rows)
+        for name in OBJECT_COLUMNS:
+            total += sum(sys.getsizeof(value) for value in self.columns[name][:self.size].tolist())
+        for table in self.tables.values():
+            total += sys.getsizeof(table.codes) + sum(sys.getsizeof(v) for v in table.values)
+        return total
+
+
+class RestaurantCatalog(RestaurantIndex):
+    """Holds the current snapshot; rebuilt and updated by the restaurant change feed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.snapshot = CatalogSnapshot([])
+        self.rebuilt_at = time.monotonic()
+        self.last_change_rows = 0
+
+    def rebuild(self, records: List[RestaurantRecord]) -> None:
+        snapshot = CatalogSnapshot([r for r in records if r.is_active])
+        with self._lock:
+            # Newer than anything applied meanwhile, so the facet cache is dropped
+            snapshot.generation = self.snapshot.generation + 1
+            self.snapshot = snapshot
+            self.rebuilt_at = time.monotonic()
+
+    def apply(self, upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+        with self._lock:
+            self.snapshot.apply(upserts, deleted_ids)
+            self.last_change_rows = len(upserts) + len(deleted_ids)
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        active = int(snapshot.columns["alive"].sum())
+        memory = snapshot.memory_bytes()
+        return {
+            "restaurants": active,
+            "rows": snapshot.size,
+            "capacity": snapshot.capacity,
+            "generation": snapshot.generation,
+            "last_change_rows": self.last_change_rows,
+            "seconds_since_rebuild": round(time.monotonic() - self.rebuilt_at, 1),
+            "memory_bytes": memory,
+            "memory_bytes_per_100k": round(memory / snapshot.size * 100_000) if snapshot.size else 0,
+        }
+
+
+# Global catalog instance
+catalog = register_index(RestaurantCatalog())
@@ -0,0 +1,264 @@
+"""
+Pre-clustered map markers per zoom level and tile
+
+Restaurants are projected to Web Mercator and aggregated into a grid of
+CLUSTER_CELLS_PER_TILE x CLUSTER_CELLS_PER_TILE cells per 256 px tile at
+every zoom from 0 to CLUSTER_MAX_ZOOM. Each cell keeps the sums of x, y and
+restaurant id plus the count, so a cluster's centroid is sum / count and a
+cell holding one restaurant exposes its id directly.
+
+Cells are keyed by the Z-order (Morton) code of their grid position. The
+parent of a cell is key >> 2, so every level is built from the sorted
+keys of the deepest level with a single pass, and the cells of one tile
+form the contiguous key range [tile << 6, (tile + 1) << 6). A tile request
+is two binary searches and a slice of at most 64 cells, whatever the
+number of restaurants.
+
+Committed changes adjust the cells of a point on every level through a
+small overlay; the levels are rebuilt once CLUSTER_OVERLAY_MAX_CHANGES
+points have changed.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.restaurant_events import RestaurantIndex, RestaurantRecord, register_index
+
+CLUSTER_MAX_ZOOM = 16
+# 8 x 8 cells of 32 px per 256 px tile
+CLUSTER_CELL_BITS = 3
+CLUSTER_CELLS_PER_TILE = 1 << CLUSTER_CELL_BITS
+CLUSTER_OVERLAY_MAX_CHANGES = 4096
+# Web Mercator is undefined at the poles
+MAX_LATITUDE = 85.05112878
+
+# Grid size per axis at CLUSTER_MAX_ZOOM
+_DEEPEST_GRID = 1 << (CLUSTER_MAX_ZOOM + CLUSTER_CELL_BITS)
+_TILE_SHIFT = 2 * CLUSTER_CELL_BITS
+
+# (sum of x, sum of y, count, sum of ids)
+CellDelta = List[float]
+Cluster = Tuple[float, float, int, Optional[int]]
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Insert a zero bit between each of the low 32 bits of v"""
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def morton(col: np.ndarray, row: np.ndarray) -> np.ndarray:
+    return (_spread_bits(col) | (_spread_bits(row) << np.uint64(1))).astype(np.int64)
+
+
+def project(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator x, y in [0, 1), y growing southwards as in XYZ tiles"""
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE)))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    upper = np.nextafter(1.0, 0.0)
+    return np.clip(x, 0.0, upper), np.clip(y, 0.0, upper)
+
+
+def unproject(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lon = x * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+def _deepest_keys(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    return morton(
+        (x * _DEEPEST_GRID).astype(np.int64),
+        (y * _DEEPEST_GRID).astype(np.int64),
+    )
+
+
+class _Level:
+    """Non-empty cells of one zoom level, sorted by key"""
+
+    __slots__ = ("keys", "sum_x", "sum_y", "count", "sum_id")
+
+    def __init__(self, keys, sum_x, sum_y, count, sum_id):
+        self.keys = keys
+        self.sum_x = sum_x
+        self.sum_y = sum_y
+        self.count = count
+        self.sum_id = sum_id
+
+    def tile_slice(self, tile_key: int) -> slice:
+        start = np.searchsorted(self.keys, tile_key << _TILE_SHIFT, side="left")
+        end = np.searchsorted(self.keys, (tile_key + 1) << _TILE_SHIFT, side="left")
+        return slice(int(start), int(end))
+
+
+def _build_levels(ids: np.ndarray, x: np.ndarray, y: np.ndarray) -> List[_Level]:
+    keys = _deepest_keys(x, y)
+    order = np.argsort(keys, kind="stable")
+    keys, ids, x, y = keys[order], ids[order], x[order], y[order]
+    count = np.ones(len(keys), dtype=np.int64)
+
+    levels: List[Optional[_Level]] = [None] * (CLUSTER_MAX_ZOOM + 1)
+    for zoom in range(CLUSTER_MAX_ZOOM, -1, -1):
+        if zoom < CLUSTER_MAX_ZOOM:
+            # Parents of sorted keys are sorted too; no re-sort needed
+            keys = keys >> 2
+        if len(keys):
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+            keys = keys[starts]
+            x = np.add.reduceat(x, starts)
+            y = np.add.reduceat(y, starts)
+            count = np.add.reduceat(count, starts)
+            ids = np.add.reduceat(ids, starts)
+        levels[zoom] = _Level(keys, x, y, count, ids)
+    return levels
+
+
+class ClusterIndex(RestaurantIndex):
+    """Hierarchical grid clusters of active restaurants for map tiles"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._levels = _build_levels(
+            np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+        )
+        # zoom -> tile key -> cell key -> CellDelta, applied on top of _levels
+        self._overlay: List[Dict[int, Dict[int, CellDelta]]] = [
+            {} for _ in range(CLUSTER_MAX_ZOOM + 1)
+        ]
+        self._changes = 0
+
+    def _rebuild_from_points(self) -> None:
+        ids = np.fromiter(self._points.keys(), dtype=np.int64, count=len(self._points))
+        xy = np.array(list(self._points.values()), dtype=np.float64).reshape(-1, 2)
+        self._levels = _build_levels(ids, xy[:, 0], xy[:, 1])
+        self._overlay = [{} for _ in range(CLUSTER_MAX_ZOOM + 1)]
+        self._changes = 0
+
+    def rebuild(self, records: List[RestaurantRecord]) -> None:
+        located = [
+            r for r in records
+            if r.is_active and r.latitude is not None and r.longitude is not None
+        ]
+        x, y = project(
+            np.array([r.latitude for r in located], dtype=np.float64),
+            np.array([r.longitude for r in located], dtype=np.float64),
+        )
+        points = {r.id: (float(px), float(py)) for r, px, py in zip(located, x, y)}
+        with self._lock:
+            self._points = points
+            self._rebuild_from_points()
+
+    def _adjust(self, restaurant_id: int, x: float, y: float, sign: int) -> None:
+        key = int(_deepest_keys(np.array([x]), np.array([y]))[0])
+        for zoom in range(CLUSTER_MAX_ZOOM, -1, -1):
+            tile = self._overlay[zoom].setdefault(key >> _TILE_SHIFT, {})
+            delta = tile.setdefault(key, [0.0, 0.0, 0, 0])
+            delta[0] += sign * x
+            delta[1] += sign * y
+            delta[2] += sign
+            delta[3] += sign * restaurant_id
+            key >>= 2
+
+    def apply(self, upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+        updates: Dict[int, Optional[Tuple[float, float]]] = {i: None for i in deleted_ids}
+        for r in upserts:
+            if r.is_active and r.latitude is not None and r.longitude is not None:
+                x, y = project(np.array([r.latitude]), np.array([r.longitude]))
+                updates[r.id] = (float(x[0]), float(y[0]))
+            else:
+                updates[r.id] = None
+
+        with self._lock:
+            for restaurant_id, point in updates.items():
+                old = self._points.get(restaurant_id)
+                if old == point:
+                    continue
+                if old is not None:
+                    del self._points[restaurant_id]
+                    self._adjust(restaurant_id, old[0], old[1], -1)
+                if point is not None:
+                    self._points[restaurant_id] = point
+                    self._adjust(restaurant_id, point[0], point[1], 1)
+                self._changes += 1
+
+            if self._changes > CLUSTER_OVERLAY_MAX_CHANGES:
+                self._rebuild_from_points()
+
+    def _tile_cells(self, zoom: int, tile_key: int) -> Tuple[np.ndarray, ...]:
+        """sum_x, sum_y, count and sum_id of the non-empty cells of one tile"""
+        with self._lock:
+            level = self._levels[zoom]
+            overlay = {
+                key: list(delta)
+                for key, delta in self._overlay[zoom].get(tile_key, {}).items()
+            }
+
+        cells = level.tile_slice(tile_key)
+        columns = (level.sum_x[cells], level.sum_y[cells], level.count[cells], level.sum_id[cells])
+        if not overlay:
+            return columns
+
+        merged = {
+            int(key): [sx, sy, n, si]
+            for key, sx, sy, n, si in zip(level.keys[cells].tolist(), *(c.tolist() for c in columns))
+        }
+        for key, delta in overlay.items():
+            cell = merged.setdefault(key, [0.0, 0.0, 0, 0])
+            for i in range(4):
+                cell[i] += delta[i]
+        rows = [cell for cell in merged.values() if cell[2] > 0]
+        return (
+            np.array([r[0] for r in rows], dtype=np.float64),
+            np.array([r[1] for r in rows], dtype=np.float64),
+            np.array([r[2] for r in rows], dtype=np.int64),
+            np.array([r[3] for r in rows], dtype=np.int64),
+        )
+
+    def tile(self, zoom: int, x: int, y: int) -> List[Cluster]:
+        """
+        Clusters of one XYZ tile as (lat, lon, count, id when count == 1)
+
+        Above CLUSTER_MAX_ZOOM the cells of the deepest level whose centroid
+        falls inside the tile are returned; they are at most a few metres
+        wide by then.
+        """
+        depth = max(zoom - CLUSTER_MAX_ZOOM, 0)
+        level_zoom = zoom - depth
+        tile_key = int(morton(np.array([x >> depth]), np.array([y >> depth]))[0])
+        sum_x, sum_y, count, sum_id = self._tile_cells(level_zoom, tile_key)
+
+        cx, cy = sum_x / count, sum_y / count
+        if depth:
+            scale = 1 << zoom
+            inside = (
+                (cx >= x / scale) & (cx < (x + 1) / scale)
+                & (cy >= y / scale) & (cy < (y + 1) / scale)
+            )
+            cx, cy, count, sum_id = cx[inside], cy[inside], count[inside], sum_id[inside]
+
+        lat, lon = unproject(cx, cy)
+        return [
+            (round(la, 6), round(lo, 6), n, i if n == 1 else None)
+            for la, lo, n, i in zip(lat.tolist(), lon.tolist(), count.tolist(), sum_id.tolist())
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "points": len(self._points),
+                "cells": sum(len(level.keys) for level in self._levels),
+                "pending_changes": self._changes,
+            }
+
+
+# Global cluster index instance
+cluster_index = register_index(ClusterIndex())
@@ -1,11 +1,17 @@
 import smtplib
 import secrets
-from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
 
+from app.utils.email_templates import (
+    PASSWORD_RESET_TEMPLATE,
+    VERIFY_EMAIL_TEMPLATE,
+    build_mime_message,
+    email_templates,
+)
+
 load_dotenv()
 
 
@@ -24,6 +30,42 @@ class EmailService:
         """Generate a secure random token for email verification or password reset"""
         return secrets.token_urlsafe(32)
 
+    def build_message(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None
+    ) -> MIMEMultipart:
+        """Assemble a multipart/alternative message for send_email"""
+        return build_mime_message(
+            self.from_email, to_email, subject, html_content, text_content
+        )
+
+    def connect(self) -> smtplib.SMTP:
+        """Open an authenticated SMTP connection; the caller closes it"""
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def render(self, template: str, context: dict) -> Tuple[str, str, str]:
+        """
+        Render a named template from the template cache
+
+        Args:
+            template: VERIFY_EMAIL_TEMPLATE or PASSWORD_RESET_TEMPLATE
+            context: Template variables, e.g. {"verification_token": ...}
+
+        Returns:
+            tuple: subject, HTML content and plain text content
+        """
+        return email_templates.get(template).render(self.template_values(context))
+
     def send_email(
         self,
         to_email: str,
@@ -34,6 +76,9 @@ class EmailService:
         """
         Send an email using SMTP
 
+        Opens a new connection per message; bulk sending goes through the
+        email outbox worker, which reuses one connection.
+
         Args:
             to_email: Recipient email address
             subject: Email subject
@@ -44,24 +89,10 @@ class EmailService:
             bool: True if email sent successfully, False otherwise
         """
         try:
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = subject
-            message["From"] = self.from_email
-            message["To"] = to_email
-
-            # Add text and HTML parts
-            if text_content:
-                text_part = MIMEText(text_content, "plain")
-                message.attach(text_part)
-
-            html_part = MIMEText(html_content, "html")
-            message.attach(html_part)
+            message = self.build_message(to_email, subject, html_content, text_content)
 
             # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
+            with self.connect() as server:
                 server.send_message(message)
 
             return True
@@ -81,96 +112,7 @@ class EmailService:
         Returns:
             bool: True if email sent successfully
         """
-        verification_link = f"{self.frontend_url}/verify-email?token={verification_token}"
-
-        subject = "Verify Your Email - Restaurant Reservation"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                }}
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }}
-                .header {{
-                    background-color: #4F46E5;
-                    color: white;
-                    padding: 20px;
-                    text-align: center;
-                    border-radius: 5px 5px 0 0;
-                }}
-                .content {{
-                    background-color: #f9fafb;
-                    padding: 30px;
-                    border-radius: 0 0 5px 5px;
-                }}
-                .button {{
-                    display: inline-block;
-                    padding: 12px 30px;
-                    background-color: #4F46E5;
-                    color: white;
-                    text-decoration: none;
-                    border-radius: 5px;
-                    margin: 20px 0;
-                }}
-                .footer {{
-                    text-align: center;
-                    margin-top: 20px;
-                    color: #666;
-                    font-size: 12px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Welcome to Restaurant Reservation!</h1>
-                </div>
-                <div class="content">
-                    <h2>Verify Your Email Address</h2>
-                    <p>Thank you for registering! Please click the button below to verify your email address:</p>
-                    <a href="{verification_link}" class="button">Verify Email</a>
-                    <p>Or copy and paste this link into your browser:</p>
-                    <p style="word-break: break-all; color: #4F46E5;">{verification_link}</p>
-                    <p><strong>This link will expire in 24 hours.</strong></p>
-                    <p>If you didn't create an account, you can safely ignore this email.</p>
-                </div>
-                <div class="footer">
-                    <p>Restaurant Reservation System</p>
-                    <p>This is an automated message, please do not reply.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        text_content = f"""
-        Welcome to Restaurant Reservation!
-
-        Verify Your Email Address
-
-        Thank you for registering! Please visit the following link to verify your email address:
-
-        {verification_link}
-
-        This link will expire in 24 hours.
-
-        If you didn't create an account, you can safely ignore this email.
-
-        ---
-        Restaurant Reservation System
-        This is an automated message, please do not reply.
-        """
-
-        return self.send_email(to_email, subject, html_content, text_content)
+        return self.send_email(to_email, *self.render_verification_email(verification_token))
 
     def send_password_reset_email(self, to_email: str, reset_token: str) -> bool:
         """
@@ -183,104 +125,48 @@ class EmailService:
         Returns:
             bool: True if email sent successfully
         """
-        reset_link = f"{self.frontend_url}/reset-password?token={reset_token}"
-
-        subject = "Reset Your Password - Restaurant Reservation"
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                }}
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }}
-                .header {{
-                    background-color: #DC2626;
-                    color: white;
-                    padding: 20px;
-                    text-align: center;
-                    border-radius: 5px 5px 0 0;
-                }}
-                .content {{
-                    background-color: #f9fafb;
-                    padding: 30px;
-                    border-radius: 0 0 5px 5px;
-                }}
-                .button {{
-                    display: inline-block;
-                    padding: 12px 30px;
-                    background-color: #DC2626;
-                    color: white;
-                    text-decoration: none;
-                    border-radius: 5px;
-                    margin: 20px 0;
-                }}
-                .footer {{
-                    text-align: center;
-                    margin-top: 20px;
-                    color: #666;
-                    font-size: 12px;
-                }}
-                .warning {{
-                    background-color: #FEF2F2;
-                    border-left: 4px solid #DC2626;
-                    padding: 15px;
-                    margin: 15px 0;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Password Reset Request</h1>
-                </div>
-                <div class="content">
-                    <h2>Reset Your Password</h2>
-                    <p>We received a request to reset your password. Click the button below to create a new password:</p>
-                    <a href="{reset_link}" class="button">Reset Password</a>
-                    <p>Or copy and paste this link into your browser:</p>
-                    <p style="word-break: break-all; color: #DC2626;">{reset_link}</p>
-                    <p><strong>This link will expire in 1 hour.</strong></p>
-                    <div class="warning">
-                        <strong>Security Notice:</strong>
-                        <p>If you didn't request this password reset, please ignore this email. Your password will remain unchanged.</p>
-                    </div>
-                </div>
-                <div class="footer">
-                    <p>Restaurant Reservation System</p>
-                    <p>This is an automated message, please do not reply.</p>
-                </div>
-            </div>
-        </body>
-        </html>
+        return self.send_email(to_email, *self.render_password_reset_email(reset_token))
+
+    def template_values(self, context: dict) -> dict:
+        """Template fields for an outbox context; tokens become frontend links"""
+        values = dict(context)
+        if "verification_token" in context:
+            values["verification_link"] = (
+                f"{self.frontend_url}/verify-email?token={context['verification_token']}"
+            )
+        if "reset_token" in context:
+            values["reset_link"] = f"{self.frontend_url}/reset-password?token={context['reset_token']}"
+        return values
+
+    def render_message(self, template: str, to_email: str, context: dict) -> bytes:
+        """SMTP-ready bytes of a named template, built from the pre-encoded cache"""
+        return email_templates.get(template).render_message(
+            str(self.from_email), to_email, self.template_values(context)
+        )
+
+    def render_batch(self, template: str, recipients: Iterable[Tuple[str, dict]]) -> List[bytes]:
         """
+        Render one template for many recipients
 
-        text_content = f"""
-        Password Reset Request
-
-        We received a request to reset your password. Visit the following link to create a new password:
-
-        {reset_link}
-
-        This link will expire in 1 hour.
-
-        Security Notice:
-        If you didn't request this password reset, please ignore this email. Your password will remain unchanged.
+        Args:
+            template: Template name
+            recipients: (to_email, context) pairs
 
-        ---
-        Restaurant Reservation System
-        This is an automated message, please do not reply.
+        Returns:
+            list: SMTP-ready message bytes, in recipient order
         """
-
-        return self.send_email(to_email, subject, html_content, text_content)
+        return email_templates.get(template).render_batch(
+            str(self.from_email),
+            ((to_email, self.template_values(context)) for to_email, context in recipients),
+        )
+
+    def render_verification_email(self, verification_token: str) -> Tuple[str, str, str]:
+        """Subject, HTML and text of the email verification message"""
+        return self.render(VERIFY_EMAIL_TEMPLATE, {"verification_token": verification_token})
+
+    def render_password_reset_email(self, reset_token: str) -> Tuple[str, str, str]:
+        """Subject, HTML and text of the password reset message"""
+        return self.render(PASSWORD_RESET_TEMPLATE, {"reset_token": reset_token})
 
 
 # Singleton instance
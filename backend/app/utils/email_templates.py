@@ -0,0 +1,242 @@
+"""
+Compiled email templates
+
+Templates live in app/templates/email as <name>.html and <name>.txt with
+string.Template style ${field} placeholders. Each one is read and split
+into static chunks once. For a given sender, the complete multipart
+message around the fields is also pre-encoded, so rendering a message
+comes down to joining cached bytes with the escaped per-recipient values.
+"""
+
+import html
+import os
+import re
+import secrets
+import threading
+from email import policy
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "email")
+
+# Template names stored in email_outbox.template
+VERIFY_EMAIL_TEMPLATE = "verify_email"
+PASSWORD_RESET_TEMPLATE = "password_reset"
+
+TEMPLATE_SUBJECTS = {
+    VERIFY_EMAIL_TEMPLATE: "Verify Your Email - Restaurant Reservation",
+    PASSWORD_RESET_TEMPLATE: "Reset Your Password - Restaurant Reservation",
+}
+
+# ${field}, $field or $$ (a literal dollar sign)
+_PLACEHOLDER = re.compile(r"\$(?:\{(\w+)\}|(\w+)|(\$))")
+# Longer values could push a line past the 998 octet SMTP limit once HTML-escaped
+MAX_INLINE_VALUE_LENGTH = 150
+
+# (static chunk, field that follows it or None, whether the field is HTML-escaped)
+WirePart = Tuple[bytes, Optional[str], bool]
+
+
+def build_mime_message(
+    from_email: str,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None,
+) -> MIMEMultipart:
+    """Standard library multipart/alternative message with text and HTML parts"""
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = from_email
+    message["To"] = to_email
+
+    # Add text and HTML parts
+    if text_content:
+        message.attach(MIMEText(text_content, "plain"))
+    message.attach(MIMEText(html_content, "html"))
+    return message
+
+
+def _split(source: str) -> List[Tuple[str, Optional[str]]]:
+    """Split a template into (static text, following field or None) pairs"""
+    parts = []
+    literal = ""
+    position = 0
+    for match in _PLACEHOLDER.finditer(source):
+        literal += source[position:match.start()]
+        position = match.end()
+        if match.group(3):
+            literal += "$"
+            continue
+        parts.append((literal, match.group(1) or match.group(2)))
+        literal = ""
+    parts.append((literal + source[position:], None))
+    return parts
+
+
+def _is_7bit_value(value: str, boundary: str) -> bool:
+    return (
+        value.isascii()
+        and len(value) <= MAX_INLINE_VALUE_LENGTH
+        and "\r" not in value
+        and "\n" not in value
+        and boundary not in value
+    )
+
+
+class CompiledTemplate:
+    """One template body split into static chunks and field names"""
+
+    def __init__(self, source: str):
+        self.parts = _split(source)
+        self.fields = {field for _, field in self.parts if field}
+
+    def render(self, values: Dict[str, str], escape: bool = False) -> str:
+        chunks = []
+        for literal, field in self.parts:
+            chunks.append(literal)
+            if field:
+                value = str(values[field])
+                chunks.append(html.escape(value) if escape else value)
+        return "".join(chunks)
+
+
+class EmailTemplate:
+    """
+    Subject plus compiled text and HTML bodies of one email
+
+    render() returns strings; render_message() returns the SMTP-ready
+    bytes. It uses the pre-encoded 7bit message when every value is plain
+    ASCII on one line and falls back to the standard MIMEText encoding
+    otherwise (e.g. a non-ASCII name).
+    """
+
+    def __init__(self, name: str, subject: str, text_source: str, html_source: str):
+        self.name = name
+        self.subject = subject
+        self.text = CompiledTemplate(text_source)
+        self.html = CompiledTemplate(html_source)
+        self.fields = self.text.fields | self.html.fields
+        self._wire: Dict[str, Tuple[str, List[WirePart]]] = {}
+        self._lock = threading.Lock()
+
+    def render(self, values: Dict[str, str]) -> Tuple[str, str, str]:
+        """Subject, HTML content (values escaped) and plain text content"""
+        return self.subject, self.html.render(values, escape=True), self.text.render(values)
+
+    def _compile_wire(self, from_email: str) -> Optional[Tuple[str, List[WirePart]]]:
+        """Pre-encode everything but To and the fields, or None if it is not 7bit ASCII"""
+        static = [self.subject, from_email] + [
+            literal for literal, _ in self.text.parts + self.html.parts
+        ]
+        if not all(text.isascii() for text in static) or any(
+            "\r" in text or "\n" in text for text in (self.subject, from_email)
+        ):
+            return None
+
+        boundary = "===============" + "".join(secrets.choice("0123456789") for _ in range(19)) + "=="
+        parts: List[WirePart] = []
+        pending = (
+            f'Content-Type: multipart/alternative; boundary="{boundary}"\n'
+            "MIME-Version: 1.0\n"
+            f"Subject: {self.subject}\n"
+            f"From: {from_email}\n"
+            "To: "
+        )
+        parts.append((pending, "to_email", False))
+        pending = "\n\n"
+
+        for body, subtype, escape in ((self.text, "plain", False), (self.html, "html", True)):
+            pending += (
+                f"--{boundary}\n"
+                f'Content-Type: text/{subtype}; charset="us-ascii"\n'
+                "MIME-Version: 1.0\n"
+                "Content-Transfer-Encoding: 7bit\n\n"
+            )
+            for literal, field in body.parts:
+                pending += literal
+                if field:
+                    parts.append((pending, field, escape))
+                    pending = ""
+            pending += "\n"
+        pending += f"--{boundary}--\n"
+        parts.append((pending, None, False))
+
+        # SMTP wants CRLF line endings
+        wire = [
+            (literal.replace("\r\n", "\n").replace("\n", "\r\n").encode("ascii"), field, escape)
+            for literal, field, escape in parts
+        ]
+        return boundary, wire
+
+    def _wire_for(self, from_email: str) -> Optional[Tuple[str, List[WirePart]]]:
+        if from_email not in self._wire:
+            with self._lock:
+                if from_email not in self._wire:
+                    self._wire[from_email] = self._compile_wire(from_email)
+        return self._wire[from_email]
+
+    def render_message(self, from_email: str, to_email: str, values: Dict[str, str]) -> bytes:
+        compiled = self._wire_for(from_email)
+        if compiled is not None:
+            boundary, wire = compiled
+            inline = {"to_email": to_email}
+            for field in self.fields:
+                value = str(values[field])
+                if not _is_7bit_value(value, boundary):
+                    break
+                inline[field] = value
+            else:
+                if _is_7bit_value(to_email, boundary):
+                    chunks = []
+                    for literal, field, escape in wire:
+                        chunks.append(literal)
+                        if field:
+                            value = inline[field]
+                            chunks.append((html.escape(value) if escape else value).encode("ascii"))
+                    return b"".join(chunks)
+
+        subject, html_content, text_content = self.render(values)
+        message = build_mime_message(from_email, to_email, subject, html_content, text_content)
+        return message.as_bytes(policy=policy.SMTP)
+
+    def render_batch(
+        self, from_email: str, recipients: Iterable[Tuple[str, Dict[str, str]]]
+    ) -> List[bytes]:
+        """render_message for each (to_email, values) pair"""
+        return [self.render_message(from_email, to_email, values) for to_email, values in recipients]
+
+
+class TemplateCache:
+    """Loads and compiles each template on first use, then serves it from memory"""
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR):
+        self.template_dir = template_dir
+        self._templates: Dict[str, EmailTemplate] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, filename: str) -> str:
+        with open(os.path.join(self.template_dir, filename), encoding="utf-8") as f:
+            return f.read()
+
+    def get(self, name: str) -> EmailTemplate:
+        template = self._templates.get(name)
+        if template is not None:
+            return template
+
+        if name not in TEMPLATE_SUBJECTS:
+            raise ValueError(f"Unknown email template '{name}'")
+        with self._lock:
+            if name not in self._templates:
+                self._templates[name] = EmailTemplate(
+                    name,
+                    TEMPLATE_SUBJECTS[name],
+                    self._read(f"{name}.txt"),
+                    self._read(f"{name}.html"),
+                )
+            return self._templates[name]
+
+
+# Global template cache instance
+email_templates = TemplateCache()
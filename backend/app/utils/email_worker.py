@@ -0,0 +1,353 @@
+"""
+Email outbox: queueing and delivery
+
+Request handlers call enqueue_email inside their own transaction, so an
+email exists exactly when the token it carries was committed. The worker
+drains due rows in batches over one reused SMTP connection, retries
+failures with exponential backoff, gives up at once on permanent (5xx)
+rejections and deletes old sent and failed rows.
+
+Runs as one dedicated process:
+
+    python -m app.utils.email_worker --once
+    python -m app.utils.email_worker --interval 5
+
+or inside the API process when EMAIL_OUTBOX_POLL_SECONDS > 0 (see main.py).
+That starts a worker in every uvicorn worker, so it is only meant for
+single-worker deployments.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import smtplib
+import time
+from contextlib import suppress
+from datetime import datetime, timezone, timedelta
+from typing import List, Optional
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.email_outbox import EmailOutbox, OutboxStatus
+from app.utils.email_service import EmailService, email_service
+import app.models  # noqa: F401 — registers all models with SQLAlchemy's mapper
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Poll interval of the worker inside the API process; 0 leaves it to the standalone worker
+EMAIL_OUTBOX_POLL_SECONDS = int(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "0"))
+STANDALONE_POLL_SECONDS = 5
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+EMAIL_RETRY_BASE_SECONDS = 30
+EMAIL_RETRY_MAX_SECONDS = 3600
+# A claimed row is due again after this long, in case its worker died mid-batch
+EMAIL_SEND_LEASE_SECONDS = 300
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "7"))
+EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS = 3600
+# Replaces the context of sent and failed rows; the context holds the token
+SCRUBBED_CONTEXT = "{}"
+# Reconnect instead of reusing a connection the server has likely dropped
+SMTP_IDLE_TIMEOUT_SECONDS = 60
+
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    Whether the connection is unusable, so the rest of the batch has to wait
+
+    SMTPException subclasses OSError, but a reply error (e.g. 550 for one
+    recipient) leaves the connection usable: smtplib resets it with RSET.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def is_permanent_rejection(error: Exception) -> bool:
+    """Whether the server refused this message for good (5xx), so retrying cannot help"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500 and not is_connection_error(error)
+    return False
+
+
+def _utc_now_naive() -> datetime:
+    # DB stores naive UTC datetimes
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_email(db: Session, to_email: str, template: str, context: dict) -> EmailOutbox:
+    """Add an outbox row to the caller's transaction; it is sent once committed"""
+    entry = EmailOutbox(to_email=to_email, template=template, context=json.dumps(context))
+    db.add(entry)
+    return entry
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: 30s, 60s, 120s, ... capped at one hour"""
+    seconds = EMAIL_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, EMAIL_RETRY_MAX_SECONDS))
+
+
+class SMTPSession:
+    """
+    One SMTP connection reused across messages and batches
+
+    STARTTLS and LOGIN run once per connection instead of once per message.
+    """
+
+    def __init__(self, service: EmailService = email_service):
+        self.service = service
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def send(self, to_email: str, message: bytes) -> None:
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT_SECONDS:
+            self.close()
+
+        reused = self._server is not None
+        if self._server is None:
+            self._server = self.service.connect()
+        try:
+            self._server.sendmail(self.service.from_email, [to_email], message)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            self.close()
+            if not reused:
+                raise
+            # The server closed the reused connection; retry once on a fresh one
+            try:
+                self._server = self.service.connect()
+                self._server.sendmail(self.service.from_email, [to_email], message)
+            except Exception as retry_error:
+                if is_connection_error(retry_error):
+                    self.close()
+                raise
+        self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self._server is not None:
+            with suppress(Exception):
+                self._server.quit()
+            self._server = None
+
+
+def claim_due_emails(db: Session, batch_size: int) -> List[tuple]:
+    """
+    Mark a batch of due rows SENDING and commit; returns (id, to_email, template, context, attempts)
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    workers can drain the same table, and the locks are released before any
+    SMTP traffic. A claim is a lease: rows of a worker that died mid-batch
+    become due again after EMAIL_SEND_LEASE_SECONDS.
+    """
+    now = _utc_now_naive()
+    entries = db.scalars(
+        select(EmailOutbox)
+        .where(
+            EmailOutbox.status.in_([OutboxStatus.PENDING, OutboxStatus.SENDING]),
+            EmailOutbox.next_attempt_at <= now,
+        )
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+    claimed = []
+    for entry in entries:
+        entry.status = OutboxStatus.SENDING
+        entry.attempts += 1
+        entry.next_attempt_at = now + timedelta(seconds=EMAIL_SEND_LEASE_SECONDS)
+        claimed.append((entry.id, entry.to_email, entry.template, entry.context, entry.attempts))
+    db.commit()
+    return claimed
+
+
+def _finish(db: Session, entry_id: int, **values) -> None:
+    # Only rows still under this worker's claim
+    db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == entry_id, EmailOutbox.status == OutboxStatus.SENDING)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def drain_outbox(smtp: SMTPSession, batch_size: int = EMAIL_OUTBOX_BATCH_SIZE) -> dict:
+    """
+    Send one batch of due outbox rows
+
+    Claims the batch in one transaction, sends outside of any transaction
+    and records the outcomes in another. Sent and failed rows lose their
+    context, which holds the single-use token.
+
+    Returns:
+        dict: Number of emails sent, scheduled for retry and given up on
+    """
+    result = {"sent": 0, "retried": 0, "failed": 0}
+    db = SessionLocal()
+    try:
+        claimed = claim_due_emails(db, batch_size)
+
+        sent_ids = []
+        for i, (entry_id, to_email, template, context, attempts) in enumerate(claimed):
+            try:
+                message = email_service.render_message(template, to_email, json.loads(context))
+                smtp.send(to_email, message)
+            except Exception as e:
+                now = _utc_now_naive()
+                if attempts >= EMAIL_MAX_ATTEMPTS or is_permanent_rejection(e):
+                    _finish(
+                        db, entry_id, status=OutboxStatus.FAILED,
+                        context=SCRUBBED_CONTEXT, last_error=str(e)[:1000],
+                    )
+                    result["failed"] += 1
+                    logger.error(f"Giving up on {template} email to {to_email}: {str(e)}")
+                else:
+                    _finish(
+                        db, entry_id, status=OutboxStatus.PENDING,
+                        next_attempt_at=now + retry_delay(attempts), last_error=str(e)[:1000],
+                    )
+                    result["retried"] += 1
+                    logger.warning(
+                        f"Failed to send {template} email to {to_email} "
+                        f"(attempt {attempts}): {str(e)}"
+                    )
+                if is_connection_error(e):
+                    # The rest of the batch was not tried; hand it back as it was
+                    for entry_id, *_, attempts in claimed[i + 1:]:
+                        _finish(
+                            db, entry_id, status=OutboxStatus.PENDING,
+                            attempts=attempts - 1, next_attempt_at=now,
+                        )
+                    break
+            else:
+                sent_ids.append(entry_id)
+
+        if sent_ids:
+            db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(sent_ids), EmailOutbox.status == OutboxStatus.SENDING)
+                .values(
+                    status=OutboxStatus.SENT, sent_at=_utc_now_naive(), context=SCRUBBED_CONTEXT
+                )
+                .execution_options(synchronize_session=False)
+            )
+            result["sent"] = len(sent_ids)
+        db.commit()
+
+        if claimed:
+            logger.info(
+                f"Email outbox: sent {result['sent']}, "
+                f"retried {result['retried']}, failed {result['failed']}"
+            )
+        return result
+    except Exception as e:
+        logger.error(f"Error draining email outbox: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def purge_outbox(batch_size: int = EMAIL_OUTBOX_BATCH_SIZE * 20) -> int:
+    """Delete sent and failed rows older than EMAIL_OUTBOX_RETENTION_DAYS, in bounded chunks"""
+    total = 0
+    cutoff = _utc_now_naive() - timedelta(days=EMAIL_OUTBOX_RETENTION_DAYS)
+    db = SessionLocal()
+    try:
+        while True:
+            ids = db.scalars(
+                select(EmailOutbox.id)
+                .where(
+                    EmailOutbox.status.in_([OutboxStatus.SENT, OutboxStatus.FAILED]),
+                    EmailOutbox.created_at < cutoff,
+                )
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                break
+
+            db.execute(
+                delete(EmailOutbox)
+                .where(EmailOutbox.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            total += len(ids)
+    except Exception as e:
+        logger.error(f"Error purging email outbox: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if total:
+        logger.info(f"Email outbox: deleted {total} sent or failed emails")
+    return total
+
+
+async def run_email_worker(
+    interval_seconds: int = EMAIL_OUTBOX_POLL_SECONDS,
+    batch_size: int = EMAIL_OUTBOX_BATCH_SIZE,
+) -> None:
+    """Drain the outbox forever; full batches are followed immediately by the next one"""
+    smtp = SMTPSession()
+    next_purge_at = 0.0
+    try:
+        while True:
+            try:
+                if time.monotonic() >= next_purge_at:
+                    next_purge_at = time.monotonic() + EMAIL_OUTBOX_PURGE_INTERVAL_SECONDS
+                    await run_in_threadpool(purge_outbox)
+                result = await run_in_threadpool(drain_outbox, smtp, batch_size)
+                if sum(result.values()) >= batch_size and not result["retried"]:
+                    continue
+            except Exception:
+                # Already logged; keep the loop alive and try again next interval
+                pass
+            await asyncio.sleep(interval_seconds)
+    finally:
+        smtp.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Send emails queued in the email_outbox table")
+    parser.add_argument("--once", action="store_true", help="Send a single batch and exit")
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=EMAIL_OUTBOX_POLL_SECONDS or STANDALONE_POLL_SECONDS,
+        help="Seconds between polls once the outbox is drained",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=EMAIL_OUTBOX_BATCH_SIZE,
+        help="Emails claimed per transaction",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        smtp = SMTPSession()
+        try:
+            drain_outbox(smtp, args.batch_size)
+            purge_outbox()
+        finally:
+            smtp.close()
+    else:
+        asyncio.run(run_email_worker(args.interval, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
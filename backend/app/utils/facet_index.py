@@ -0,0 +1,132 @@
+"""
+Filter option counts (facets) for the restaurant search
+
+Computed from the columns of the restaurant catalog snapshot, where
+cuisine and city are integer codes and price_range a small integer. A
+request computes every facet from one pass over them: each row gets the
+number of selected filters it fails, rows failing none are the result set,
+and each facet additionally counts the rows failing only its own filter.
+This gives disjunctive facets (selecting Italian still shows how many
+Japanese there are) with one np.bincount per facet instead of one
+GROUP BY per facet.
+
+Results are cached per filter selection. The cache is emptied whenever the
+catalog snapshot's generation changes, i.e. with every restaurant change
+the catalog receives from the change feed, and a result computed while a
+change was written is not cached.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.utils.catalog import CatalogSnapshot, catalog
+
+load_dotenv()
+
+FACET_CACHE_MAX_SIZE = int(os.getenv("FACET_CACHE_MAX_SIZE", "1024"))
+
+FACETS = ("cuisine", "price_range", "city")
+
+# facet -> [(value, count)], most common first
+FacetCounts = Dict[str, List[Tuple[object, int]]]
+
+
+def _compute(snapshot: CatalogSnapshot, selected: Dict[str, Sequence]) -> Tuple[int, FacetCounts]:
+    columns = snapshot.columns
+    # Inactive rows fail two filters, so no facet counts them
+    failed = np.where(columns["alive"], 0, 2).astype(np.int8)
+    passes = {}
+    for facet, values in selected.items():
+        if facet == "price_range":
+            passes[facet] = np.isin(columns[facet], np.array(values, dtype=np.int8))
+        else:
+            passes[facet] = np.isin(columns[facet], snapshot.tables[facet].lookup(values))
+        failed += ~passes[facet]
+
+    matched = failed == 0
+    total = int(matched.sum())
+    counts: FacetCounts = {}
+    for facet in FACETS:
+        rows = matched
+        if facet in passes:
+            rows = matched | ((failed == 1) & ~passes[facet])
+        # np.compress beats boolean indexing on scattered masks
+        by_code = np.bincount(np.compress(rows, columns[facet]).astype(np.intp)).tolist()
+        # price_range is its own code
+        values = range(len(by_code)) if facet == "price_range" else snapshot.tables[facet].values
+        by_value = {value: count for value, count in zip(values, by_code) if count}
+        # Selected values stay listed even when nothing matches them
+        for value in selected.get(facet, ()):
+            by_value.setdefault(value, 0)
+        counts[facet] = sorted(by_value.items(), key=lambda item: (-item[1], str(item[0])))
+    return total, counts
+
+
+class FacetIndex:
+    """Disjunctive cuisine / price range / city counts with a generation-checked cache"""
+
+    def __init__(self, cache_size: int = FACET_CACHE_MAX_SIZE):
+        self.cache_size = cache_size
+        # Catalog generation the cached results were computed from
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple, Tuple[int, FacetCounts]] = OrderedDict()
+
+    def counts(
+        self,
+        cuisine: Optional[Sequence[str]] = None,
+        price_range: Optional[Sequence[int]] = None,
+        city: Optional[Sequence[str]] = None,
+    ) -> Tuple[int, FacetCounts]:
+        """Number of matching restaurants and the counts of every facet for a filter selection"""
+        selected = {
+            facet: tuple(sorted(set(values)))
+            for facet, values in (("cuisine", cuisine), ("price_range", price_range), ("city", city))
+            if values
+        }
+        signature = tuple(sorted(selected.items()))
+        snapshot = catalog.snapshot
+        # Changes update the snapshot in place, so its generation is read once, before the columns
+        generation = snapshot.generation
+
+        with self._lock:
+            if generation > self.generation:
+                self._cache.clear()
+                self.generation = generation
+            cached = self._cache.get(signature)
+            if cached is not None:
+                self._cache.move_to_end(signature)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        result = _compute(snapshot, selected)
+        with self._lock:
+            # Skip caching if the snapshot changed meanwhile
+            if generation == self.generation == snapshot.generation:
+                self._cache[signature] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "generation": self.generation,
+                "cache_size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Global facet index instance
+facet_index = FacetIndex()
@@ -0,0 +1,254 @@
+"""
+In-memory geospatial index of active restaurants
+
+Points are bucketed into a fixed lat/lon grid and stored sorted by cell
+id, so the cells a bounding box covers in one grid row form a contiguous
+id range found with np.searchsorted. Candidates are then filtered with
+vectorized haversine distances.
+
+Updates do not re-sort the base arrays: changed points are tombstoned in
+the base and appended to a small delta buffer that every query scans by
+brute force. The delta is merged into the base once it outgrows
+GEO_DELTA_MERGE_RATIO of it.
+"""
+
+import math
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.restaurant_events import RestaurantIndex, RestaurantRecord, register_index
+
+EARTH_RADIUS_M = 6_371_008.8
+# ~5.5 km of latitude per cell
+GEO_CELL_DEGREES = 0.05
+GRID_COLUMNS = int(round(360 / GEO_CELL_DEGREES))
+GEO_DELTA_MERGE_RATIO = 0.05
+GEO_DELTA_MIN_MERGE = 1024
+# First radius tried by nearest(), grown by KNN_RADIUS_GROWTH until k points are inside it
+KNN_START_RADIUS_M = 2_000.0
+KNN_RADIUS_GROWTH = 4
+
+
+def _cells(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    rows = np.floor((lat + 90.0) / GEO_CELL_DEGREES).astype(np.int64)
+    cols = np.minimum(np.floor((lon + 180.0) / GEO_CELL_DEGREES).astype(np.int64), GRID_COLUMNS - 1)
+    return rows * GRID_COLUMNS + cols
+
+
+def haversine_m(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances in metres from one point to many"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class _GeoState:
+    """Immutable snapshot of the index; writers replace it, readers keep a reference"""
+
+    __slots__ = (
+        "cells", "ids", "lats", "lons", "alive", "id_order",
+        "delta_ids", "delta_lats", "delta_lons",
+    )
+
+    def __init__(self, ids: np.ndarray, lats: np.ndarray, lons: np.ndarray):
+        cells = _cells(lats, lons)
+        order = np.argsort(cells, kind="stable")
+        self.cells = cells[order]
+        self.ids = ids[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        self.alive = np.ones(len(order), dtype=bool)
+        # Positions of the base points in id order, to find a point by id
+        self.id_order = np.argsort(self.ids, kind="stable")
+        self.delta_ids = np.empty(0, dtype=np.int64)
+        self.delta_lats = np.empty(0, dtype=np.float64)
+        self.delta_lons = np.empty(0, dtype=np.float64)
+
+    def clone(self) -> "_GeoState":
+        """Shallow copy with its own tombstone mask"""
+        state = _GeoState.__new__(_GeoState)
+        for name in _GeoState.__slots__:
+            setattr(state, name, getattr(self, name))
+        state.alive = self.alive.copy()
+        return state
+
+    def base_position(self, restaurant_id: int) -> Optional[int]:
+        i = np.searchsorted(self.ids, restaurant_id, sorter=self.id_order)
+        if i < len(self.ids) and self.ids[self.id_order[i]] == restaurant_id:
+            return int(self.id_order[i])
+        return None
+
+    def __len__(self) -> int:
+        return int(self.alive.sum()) + len(self.delta_ids)
+
+
+class GeoIndex(RestaurantIndex):
+    """Radius, k-nearest and bounding box queries over active restaurants"""
+
+    def __init__(self):
+        empty = np.empty(0, dtype=np.float64)
+        self._state = _GeoState(np.empty(0, dtype=np.int64), empty, empty)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def rebuild(self, records: List[RestaurantRecord]) -> None:
+        located = [
+            r for r in records
+            if r.is_active and r.latitude is not None and r.longitude is not None
+        ]
+        state = _GeoState(
+            np.fromiter((r.id for r in located), dtype=np.int64, count=len(located)),
+            np.fromiter((r.latitude for r in located), dtype=np.float64, count=len(located)),
+            np.fromiter((r.longitude for r in located), dtype=np.float64, count=len(located)),
+        )
+        with self._lock:
+            self._state = state
+
+    def apply(self, upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+        with self._lock:
+            state = self._state.clone()
+
+            changed = {r.id for r in upserts} | set(deleted_ids)
+            for restaurant_id in changed:
+                position = state.base_position(restaurant_id)
+                if position is not None:
+                    state.alive[position] = False
+            keep = ~np.isin(state.delta_ids, list(changed))
+
+            added = [
+                r for r in upserts
+                if r.is_active and r.latitude is not None and r.longitude is not None
+            ]
+            state.delta_ids = np.concatenate(
+                [state.delta_ids[keep], np.array([r.id for r in added], dtype=np.int64)]
+            )
+            state.delta_lats = np.concatenate(
+                [state.delta_lats[keep], np.array([r.latitude for r in added], dtype=np.float64)]
+            )
+            state.delta_lons = np.concatenate(
+                [state.delta_lons[keep], np.array([r.longitude for r in added], dtype=np.float64)]
+            )
+
+            if len(state.delta_ids) > max(GEO_DELTA_MIN_MERGE, GEO_DELTA_MERGE_RATIO * len(state.ids)):
+                state = _GeoState(
+                    np.concatenate([state.ids[state.alive], state.delta_ids]),
+                    np.concatenate([state.lats[state.alive], state.delta_lats]),
+                    np.concatenate([state.lons[state.alive], state.delta_lons]),
+                )
+            self._state = state
+
+    def _bbox_candidates(
+        self, state: _GeoState, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ids, lats and lons of base and delta points inside the box"""
+        min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+        row_min = int((min_lat + 90.0) // GEO_CELL_DEGREES)
+        row_max = int((max_lat + 90.0) // GEO_CELL_DEGREES)
+        col_min = min(int((min_lon + 180.0) // GEO_CELL_DEGREES), GRID_COLUMNS - 1)
+        col_max = min(int((max_lon + 180.0) // GEO_CELL_DEGREES), GRID_COLUMNS - 1)
+        # A box crossing the antimeridian covers two column ranges per row
+        col_ranges = (
+            [(col_min, col_max)] if min_lon <= max_lon
+            else [(col_min, GRID_COLUMNS - 1), (0, col_max)]
+        )
+
+        rows = np.arange(row_min, row_max + 1, dtype=np.int64) * GRID_COLUMNS
+        starts, ends = [], []
+        for first, last in col_ranges:
+            starts.append(np.searchsorted(state.cells, rows + first, side="left"))
+            ends.append(np.searchsorted(state.cells, rows + last, side="right"))
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        nonempty = ends > starts
+        starts, ends = starts[nonempty], ends[nonempty]
+
+        if len(starts):
+            lengths = ends - starts
+            # Expand the [start, end) ranges into one array of positions
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            positions = positions[state.alive[positions]]
+        else:
+            positions = np.empty(0, dtype=np.int64)
+
+        ids = np.concatenate([state.ids[positions], state.delta_ids])
+        lats = np.concatenate([state.lats[positions], state.delta_lats])
+        lons = np.concatenate([state.lons[positions], state.delta_lons])
+
+        inside = (lats >= min_lat) & (lats <= max_lat)
+        if min_lon <= max_lon:
+            inside &= (lons >= min_lon) & (lons <= max_lon)
+        else:
+            inside &= (lons >= min_lon) | (lons <= max_lon)
+        return ids[inside], lats[inside], lons[inside]
+
+    def bbox(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: Optional[int] = None
+    ) -> np.ndarray:
+        """Ids of restaurants inside the box; min_lon > max_lon crosses the antimeridian"""
+        ids, _, _ = self._bbox_candidates(self._state, min_lat, min_lon, max_lat, max_lon)
+        return ids if limit is None else ids[:limit]
+
+    def _within(self, state: _GeoState, lat: float, lon: float, radius_m: float):
+        angle = radius_m / EARTH_RADIUS_M
+        dlat = math.degrees(angle)
+        if lat + dlat >= 90.0 or lat - dlat <= -90.0:
+            # The circle contains a pole: every longitude is in range
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            # Widest longitude offset on the circle; it is reached poleward of
+            # the centre, so it exceeds the r / (R cos lat) of the centre's row
+            dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+            min_lon = (lon - dlon + 180.0) % 360.0 - 180.0
+            max_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+
+        ids, lats, lons = self._bbox_candidates(state, lat - dlat, min_lon, lat + dlat, max_lon)
+        distances = haversine_m(lat, lon, lats, lons)
+        inside = distances <= radius_m
+        return ids[inside], distances[inside]
+
+    def radius(
+        self, lat: float, lon: float, radius_m: float, limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and distances (m) of restaurants within radius_m, nearest first"""
+        ids, distances = self._within(self._state, lat, lon, radius_m)
+        if limit is not None and limit < len(ids):
+            nearest = np.argpartition(distances, limit)[:limit]
+            ids, distances = ids[nearest], distances[nearest]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+    def nearest(self, lat: float, lon: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and distances (m) of the k restaurants nearest to the point"""
+        state = self._state
+        radius_m = KNN_START_RADIUS_M
+        while True:
+            ids, distances = self._within(state, lat, lon, radius_m)
+            # Every point within radius_m was seen, so k hits inside it are the true k nearest
+            if len(ids) >= k or radius_m >= math.pi * EARTH_RADIUS_M:
+                break
+            radius_m *= KNN_RADIUS_GROWTH
+
+        if k < len(ids):
+            nearest = np.argpartition(distances, k)[:k]
+            ids, distances = ids[nearest], distances[nearest]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "points": len(state),
+            "base_points": len(state.ids),
+            "tombstones": int(len(state.ids) - state.alive.sum()),
+            "delta_points": len(state.delta_ids),
+        }
+
+
+# Global geo index instance
+geo_index = register_index(GeoIndex())
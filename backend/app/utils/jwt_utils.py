@@ -1,10 +1,15 @@
 import jwt
+import hashlib
+import secrets
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException
 import os
 from dotenv import load_dotenv
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.models.refresh_token import RefreshToken, TokenStatus
+from app.models.user import User
+from app.utils.refresh_grace import refresh_grace_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,48 +25,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
 
-def cleanup_old_tokens(user_id: int, db: Session) -> None:
-    """
-    Clean up expired and revoked tokens for a user.
-    This version ensures only ONE active token per user (single-device mode).
-    """
-    try:
-        now = datetime.now(timezone.utc)
-
-        # Mark expired tokens as EXPIRED (only if they're still ACTIVE)
-        # Convert now to naive datetime to match database format
-        now_naive = now.replace(tzinfo=None)
-        db.query(RefreshToken).filter(
-            RefreshToken.user_id == user_id,
-            RefreshToken.expires_at < now_naive,
-            RefreshToken.status == TokenStatus.ACTIVE,
-        ).update({"status": TokenStatus.EXPIRED})
-
-        # LIMIT to maximum 5 active tokens per user (instead of 1)
-        # This prevents issues with concurrent requests
-        active_tokens = db.query(RefreshToken).filter(
-            RefreshToken.user_id == user_id,
-            RefreshToken.status == TokenStatus.ACTIVE,
-        ).order_by(RefreshToken.created_at.desc()).all()
-        
-        # Revoke old tokens if more than 5 active tokens
-        if len(active_tokens) > 5:
-            for token in active_tokens[5:]:
-                token.status = TokenStatus.REVOKED
-
-        # Delete old tokens that are either expired or revoked and older than 7 days
-        cutoff_date = (now - timedelta(days=7)).replace(tzinfo=None)
-        db.query(RefreshToken).filter(
-            RefreshToken.user_id == user_id,
-            RefreshToken.status.in_([TokenStatus.EXPIRED, TokenStatus.REVOKED]),
-            RefreshToken.created_at < cutoff_date,
-        ).delete(synchronize_session=False)
-
-        db.commit()
-        logger.info(f"Cleaned up old tokens for user {user_id}")
-    except Exception as e:
-        logger.error(f"Error cleaning up old tokens for user {user_id}: {str(e)}")
-        db.rollback()
+def hash_refresh_token(token: str) -> bytes:
+    """Fixed-width digest used as the lookup key for a refresh token"""
+    return hashlib.sha256(token.encode()).digest()
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -74,34 +40,112 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return encoded_jwt
 
 
-def create_refresh_token(user_id: int, db: Session) -> str:
-    try:
-        cleanup_old_tokens(user_id, db)
+def issue_refresh_token(user_id: int, db: Session) -> str:
+    """
+    Add a new refresh token to the session without committing
 
-        expires_delta = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-        expires_at = datetime.now(timezone.utc) + expires_delta
+    Lets callers fold token issuance into their own transaction.
+    """
+    expires_delta = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    expires_at = datetime.now(timezone.utc) + expires_delta
+
+    refresh_token = jwt.encode(
+        {
+            "sub": str(user_id),
+            "exp": expires_at.timestamp(),
+            "jti": secrets.token_hex(16),
+        },
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
 
-        refresh_token = jwt.encode(
-            {"sub": str(user_id), "exp": expires_at.timestamp()}, SECRET_KEY, algorithm=ALGORITHM
-        )
+    db_token = RefreshToken(
+        token_hash=hash_refresh_token(refresh_token),
+        expires_at=expires_at.replace(tzinfo=None),  # Store as naive datetime
+        status=TokenStatus.ACTIVE,
+        user_id=user_id,
+    )
+    db.add(db_token)
+    return refresh_token
 
-        db_token = RefreshToken(
-            token=refresh_token,
-            expires_at=expires_at.replace(tzinfo=None),  # Store as naive datetime
-            status=TokenStatus.ACTIVE,
-            user_id=user_id,
-        )
-        db.add(db_token)
-        db.commit()
 
-        logger.info(
-            f"Created new refresh token for user {user_id}, expires at {expires_at}"
+def rotate_refresh_token(token: str, db: Session) -> dict:
+    """
+    Revoke a refresh token and issue a new token pair in a single transaction
+
+    The revoke is a conditional UPDATE on status, so when the same token is
+    presented concurrently exactly one caller flips it from ACTIVE and wins.
+    Verify, revoke and insert share one commit.
+
+    A token presented again within REFRESH_GRACE_SECONDS of its rotation gets
+    the pair that rotation issued, without any DB writes.
+
+    Returns:
+        dict: access_token, refresh_token and token_type
+    """
+    payload = verify_token(token, "refresh")
+    token_hash = hash_refresh_token(token)
+
+    token_pair = refresh_grace_cache.get(token_hash)
+    if token_pair is not None:
+        logger.info(f"Refresh token for user {payload['sub']} reused within grace window")
+        return token_pair
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    try:
+        result = db.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.status == TokenStatus.ACTIVE,
+                RefreshToken.expires_at > now,
+            )
+            .values(status=TokenStatus.REVOKED)
+            .execution_options(synchronize_session=False)
         )
-        return refresh_token
+        if result.rowcount != 1:
+            db.rollback()
+            # A concurrent refresh of the same token may have just won the race
+            token_pair = refresh_grace_cache.get(token_hash)
+            if token_pair is not None:
+                return token_pair
+
+            logger.warning("Refresh token not found or has been revoked")
+            raise HTTPException(
+                status_code=401, detail="Refresh token not found or has been revoked"
+            )
+
+        user = db.get(User, int(payload["sub"]))
+        if not user:
+            db.rollback()
+            raise HTTPException(status_code=401, detail="User not found")
+
+        token_pair = {
+            "access_token": create_access_token(
+                data={"sub": user.user_email, "ver": user.token_version}
+            ),
+            "refresh_token": issue_refresh_token(user.id, db),
+            "token_type": "bearer",
+        }
+        user_email = user.user_email
+
+        # Publish before committing so losers of the race find it after their rollback
+        refresh_grace_cache.put(token_hash, token_pair)
+        try:
+            db.commit()
+        except Exception:
+            refresh_grace_cache.discard(token_hash)
+            raise
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating refresh token for user {user_id}: {str(e)}")
+        logger.error(f"Error rotating refresh token: {str(e)}")
         db.rollback()
-        raise HTTPException(status_code=500, detail="Error creating refresh token")
+        raise HTTPException(status_code=500, detail="Error refreshing tokens")
+
+    logger.info(f"Tokens refreshed for user '{user_email}'.")
+    return token_pair
 
 
 def verify_token(token: str, token_type: str = "access") -> dict:
@@ -123,7 +167,10 @@ def verify_and_get_refresh_token(token: str, db: Session) -> RefreshToken:
 
     db_token = (
         db.query(RefreshToken)
-        .filter(RefreshToken.token == token, RefreshToken.status == TokenStatus.ACTIVE)
+        .filter(
+            RefreshToken.token_hash == hash_refresh_token(token),
+            RefreshToken.status == TokenStatus.ACTIVE,
+        )
         .first()
     )
 
@@ -145,7 +192,11 @@ def verify_and_get_refresh_token(token: str, db: Session) -> RefreshToken:
 
 def revoke_refresh_token(token: str, db: Session) -> None:
     try:
-        db_token = db.query(RefreshToken).filter(RefreshToken.token == token).first()
+        db_token = (
+            db.query(RefreshToken)
+            .filter(RefreshToken.token_hash == hash_refresh_token(token))
+            .first()
+        )
         if db_token:
             db_token.status = TokenStatus.REVOKED
             db.commit()
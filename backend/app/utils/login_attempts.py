@@ -0,0 +1,177 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import List
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# "memory" is per process; "sqlite" is shared by all workers on the node
+LOGIN_ATTEMPT_BACKEND = os.getenv("LOGIN_ATTEMPT_BACKEND", "memory")
+LOGIN_ATTEMPT_DB_PATH = os.getenv("LOGIN_ATTEMPT_DB_PATH", "login_attempts.db")
+
+MAX_FAILED_ATTEMPTS_PER_ACCOUNT = 5
+MAX_FAILED_ATTEMPTS_PER_IP = int(os.getenv("MAX_FAILED_LOGIN_ATTEMPTS_PER_IP", "20"))
+FAILED_ATTEMPT_WINDOW_SECONDS = 15 * 60
+ACCOUNT_LOCK_MINUTES = 15
+
+# Expired SQLite counters are deleted at most this often, by whichever call comes first
+PURGE_INTERVAL_SECONDS = 60
+
+
+def account_key(user_email: str) -> str:
+    return f"account:{user_email.lower()}"
+
+
+def ip_key(client_ip: str) -> str:
+    return f"ip:{client_ip}"
+
+
+class AttemptCounter:
+    """
+    Failed-login counters with a fixed expiry window
+
+    A counter starts at the first failure and is discarded window_seconds
+    later, so failures outside the window are forgotten.
+    """
+
+    def __init__(self, window_seconds: int):
+        self.window_seconds = window_seconds
+
+    def increment(self, key: str) -> int:
+        """Record a failure and return the count within the current window"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> int:
+        raise NotImplementedError
+
+    def reset(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class InMemoryAttemptCounter(AttemptCounter):
+    """
+    Counters in a dict; fast, but each uvicorn worker counts separately
+
+    Every counter lives for the same window from its first failure, so
+    creation order is expiry order: the dict is kept in that order and
+    expired counters are dropped from its front on every call.
+    """
+
+    def __init__(self, window_seconds: int):
+        super().__init__(window_seconds)
+        # Store counters as {key: [count, expires_at]}, oldest first
+        self.counters: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def increment(self, key: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = [0, now + self.window_seconds]
+                self.counters[key] = counter
+            counter[0] += 1
+            return int(counter[0])
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            counter = self.counters.get(key)
+            return int(counter[0]) if counter else 0
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self.counters.pop(key, None)
+
+    def _purge_expired(self, now: float) -> None:
+        while self.counters:
+            key, counter = next(iter(self.counters.items()))
+            if counter[1] > now:
+                break
+            del self.counters[key]
+
+
+class SQLiteAttemptCounter(AttemptCounter):
+    """
+    Counters in a local SQLite file in WAL mode
+
+    Shared by every worker process on the node. Each increment is a single
+    UPSERT, so concurrent workers never lose a failure.
+    """
+
+    def __init__(self, window_seconds: int, path: str):
+        super().__init__(window_seconds)
+        self.path = path
+        self._local = threading.local()
+        self._purge_lock = threading.Lock()
+        self._next_purge_at = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_attempts ("
+                "key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def increment(self, key: str) -> int:
+        # Wall clock, because the expiry is compared across processes
+        now = time.time()
+        conn = self._connect()
+        (count,) = conn.execute(
+            "INSERT INTO login_attempts (key, count, expires_at) VALUES (?, 1, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "count = CASE WHEN expires_at <= ? THEN 1 ELSE count + 1 END, "
+            "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+            "RETURNING count",
+            (key, now + self.window_seconds, now, now),
+        ).fetchone()
+        self._purge_expired(conn, now)
+        return count
+
+    def _purge_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        """Delete expired counters once per PURGE_INTERVAL_SECONDS in this process"""
+        with self._purge_lock:
+            if now < self._next_purge_at:
+                return
+            self._next_purge_at = now + PURGE_INTERVAL_SECONDS
+        conn.execute("DELETE FROM login_attempts WHERE expires_at <= ?", (now,))
+
+    def get(self, key: str) -> int:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT count FROM login_attempts WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        self._purge_expired(conn, now)
+        return row[0] if row else 0
+
+    def reset(self, key: str) -> None:
+        self._connect().execute("DELETE FROM login_attempts WHERE key = ?", (key,))
+
+
+def create_attempt_counter() -> AttemptCounter:
+    if LOGIN_ATTEMPT_BACKEND == "sqlite":
+        logger.info(f"Tracking failed logins in SQLite at {LOGIN_ATTEMPT_DB_PATH}")
+        return SQLiteAttemptCounter(FAILED_ATTEMPT_WINDOW_SECONDS, LOGIN_ATTEMPT_DB_PATH)
+    if LOGIN_ATTEMPT_BACKEND != "memory":
+        raise RuntimeError(f"Unknown LOGIN_ATTEMPT_BACKEND '{LOGIN_ATTEMPT_BACKEND}'")
+    return InMemoryAttemptCounter(FAILED_ATTEMPT_WINDOW_SECONDS)
+
+
+# Global failed-login counter instance
+login_attempts = create_attempt_counter()
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Per uvicorn worker; with several uvicorn workers keep the total near the CPU count
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_BUDGET_MS = float(os.getenv("PASSWORD_HASH_BUDGET_MS", "250"))
+# Setting BCRYPT_ROUNDS pins the cost and skips calibration
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+BCRYPT_DEFAULT_ROUNDS = 12
+# Hashes timed per cost during calibration
+CALIBRATION_SAMPLES = 3
+
+
+def build_crypt_context(rounds: int) -> CryptContext:
+    """
+    Build a bcrypt context that hashes at the given cost
+
+    The cost is also the floor: needs_update() flags hashes stored at a
+    lower cost only. Workers that calibrated to different costs therefore
+    never rehash each other's hashes back and forth; hashes converge on the
+    highest cost in use.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=BCRYPT_MAX_ROUNDS,
+    )
+
+
+bcrypt_context = build_crypt_context(BCRYPT_DEFAULT_ROUNDS)
+
+
+def _init_worker(rounds: int) -> None:
+    global bcrypt_context
+    bcrypt_context = build_crypt_context(rounds)
+
+
+def _hash_in_worker(password: str) -> str:
+    return bcrypt_context.hash(password)
+
+
+def _verify_in_worker(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt_context.verify(plain_password, hashed_password)
+
+
+def measure_hash_latency(rounds: int, samples: int = 1) -> float:
+    """
+    Time a bcrypt hash at the given cost, in milliseconds
+
+    With several samples the fastest is returned; scheduling noise only
+    ever makes a hash slower.
+    """
+    context = build_crypt_context(rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("calibration-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def calibrate_bcrypt_rounds(budget_ms: float) -> tuple[int, float]:
+    """
+    Pick the highest bcrypt cost whose hash time fits the latency budget
+
+    Each extra round doubles the work, so the search stops at the first cost
+    over budget and the total calibration time stays under ~2x the budget.
+
+    Returns:
+        tuple: (rounds, measured latency in ms at that cost)
+    """
+    rounds = BCRYPT_MIN_ROUNDS
+    latency_ms = measure_hash_latency(rounds, CALIBRATION_SAMPLES)
+
+    while rounds < BCRYPT_MAX_ROUNDS:
+        next_latency_ms = measure_hash_latency(rounds + 1, CALIBRATION_SAMPLES)
+        if next_latency_ms > budget_ms:
+            break
+        rounds += 1
+        latency_ms = next_latency_ms
+
+    return rounds, latency_ms
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a bounded process pool
+
+    bcrypt holds the GIL for the whole hash, so running it in the request
+    threadpool starves every other route. Work is sent to a separate process
+    pool instead and the number of in-flight jobs is capped: once the cap is
+    reached, new requests fail fast with 503 rather than queueing up.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, budget_ms: float):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.budget_ms = budget_ms
+        self.rounds = BCRYPT_DEFAULT_ROUNDS
+        self.hash_latency_ms: Optional[float] = None
+        self.calibrated = False
+        self.pending = 0
+        self.context = build_crypt_context(self.rounds)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so that importing the app (e.g. from Alembic) does not spawn processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.rounds,),
+                )
+                logger.info(
+                    f"Started password hashing pool with {self.max_workers} workers "
+                    f"at bcrypt cost {self.rounds}"
+                )
+            return self._executor
+
+    def configure(self, rounds: int, hash_latency_ms: Optional[float] = None) -> None:
+        """Switch to a new bcrypt cost; a running pool is restarted lazily"""
+        self.shutdown()
+        with self._lock:
+            self.rounds = rounds
+            self.hash_latency_ms = hash_latency_ms
+            self.context = build_crypt_context(rounds)
+
+    def calibrate(self) -> None:
+        """
+        Choose the bcrypt cost for this machine
+
+        Uses BCRYPT_ROUNDS if set, otherwise measures hash latency and picks
+        the highest cost that fits PASSWORD_HASH_BUDGET_MS. Every uvicorn
+        worker calibrates on its own, so pinning BCRYPT_ROUNDS (see the
+        __main__ block) gives all workers and nodes the same cost.
+        """
+        if BCRYPT_ROUNDS:
+            rounds = int(BCRYPT_ROUNDS)
+            self.configure(rounds, measure_hash_latency(rounds))
+            logger.info(f"Using configured bcrypt cost {rounds}")
+            return
+
+        rounds, latency_ms = calibrate_bcrypt_rounds(self.budget_ms)
+        self.configure(rounds, latency_ms)
+        self.calibrated = True
+        logger.info(
+            f"Calibrated bcrypt cost {rounds} ({latency_ms:.1f} ms per hash, "
+            f"budget {self.budget_ms:.0f} ms)"
+        )
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """Check whether a stored hash uses a lower cost than the current one"""
+        return self.context.needs_update(hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "bcrypt_rounds": self.rounds,
+            "hash_latency_ms": self.hash_latency_ms,
+            "latency_budget_ms": self.budget_ms,
+            "calibrated": self.calibrated,
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+        }
+
+    def _acquire_slot(self) -> None:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                logger.warning(
+                    f"Password hashing queue is full ({self.pending} pending), rejecting request"
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy. Please try again shortly.",
+                )
+            self.pending += 1
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def _run(self, func, *args):
+        self._acquire_slot()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._release_slot()
+
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop"""
+        return await self._run(_hash_in_worker, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against a bcrypt hash without blocking the event loop"""
+        return await self._run(_verify_in_worker, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher(
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_BUDGET_MS
+)
+
+
+if __name__ == "__main__":
+    # One-off calibration: python -m app.utils.password_hasher, then pin BCRYPT_ROUNDS
+    logging.basicConfig(level=logging.INFO)
+    rounds, latency_ms = calibrate_bcrypt_rounds(PASSWORD_HASH_BUDGET_MS)
+    print(
+        f"BCRYPT_ROUNDS={rounds}  # {latency_ms:.1f} ms per hash, "
+        f"budget {PASSWORD_HASH_BUDGET_MS:.0f} ms"
+    )
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import event, inspect
+
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+
+# Columns copied into the snapshot; a change to any of them invalidates it
+PRINCIPAL_FIELDS = (
+    "id",
+    "user_email",
+    "role",
+    "email_verified",
+    "first_name",
+    "last_name",
+    "phone_number",
+    "token_version",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Immutable snapshot of the authenticated user, detached from any session"""
+
+    id: int
+    user_email: str
+    role: int
+    email_verified: bool
+    first_name: str
+    last_name: str
+    phone_number: Optional[str] = None
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(**{field: getattr(user, field) for field in PRINCIPAL_FIELDS})
+
+
+class PrincipalCache:
+    """
+    In-process TTL + LRU cache of principals keyed by token subject
+
+    Saves the users lookup on every authenticated request. Entries expire
+    after ttl_seconds and the least recently used entry is evicted once
+    max_size is reached.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, subject: str, principal: Principal) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[subject] = (expires_at, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+# Global principal cache instance
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_MAX_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_changed_principal(mapper, connection, target: User) -> None:
+    """Drop the cached principal when a snapshotted column (e.g. role) changes"""
+    state = inspect(target)
+    changed = False
+    for field in PRINCIPAL_FIELDS:
+        history = state.attrs[field].history
+        if history.has_changes():
+            changed = True
+            # An email change must also drop the entry cached under the old subject
+            if field == "user_email":
+                for old_email in history.deleted:
+                    principal_cache.invalidate(old_email)
+
+    if changed:
+        principal_cache.invalidate(target.user_email)
+        logger.info(f"Invalidated cached principal for user {target.id}")
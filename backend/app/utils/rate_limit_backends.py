@@ -0,0 +1,237 @@
+"""
+Rate limiter backends shared by all uvicorn workers on one node
+
+With N workers each holding its own in-memory RateLimiter, a client gets
+N times the configured limit. These backends keep the counters outside the
+worker processes:
+
+- SharedMemoryRateLimiter: fixed-slot hash table in an mmap'd file
+- SQLiteRateLimiter: one row per key in a WAL-mode SQLite file
+
+Select one with RATE_LIMIT_BACKEND (see rate_limiter.create_rate_limiter).
+"""
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import logging
+
+from app.utils.rate_limiter import (
+    RateLimiterBackend,
+    RateLimitStatus,
+    roll_window,
+    window_status,
+)
+
+logger = logging.getLogger(__name__)
+
+# Slot layout: key hash, window index, current count, previous count, expires at
+SLOT = struct.Struct("<QqIIq")
+# Slots per set; a key can only live in its own set, which is also the lock unit
+SLOTS_PER_SET = 16
+
+
+def _key_hash(key: str, window_seconds: int) -> int:
+    # Stable across processes, unlike hash(); 0 is reserved for empty slots
+    digest = hashlib.blake2b(f"{key}|{window_seconds}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedMemoryRateLimiter(RateLimiterBackend):
+    """
+    Set-associative hash table of sliding window counters in shared memory
+
+    The file is split into sets of SLOTS_PER_SET fixed-size slots. A key
+    hashes to one set and is probed only within it, so each set can be
+    locked on its own: a byte-range fcntl lock across processes plus a
+    thread lock within the process. Expired slots are reused in place and,
+    when a set is full, the slot closest to expiry is evicted, so memory is
+    bounded by the file size.
+    """
+
+    # lockf waits for other processes holding the set
+    blocking = True
+
+    def __init__(self, path: str, slots: int):
+        import fcntl  # POSIX only; the memory backend remains available elsewhere
+
+        self._fcntl = fcntl
+        self.sets = max(1, slots // SLOTS_PER_SET)
+        self.path = path
+        self.size = self.sets * SLOTS_PER_SET * SLOT.size
+        self.evictions = 0
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < self.size:
+            os.ftruncate(self._fd, self.size)
+        self._map = mmap.mmap(self._fd, self.size)
+        self._locks = [threading.Lock() for _ in range(self.sets)]
+
+    def check(self, key: str, max_requests: int, window_seconds: int) -> RateLimitStatus:
+        now = time.time()
+        window_index = int(now // window_seconds)
+        key_hash = _key_hash(key, window_seconds)
+        set_index = key_hash % self.sets
+        set_offset = set_index * SLOTS_PER_SET * SLOT.size
+        set_bytes = SLOTS_PER_SET * SLOT.size
+
+        with self._locks[set_index]:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, set_bytes, set_offset)
+            try:
+                offset, stored = self._find_slot(set_offset, key_hash, int(now))
+                if stored is None:
+                    current, previous = 0, 0
+                else:
+                    current, previous = roll_window(
+                        stored[1], stored[2], stored[3], window_index
+                    )
+
+                elapsed = (now % window_seconds) / window_seconds
+                estimated = previous * (1 - elapsed) + current
+                status = window_status(estimated, max_requests, now, window_seconds)
+                if not status.limited:
+                    current += 1
+
+                SLOT.pack_into(
+                    self._map, offset, key_hash, window_index, current, previous,
+                    (window_index + 2) * window_seconds,
+                )
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, set_bytes, set_offset)
+
+        if status.limited:
+            logger.warning(
+                f"Rate limit exceeded for {key}: "
+                f"~{estimated:.1f} requests in {window_seconds}s"
+            )
+        return status
+
+    def _find_slot(self, set_offset: int, key_hash: int, now: int):
+        """
+        Return (offset, slot) for the key, or (offset, None) for the slot to claim
+
+        Claims the first empty or expired slot, else evicts the one closest to expiry.
+        """
+        free_offset = None
+        victim_offset, victim_expires = None, None
+
+        for i in range(SLOTS_PER_SET):
+            offset = set_offset + i * SLOT.size
+            slot = SLOT.unpack_from(self._map, offset)
+            if slot[0] == key_hash:
+                return offset, slot
+            if free_offset is None and (slot[0] == 0 or slot[4] <= now):
+                free_offset = offset
+            if victim_expires is None or slot[4] < victim_expires:
+                victim_offset, victim_expires = offset, slot[4]
+
+        if free_offset is not None:
+            return free_offset, None
+        self.evictions += 1
+        return victim_offset, None
+
+    def stats(self) -> dict:
+        now = time.time()
+        tracked = 0
+        for i in range(self.sets * SLOTS_PER_SET):
+            slot = SLOT.unpack_from(self._map, i * SLOT.size)
+            if slot[0] and slot[4] > now:
+                tracked += 1
+        return {
+            "backend": "shm",
+            "tracked_keys": tracked,
+            "max_keys": self.sets * SLOTS_PER_SET,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteRateLimiter(RateLimiterBackend):
+    """
+    Sliding window counters in a local SQLite file in WAL mode
+
+    Each check is one short BEGIN IMMEDIATE transaction, which serialises
+    concurrent workers on the key without losing increments. Expired rows
+    are deleted by the first check after purge_interval_seconds.
+    """
+
+    # BEGIN IMMEDIATE waits up to the busy timeout for the write lock
+    blocking = True
+
+    def __init__(self, path: str, purge_interval_seconds: int = 60):
+        self.path = path
+        self.purge_interval_seconds = purge_interval_seconds
+        self._local = threading.local()
+        self._purge_lock = threading.Lock()
+        self._next_purge_at = 0.0
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, window_index INTEGER NOT NULL, "
+            "current INTEGER NOT NULL, previous INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def check(self, key: str, max_requests: int, window_seconds: int) -> RateLimitStatus:
+        now = time.time()
+        window_index = int(now // window_seconds)
+        row_key = f"{key}|{window_seconds}"
+        conn = self._connect()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT window_index, current, previous FROM rate_limits WHERE key = ?",
+                (row_key,),
+            ).fetchone()
+            current, previous = (0, 0) if row is None else roll_window(*row, window_index)
+
+            elapsed = (now % window_seconds) / window_seconds
+            estimated = previous * (1 - elapsed) + current
+            status = window_status(estimated, max_requests, now, window_seconds)
+            if not status.limited:
+                current += 1
+
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits "
+                "(key, window_index, current, previous, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (row_key, window_index, current, previous, (window_index + 2) * window_seconds),
+            )
+
+            self._purge_expired(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if status.limited:
+            logger.warning(
+                f"Rate limit exceeded for {key}: "
+                f"~{estimated:.1f} requests in {window_seconds}s"
+            )
+        return status
+
+    def _purge_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        """Delete expired counters once per purge_interval_seconds in this process"""
+        with self._purge_lock:
+            if now < self._next_purge_at:
+                return
+            self._next_purge_at = now + self.purge_interval_seconds
+        conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+
+    def stats(self) -> dict:
+        (tracked,) = self._connect().execute(
+            "SELECT COUNT(*) FROM rate_limits WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return {"backend": "sqlite", "tracked_keys": tracked}
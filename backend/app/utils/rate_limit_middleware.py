@@ -0,0 +1,208 @@
+"""
+Rate limiting applied to the raw ASGI scope
+
+Runs before routing, so a rejected request never gets its body parsed into
+a schema or a database session checked out. Policies are looked up by
+method and path. With RATE_LIMIT_BY_EMAIL, forgot-password bodies are read,
+up to RATE_LIMIT_BODY_MAX_BYTES, to count requests per submitted email.
+"""
+
+import json
+import math
+import os
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from app.utils.rate_limiter import (
+    RateLimiterBackend,
+    RateLimitStatus,
+    client_ip_from_scope,
+    rate_limiter,
+)
+
+load_dotenv()
+
+# Also count forgot-password requests per submitted email, across IPs. Off by
+# default: anyone can spend someone else's budget. Logins are not counted per
+# email here, where a request with the right password would count too; the
+# login controller counts only failed attempts per account.
+RATE_LIMIT_BY_EMAIL = os.getenv("RATE_LIMIT_BY_EMAIL", "false").lower() == "true"
+# Larger (or chunked, oversized) bodies are passed on without the email check
+RATE_LIMIT_BODY_MAX_BYTES = int(os.getenv("RATE_LIMIT_BODY_MAX_BYTES", "4096"))
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitPolicy:
+    max_requests: int
+    window_seconds: int
+    # JSON body field that gets its own counter, e.g. the account email
+    body_field: Optional[str] = None
+
+
+# Tiers of the former rate_limit_auth_endpoints / rate_limit_strict / rate_limit_relaxed
+AUTH_POLICY = RateLimitPolicy(max_requests=5, window_seconds=60)
+STRICT_POLICY = RateLimitPolicy(max_requests=3, window_seconds=60)
+RELAXED_POLICY = RateLimitPolicy(max_requests=10, window_seconds=60)
+
+# (method, path without root_path) -> policy
+RATE_LIMIT_POLICIES: Dict[Tuple[str, str], RateLimitPolicy] = {
+    ("POST", "/authentication/register"): AUTH_POLICY,
+    ("POST", "/authentication/login"): AUTH_POLICY,
+    ("POST", "/authentication/forgot-password"): replace(STRICT_POLICY, body_field="user_email"),
+    ("POST", "/authentication/reset-password"): AUTH_POLICY,
+}
+
+
+def _route_path(scope) -> str:
+    path = scope["path"]
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        return path[len(root_path):] or "/"
+    return path
+
+
+def _rate_limit_headers(policy: RateLimitPolicy, status: RateLimitStatus) -> list:
+    reset = str(math.ceil(status.reset_after)).encode()
+    headers = [
+        (b"x-ratelimit-limit", str(policy.max_requests).encode()),
+        (b"x-ratelimit-remaining", str(status.remaining).encode()),
+        (b"x-ratelimit-reset", reset),
+    ]
+    if status.limited:
+        headers.append((b"retry-after", reset))
+    return headers
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware enforcing RATE_LIMIT_POLICIES
+
+    Requests are counted per client IP and route; for policies with a
+    body_field, also per submitted value. Limited requests get a 429 with
+    Retry-After straight from here; allowed ones get X-RateLimit-* headers
+    on their response.
+    """
+
+    def __init__(
+        self,
+        app,
+        policies: Dict[Tuple[str, str], RateLimitPolicy] = RATE_LIMIT_POLICIES,
+        limiter: RateLimiterBackend = rate_limiter,
+    ):
+        self.app = app
+        self.policies = policies
+        self.limiter = limiter
+        # Rejection bodies are built once per policy
+        self._rejections = {
+            policy: json.dumps({
+                "detail": f"Too many requests. Please try again in {policy.window_seconds} seconds."
+            }).encode()
+            for policy in policies.values()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = _route_path(scope)
+        policy = self.policies.get((scope["method"], path))
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = await self._check(
+            f"{path}|{client_ip_from_scope(scope)}",
+            policy.max_requests,
+            policy.window_seconds,
+        )
+        if status.limited:
+            await self._reject(policy, status, send)
+            return
+
+        if policy.body_field and RATE_LIMIT_BY_EMAIL:
+            value, receive = await self._read_field(scope, receive, policy.body_field)
+            if value:
+                value_status = await self._check(
+                    f"{path}|{policy.body_field}={value}",
+                    policy.max_requests,
+                    policy.window_seconds,
+                )
+                if value_status.limited:
+                    await self._reject(policy, value_status, send)
+                    return
+                if value_status.remaining < status.remaining:
+                    status = value_status
+
+        headers = _rate_limit_headers(policy, status)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def _check(self, key: str, max_requests: int, window_seconds: int) -> RateLimitStatus:
+        # The shared backends wait on file locks; keep them off the event loop
+        if self.limiter.blocking:
+            return await run_in_threadpool(
+                self.limiter.check, key, max_requests, window_seconds
+            )
+        return self.limiter.check(key, max_requests, window_seconds)
+
+    async def _reject(self, policy: RateLimitPolicy, status: RateLimitStatus, send) -> None:
+        body = self._rejections[policy]
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ] + _rate_limit_headers(policy, status),
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _read_field(self, scope, receive, field: str):
+        """
+        Buffer a small JSON body and pull one string field out of it
+
+        Returns the normalised value (or None) and a receive callable that
+        replays the buffered messages to the application.
+        """
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if not value.isdigit() or int(value) > RATE_LIMIT_BODY_MAX_BYTES:
+                    return None, receive
+                break
+
+        messages = []
+        size = 0
+        more_body = True
+        while more_body and size <= RATE_LIMIT_BODY_MAX_BYTES:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        if more_body or messages[-1]["type"] != "http.request":
+            return None, replay
+
+        try:
+            payload = json.loads(b"".join(m.get("body", b"") for m in messages))
+        except ValueError:
+            return None, replay
+
+        value = payload.get(field) if isinstance(payload, dict) else None
+        if not isinstance(value, str):
+            return None, replay
+        return value.strip().lower(), replay
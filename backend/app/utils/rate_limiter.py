@@ -1,21 +1,79 @@
 from fastapi import HTTPException, Request, status
-from datetime import datetime, timedelta
-from typing import Dict, List
+from collections import OrderedDict
+from typing import List, NamedTuple, Set, Tuple
+from dotenv import load_dotenv
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+load_dotenv()
 
-class RateLimiter:
+RATE_LIMITER_SHARDS = 64
+# Hard cap on tracked keys; least recently used keys are evicted beyond it
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Timer wheel resolution: one bucket per second
+TIMER_WHEEL_SLOTS = 256
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SHM_PATH = os.getenv("RATE_LIMIT_SHM_PATH", "/dev/shm/restaurant-rate-limits")
+RATE_LIMIT_SHM_SLOTS = int(os.getenv("RATE_LIMIT_SHM_SLOTS", "65536"))
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limits.db")
+# Expired SQLite counters are deleted at most this often in each worker
+RATE_LIMIT_SQLITE_PURGE_SECONDS = int(os.getenv("RATE_LIMIT_SQLITE_PURGE_SECONDS", "60"))
+
+Key = Tuple[str, int]
+
+
+def roll_window(
+    window_index: int, current: int, previous: int, now_window: int
+) -> Tuple[int, int]:
+    """Return (current, previous) counts as seen from now_window"""
+    if window_index == now_window:
+        return current, previous
+    # Counts older than the previous window no longer matter
+    return 0, current if window_index == now_window - 1 else 0
+
+
+class RateLimitStatus(NamedTuple):
+    """Outcome of one counter check, enough to fill the X-RateLimit-* headers"""
+
+    limited: bool
+    remaining: int
+    # Seconds until the current fixed window rolls over
+    reset_after: float
+
+
+def window_status(
+    estimated: float, max_requests: int, now: float, window_seconds: int
+) -> RateLimitStatus:
+    limited = estimated >= max_requests
+    # The current request is counted only when it is allowed
+    used = estimated if limited else estimated + 1
+    return RateLimitStatus(
+        limited,
+        max(0, int(max_requests - used)),
+        window_seconds - (now % window_seconds),
+    )
+
+
+class RateLimiterBackend:
     """
-    Simple in-memory rate limiter for API endpoints
+    Storage for the sliding window counters behind the rate limit middleware
 
-    Tracks requests per IP address and enforces limits
+    Implementations: RateLimiter (per process), and SharedMemoryRateLimiter /
+    SQLiteRateLimiter in rate_limit_backends (shared by the workers of a node).
     """
 
-    def __init__(self):
-        # Store requests as {ip_address: [timestamp1, timestamp2, ...]}
-        self.requests: Dict[str, List[datetime]] = {}
+    # True if check() can wait on a file lock or I/O, so async callers
+    # must run it in the threadpool rather than on the event loop
+    blocking = False
+
+    def check(self, key: str, max_requests: int, window_seconds: int) -> RateLimitStatus:
+        """Count a request for key unless it is over the limit"""
+        raise NotImplementedError
 
     def is_rate_limited(
         self,
@@ -34,59 +92,176 @@ class RateLimiter:
         Returns:
             bool: True if rate limited, False otherwise
         """
-        now = datetime.now()
-        window_start = now - timedelta(seconds=window_seconds)
+        return self.check(client_ip, max_requests, window_seconds).limited
 
-        # Get or initialize request history for this IP
-        if client_ip not in self.requests:
-            self.requests[client_ip] = []
+    def stats(self) -> dict:
+        raise NotImplementedError
 
-        # Remove old requests outside the time window
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip]
-            if req_time > window_start
-        ]
 
-        # Check if limit exceeded
-        if len(self.requests[client_ip]) >= max_requests:
-            logger.warning(
-                f"Rate limit exceeded for IP {client_ip}: "
-                f"{len(self.requests[client_ip])} requests in {window_seconds}s"
-            )
-            return True
+class _WindowState:
+    """Fixed per-key state of the sliding window counter"""
 
-        # Add current request
-        self.requests[client_ip].append(now)
-        return False
+    __slots__ = ("window_index", "current", "previous", "expires_at")
 
-    def cleanup_old_entries(self, max_age_minutes: int = 60):
-        """
-        Clean up old entries from memory to prevent memory leaks
+    def __init__(self, window_index: int):
+        self.window_index = window_index
+        self.current = 0
+        self.previous = 0
+        # Second at which neither window can affect a decision any more
+        self.expires_at = 0
 
-        Args:
-            max_age_minutes: Maximum age of entries to keep
-        """
-        cutoff = datetime.now() - timedelta(minutes=max_age_minutes)
-        ips_to_remove = []
 
-        for ip, timestamps in self.requests.items():
-            # Remove old timestamps
-            self.requests[ip] = [ts for ts in timestamps if ts > cutoff]
+class _Shard:
+    """
+    One independently locked slice of the limiter state
 
-            # Mark IP for removal if no recent requests
-            if not self.requests[ip]:
-                ips_to_remove.append(ip)
+    states is kept in LRU order. wheel is a hashed timer wheel: bucket
+    (expires_at % TIMER_WHEEL_SLOTS) holds the keys expiring at that second,
+    so expiry only ever looks at the buckets that have come due.
+    """
 
-        # Remove IPs with no recent requests
-        for ip in ips_to_remove:
-            del self.requests[ip]
+    __slots__ = ("lock", "states", "wheel", "last_tick", "evictions", "expirations")
+
+    def __init__(self, now_tick: int):
+        self.lock = threading.Lock()
+        self.states: "OrderedDict[Key, _WindowState]" = OrderedDict()
+        self.wheel: List[Set[Key]] = [set() for _ in range(TIMER_WHEEL_SLOTS)]
+        self.last_tick = now_tick
+        self.evictions = 0
+        self.expirations = 0
+
+    def schedule(self, key: Key, state: _WindowState, expires_at: int) -> None:
+        if state.expires_at == expires_at:
+            return
+        if state.expires_at:
+            self.wheel[state.expires_at % TIMER_WHEEL_SLOTS].discard(key)
+        state.expires_at = expires_at
+        self.wheel[expires_at % TIMER_WHEEL_SLOTS].add(key)
+
+    def remove(self, key: Key) -> None:
+        state = self.states.pop(key)
+        self.wheel[state.expires_at % TIMER_WHEEL_SLOTS].discard(key)
+
+    def advance(self, now_tick: int) -> None:
+        """Expire keys in the buckets that came due since the last call"""
+        if now_tick <= self.last_tick:
+            return
+
+        ticks = min(now_tick - self.last_tick, TIMER_WHEEL_SLOTS)
+        for tick in range(now_tick - ticks + 1, now_tick + 1):
+            bucket = self.wheel[tick % TIMER_WHEEL_SLOTS]
+            if not bucket:
+                continue
+            # Keys scheduled a full wheel turn or more ahead share the bucket; keep those
+            due = [key for key in bucket if self.states[key].expires_at <= now_tick]
+            for key in due:
+                bucket.discard(key)
+                del self.states[key]
+            self.expirations += len(due)
+        self.last_tick = now_tick
+
+
+class RateLimiter(RateLimiterBackend):
+    """
+    Simple in-memory rate limiter for API endpoints
 
-        if ips_to_remove:
-            logger.info(f"Cleaned up {len(ips_to_remove)} inactive IPs from rate limiter")
+    Tracks requests per IP address and enforces limits using a sliding
+    window counter: each key keeps only the request counts of the current
+    and the previous fixed window, and the previous count is weighted by
+    how much of it still overlaps the sliding window. Memory and work per
+    request are O(1) regardless of the limit.
+
+    Keys are spread over independently locked shards, so concurrent requests
+    for different IPs rarely contend on the same lock. Memory is bounded:
+    idle keys expire through a timer wheel and, past max_keys, the least
+    recently used keys are evicted (e.g. under a spoofed X-Forwarded-For flood).
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, shards: int = RATE_LIMITER_SHARDS):
+        now_tick = int(time.monotonic())
+        self.max_keys = max_keys
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self.shards = [_Shard(now_tick) for _ in range(shards)]
+
+    def _shard(self, key: Key) -> _Shard:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def __len__(self) -> int:
+        return sum(len(shard.states) for shard in self.shards)
+
+    def check(self, key: str, max_requests: int, window_seconds: int) -> RateLimitStatus:
+        now = time.monotonic()
+        window_index = int(now // window_seconds)
+        state_key = (key, window_seconds)
+        shard = self._shard(state_key)
+
+        with shard.lock:
+            shard.advance(int(now))
+
+            state = shard.states.get(state_key)
+            if state is None:
+                state = shard.states[state_key] = _WindowState(window_index)
+                if len(shard.states) > self.max_keys_per_shard:
+                    oldest = next(iter(shard.states))
+                    shard.remove(oldest)
+                    shard.evictions += 1
+            else:
+                shard.states.move_to_end(state_key)
+                state.current, state.previous = roll_window(
+                    state.window_index, state.current, state.previous, window_index
+                )
+                state.window_index = window_index
+            shard.schedule(state_key, state, (window_index + 2) * window_seconds)
+
+            elapsed = (now % window_seconds) / window_seconds
+            estimated = state.previous * (1 - elapsed) + state.current
+            status = window_status(estimated, max_requests, now, window_seconds)
+
+            # Count current request
+            if not status.limited:
+                state.current += 1
+
+        if status.limited:
+            logger.warning(
+                f"Rate limit exceeded for {key}: "
+                f"~{estimated:.1f} requests in {window_seconds}s"
+            )
+        return status
+
+    def stats(self) -> dict:
+        """Tracked keys plus eviction and expiry counters, summed over shards"""
+        now_tick = int(time.monotonic())
+        tracked = evictions = expirations = 0
+        for shard in self.shards:
+            with shard.lock:
+                shard.advance(now_tick)
+                tracked += len(shard.states)
+                evictions += shard.evictions
+                expirations += shard.expirations
+        return {
+            "backend": "memory",
+            "tracked_keys": tracked,
+            "max_keys": self.max_keys,
+            "evictions": evictions,
+            "expirations": expirations,
+        }
+
+
+def create_rate_limiter() -> RateLimiterBackend:
+    """Build the backend selected by RATE_LIMIT_BACKEND (memory, shm or sqlite)"""
+    if RATE_LIMIT_BACKEND == "shm":
+        from app.utils.rate_limit_backends import SharedMemoryRateLimiter
+        return SharedMemoryRateLimiter(RATE_LIMIT_SHM_PATH, RATE_LIMIT_SHM_SLOTS)
+    if RATE_LIMIT_BACKEND == "sqlite":
+        from app.utils.rate_limit_backends import SQLiteRateLimiter
+        return SQLiteRateLimiter(RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_SQLITE_PURGE_SECONDS)
+    if RATE_LIMIT_BACKEND != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{RATE_LIMIT_BACKEND}', using memory")
+    return RateLimiter()
 
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter()
 
 
 def get_client_ip(request: Request) -> str:
@@ -101,14 +276,20 @@ def get_client_ip(request: Request) -> str:
     Returns:
         str: Client IP address
     """
+    return client_ip_from_scope(request.scope)
+
+
+def client_ip_from_scope(scope) -> str:
+    """get_client_ip for a raw ASGI scope, used before a Request exists"""
     # Check X-Forwarded-For header (for requests behind proxies/load balancers)
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        # X-Forwarded-For can contain multiple IPs, take the first one
-        return forwarded_for.split(",")[0].strip()
+    for name, value in scope["headers"]:
+        if name == b"x-forwarded-for":
+            # X-Forwarded-For can contain multiple IPs, take the first one
+            return value.decode("latin-1").split(",")[0].strip()
 
     # Fall back to direct client IP
-    return request.client.host if request.client else "unknown"
+    client = scope.get("client")
+    return client[0] if client else "unknown"
 
 
 async def rate_limit_auth_endpoints(
@@ -140,11 +321,6 @@ async def rate_limit_auth_endpoints(
             detail=f"Too many requests. Please try again in {window_seconds} seconds."
         )
 
-    # Periodically cleanup old entries (every 100th request)
-    # This prevents memory leaks over time
-    if len(rate_limiter.requests) % 100 == 0:
-        rate_limiter.cleanup_old_entries()
-
 
 async def rate_limit_strict(request: Request):
     """
@@ -1,28 +1,37 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Optional, List
 from app.utils.jwt_utils import verify_token
+from app.utils.principal_cache import Principal, principal_cache
+from app.utils.token_versions import token_versions
 from app.models.user import User, UserRole
-from app.db.database import get_db
+from app.db.database import session_runner
 
 
 security = HTTPBearer()
 
 
-def get_current_user(
+def _load_principal(user_email: str, db: Session) -> Optional[Principal]:
+    user = db.query(User).filter(User.user_email == user_email).first()
+    return Principal.from_user(user) if user else None
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+) -> Principal:
     """
     Get the current authenticated user from access token
 
+    The user is served from the principal cache when possible, so most
+    authenticated requests do not query the users table. A session is only
+    opened on a cache miss, on the engine DB_ASYNC selects.
+
     Args:
         credentials: Bearer token from request header
-        db: Database session
 
     Returns:
-        User: The authenticated user
+        Principal: Snapshot of the authenticated user
 
     Raises:
         HTTPException: If token is invalid or user not found
@@ -31,24 +40,37 @@ def get_current_user(
 
     # Verify JWT token
     payload = verify_token(token, "access")
-    user_id = payload.get("sub")
+    user_email = payload.get("sub")
 
-    if not user_id:
+    if not user_email:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
 
-    # Get user from database
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    principal = principal_cache.get(user_email)
+    if principal is None:
+        # Cache miss: get user from database
+        async with session_runner() as db:
+            principal = await db.run(_load_principal, user_email)
+
+        if not principal:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+
+        principal_cache.put(user_email, principal)
+        token_versions.observe(user_email, principal.token_version)
 
-    if not user:
+    # Tokens issued before the last logout-all / password reset are revoked
+    if not token_versions.is_current(user_email, payload.get("ver", 0)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+            detail="Access token has been revoked"
         )
 
-    return user
+    return principal
 
 
 def require_roles(allowed_roles: List[int]):
@@ -66,7 +88,7 @@ def require_roles(allowed_roles: List[int]):
     Returns:
         Dependency function that checks user role
     """
-    def role_checker(current_user: User = Depends(get_current_user)) -> User:
+    def role_checker(current_user: Principal = Depends(get_current_user)) -> Principal:
         """Check if current user has required role"""
         if current_user.role not in allowed_roles:
             raise HTTPException(
@@ -79,7 +101,7 @@ def require_roles(allowed_roles: List[int]):
 
 
 # Convenience dependencies for common role checks
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Require ADMIN role"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
@@ -89,7 +111,7 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-def require_restaurant_owner(current_user: User = Depends(get_current_user)) -> User:
+def require_restaurant_owner(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Require RESTAURANT_OWNER role"""
     if current_user.role != UserRole.RESTAURANT_OWNER:
         raise HTTPException(
@@ -99,7 +121,7 @@ def require_restaurant_owner(current_user: User = Depends(get_current_user)) ->
     return current_user
 
 
-def require_customer(current_user: User = Depends(get_current_user)) -> User:
+def require_customer(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Require CUSTOMER role"""
     if current_user.role != UserRole.CUSTOMER:
         raise HTTPException(
@@ -109,7 +131,7 @@ def require_customer(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-def require_restaurant_owner_or_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_restaurant_owner_or_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Require RESTAURANT_OWNER or ADMIN role"""
     if current_user.role not in [UserRole.RESTAURANT_OWNER, UserRole.ADMIN]:
         raise HTTPException(
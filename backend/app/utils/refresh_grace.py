@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REFRESH_GRACE_SECONDS = float(os.getenv("REFRESH_GRACE_SECONDS", "10"))
+REFRESH_GRACE_MAX_ENTRIES = int(os.getenv("REFRESH_GRACE_MAX_ENTRIES", "10000"))
+
+
+class RefreshGraceCache:
+    """
+    Short-lived memory of the token pair issued for each rotated refresh token
+
+    Browsers with several tabs open refresh with the same token at nearly the
+    same moment. Within the grace window a repeated refresh gets the pair the
+    first one produced, instead of a 401 and a full re-login.
+
+    Entries all share the same TTL, so insertion order is expiry order and
+    expired entries are dropped from the front.
+    """
+
+    def __init__(self, grace_seconds: float, max_entries: int):
+        self.grace_seconds = grace_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float) -> None:
+        while self._entries:
+            token_hash, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[token_hash]
+
+    def get(self, token_hash: bytes) -> Optional[dict]:
+        if self.grace_seconds <= 0:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None or entry[0] <= now:
+                return None
+            return entry[1]
+
+    def put(self, token_hash: bytes, token_pair: dict) -> None:
+        if self.grace_seconds <= 0:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self._entries[token_hash] = (now + self.grace_seconds, token_pair)
+            self._purge_expired(now)
+
+    def discard(self, token_hash: bytes) -> None:
+        with self._lock:
+            self._entries.pop(token_hash, None)
+
+
+# Global refresh grace cache instance
+refresh_grace_cache = RefreshGraceCache(REFRESH_GRACE_SECONDS, REFRESH_GRACE_MAX_ENTRIES)
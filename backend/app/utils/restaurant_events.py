@@ -0,0 +1,282 @@
+"""
+Change feed of the restaurants table for the in-memory restaurant indexes
+
+Indexes register here. They are built from one scan of the active
+restaurants at startup and kept current by ORM changes committed in this
+process. A commit only queues its changes; run_change_applier applies them
+within CHANGE_APPLY_INTERVAL_SECONDS, coalesced per restaurant, so the
+committing request never pays for the index updates. Every
+RESTAURANT_INDEX_POLL_SECONDS the rows created or updated
+since the watermark (the newest created_at / updated_at seen, minus
+RESTAURANT_INDEX_WATERMARK_OVERLAP_SECONDS for transactions that committed
+late) are read and published too, which picks up writes of other workers.
+
+Rows removed with DELETE in other processes, and statements that do not
+set updated_at, are only seen by a full rebuild every
+RESTAURANT_INDEX_REFRESH_SECONDS. A rebuild of a large table holds the GIL
+for seconds per index, so it runs rarely. Changes published while a
+rebuild runs are replayed on top of it, so they are not lost to its older
+scan.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.restaurant import Restaurant
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+RESTAURANT_INDEX_POLL_SECONDS = int(os.getenv("RESTAURANT_INDEX_POLL_SECONDS", "10"))
+# Full rebuilds; 0 disables them
+RESTAURANT_INDEX_REFRESH_SECONDS = int(os.getenv("RESTAURANT_INDEX_REFRESH_SECONDS", "86400"))
+RESTAURANT_INDEX_WATERMARK_OVERLAP_SECONDS = 5
+# How often changes committed in this process are applied to the indexes
+CHANGE_APPLY_INTERVAL_SECONDS = 0.2
+
+# session.info key of the changes flushed but not yet committed
+_PENDING_KEY = "restaurant_changes"
+
+
+@dataclass(frozen=True, slots=True)
+class RestaurantRecord:
+    """Detached copy of the restaurant columns the in-memory indexes use"""
+
+    id: int
+    name: str
+    slug: str
+    cuisine: str
+    price_range: int
+    address: str
+    city: str
+    country: str
+    description: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    cover_image: Optional[str]
+    rating: Optional[float]
+    review_count: int
+    is_active: bool
+
+
+RECORD_FIELDS = tuple(field.name for field in fields(RestaurantRecord))
+RECORD_COLUMNS = [getattr(Restaurant, field) for field in RECORD_FIELDS]
+
+
+class RestaurantIndex:
+    """Interface of an index kept in sync with the restaurants table"""
+
+    def rebuild(self, records: List[RestaurantRecord]) -> None:
+        """Replace the contents with these active restaurants"""
+        raise NotImplementedError
+
+    def apply(self, upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+        """
+        Apply committed changes
+
+        upserts may contain inactive restaurants, which must be dropped.
+        """
+        raise NotImplementedError
+
+
+_indexes: List[RestaurantIndex] = []
+# Serialises rebuilds and polls, which own the watermark
+_rebuild_lock = threading.Lock()
+# Serialises applying changes to the indexes
+_apply_lock = threading.Lock()
+# Changes published while a rebuild runs, to replay after it; None outside a rebuild
+_replay: Optional[List[Tuple[List[RestaurantRecord], List[int]]]] = None
+
+# (upserts, deleted ids) of commits in this process, not yet applied
+_queued: "queue.SimpleQueue[Tuple[List[RestaurantRecord], List[int]]]" = queue.SimpleQueue()
+
+_watermark: Optional[datetime] = None
+# Changed-at of the rows read by the last poll, to skip them when the overlap reads them again
+_polled: Dict[int, datetime] = {}
+_rebuilt_at = 0.0
+
+
+def register_index(index: RestaurantIndex) -> RestaurantIndex:
+    _indexes.append(index)
+    return index
+
+
+def load_records(db: Session) -> List[RestaurantRecord]:
+    """All active restaurants, read as plain rows without ORM objects"""
+    rows = db.execute(select(*RECORD_COLUMNS).where(Restaurant.is_active))
+    return [RestaurantRecord(*row) for row in rows]
+
+
+def rebuild_indexes() -> int:
+    """Rebuild every registered index from a single scan of the table"""
+    global _replay, _watermark, _rebuilt_at
+    with _rebuild_lock:
+        with _apply_lock:
+            _replay = []
+        try:
+            db = SessionLocal()
+            try:
+                # Taken before the scan so rows written during it are polled again
+                watermark = db.scalar(
+                    select(func.max(func.coalesce(Restaurant.updated_at, Restaurant.created_at)))
+                )
+                records = load_records(db)
+            finally:
+                db.close()
+
+            for index in _indexes:
+                index.rebuild(records)
+        finally:
+            with _apply_lock:
+                changes, _replay = _replay, None
+                for upserts, deleted_ids in changes:
+                    _apply(upserts, deleted_ids)
+
+        _watermark = watermark
+        _polled.clear()
+        _rebuilt_at = time.monotonic()
+    logger.info(f"Rebuilt {len(_indexes)} restaurant indexes from {len(records)} restaurants")
+    return len(records)
+
+
+def apply_queued_changes() -> int:
+    """Publish the changes queued by commits, the latest one per restaurant; returns how many"""
+    latest: Dict[int, Optional[RestaurantRecord]] = {}
+    while True:
+        try:
+            upserts, deleted_ids = _queued.get_nowait()
+        except queue.Empty:
+            break
+        for record in upserts:
+            latest[record.id] = record
+        for restaurant_id in deleted_ids:
+            latest[restaurant_id] = None
+
+    if latest:
+        publish(
+            [record for record in latest.values() if record is not None],
+            [restaurant_id for restaurant_id, record in latest.items() if record is None],
+        )
+    return len(latest)
+
+
+def poll_changes() -> int:
+    """Publish the rows created or updated since the watermark; returns how many"""
+    global _watermark, _polled
+    # Local commits first, so the poll never publishes an older row over them
+    apply_queued_changes()
+    with _rebuild_lock:
+        query = select(*RECORD_COLUMNS, Restaurant.created_at, Restaurant.updated_at)
+        if _watermark is not None:
+            since = _watermark - timedelta(seconds=RESTAURANT_INDEX_WATERMARK_OVERLAP_SECONDS)
+            query = query.where(or_(Restaurant.updated_at > since, Restaurant.created_at > since))
+        db = SessionLocal()
+        try:
+            rows = db.execute(query).all()
+        finally:
+            db.close()
+
+        polled = {}
+        upserts = []
+        for row in rows:
+            *values, created_at, updated_at = row
+            changed_at = updated_at or created_at
+            polled[values[0]] = changed_at
+            if _polled.get(values[0]) != changed_at:
+                upserts.append(RestaurantRecord(*values))
+        _polled = polled
+        _watermark = max(
+            (w for w in (_watermark, *polled.values()) if w is not None), default=None
+        )
+
+    if upserts:
+        publish(upserts, [])
+        logger.info(f"Published {len(upserts)} restaurant changes read from the DB")
+    return len(upserts)
+
+
+def _apply(upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+    for index in _indexes:
+        try:
+            index.apply(upserts, deleted_ids)
+        except Exception as e:
+            # The next periodic rebuild repairs the index
+            logger.error(f"Error applying restaurant changes to {type(index).__name__}: {str(e)}")
+
+
+def publish(upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+    with _apply_lock:
+        if _replay is not None:
+            _replay.append((upserts, deleted_ids))
+        _apply(upserts, deleted_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_restaurant_changes(session: Session, flush_context) -> None:
+    pending: Optional[Dict[int, Optional[RestaurantRecord]]] = None
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, Restaurant):
+            continue
+        if pending is None:
+            pending = session.info.setdefault(_PENDING_KEY, {})
+        if obj in session.deleted:
+            pending[obj.id] = None
+        else:
+            pending[obj.id] = RestaurantRecord(
+                *(getattr(obj, field) for field in RECORD_FIELDS)
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_restaurant_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    upserts = [record for record in pending.values() if record is not None]
+    deleted_ids = [restaurant_id for restaurant_id, record in pending.items() if record is None]
+    _queued.put((upserts, deleted_ids))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_restaurant_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+async def run_change_applier(interval_seconds: float = CHANGE_APPLY_INTERVAL_SECONDS) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if _queued.empty():
+            continue
+        try:
+            await run_in_threadpool(apply_queued_changes)
+        except Exception as e:
+            logger.error(f"Error applying restaurant changes: {str(e)}")
+
+
+async def run_index_refresh(
+    poll_seconds: int = RESTAURANT_INDEX_POLL_SECONDS,
+    rebuild_seconds: int = RESTAURANT_INDEX_REFRESH_SECONDS,
+) -> None:
+    while True:
+        await asyncio.sleep(poll_seconds)
+        try:
+            if rebuild_seconds > 0 and time.monotonic() - _rebuilt_at >= rebuild_seconds:
+                await run_in_threadpool(rebuild_indexes)
+            else:
+                await run_in_threadpool(poll_changes)
+        except Exception as e:
+            logger.error(f"Error refreshing restaurant indexes: {str(e)}")
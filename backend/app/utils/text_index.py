@@ -0,0 +1,397 @@
+"""
+In-memory full-text index of active restaurants
+
+Name, cuisine and description are tokenized (lowercased, diacritics
+stripped, so "kaviaren" finds "Kaviareň") into one inverted index ranked
+with BM25. Term frequencies are weighted per field so a match in the name
+counts more than one in the description.
+
+The postings of the base segment are numpy arrays in CSR layout: the
+documents of term t are post_docs[post_ptr[t]:post_ptr[t + 1]], and the
+terms of base document d are doc_terms[doc_ptr[d]:doc_ptr[d + 1]]. Committed
+changes tombstone the base document, which is subtracted from the document
+frequency of its terms, and go to a small dict-based delta segment; the two are merged once the delta outgrows TEXT_DELTA_MERGE_RATIO
+of the base.
+
+Query terms missing from the vocabulary are matched fuzzily: a trigram
+index over the vocabulary finds terms with a Dice similarity of at least
+FUZZY_MIN_SIMILARITY ("pizzeira" -> "pizzeria"), scored in proportion to it.
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.restaurant_events import RestaurantIndex, RestaurantRecord, register_index
+
+# Weight of one occurrence of a term per field
+FIELD_WEIGHTS = (("name", 3.0), ("cuisine", 2.0), ("description", 1.0))
+BM25_K1 = 1.2
+BM25_B = 0.75
+FUZZY_MIN_SIMILARITY = 0.45
+# Vocabulary terms a misspelled query term may expand to
+FUZZY_MAX_EXPANSIONS = 4
+TEXT_DELTA_MERGE_RATIO = 0.05
+TEXT_DELTA_MIN_MERGE = 1024
+
+_TOKEN = re.compile(r"\w\w+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics, e.g. Kaviareň -> kaviaren"""
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(
+            ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch)
+        )
+    return text
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN.findall(fold(text))
+
+
+def trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _term_counts(record: RestaurantRecord, term_id) -> Tuple[Dict[int, float], float]:
+    """Weighted term frequencies of one restaurant and its weighted length"""
+    counts: Dict[int, float] = {}
+    length = 0.0
+    for field, weight in FIELD_WEIGHTS:
+        tokens = tokenize(getattr(record, field))
+        length += weight * len(tokens)
+        for token in tokens:
+            term = term_id(token)
+            counts[term] = counts.get(term, 0.0) + weight
+    return counts, length
+
+
+def _csr(keys: np.ndarray, size: int, *columns: np.ndarray):
+    """Group columns by key: (ptr, columns sorted by key); rows of key k are ptr[k]:ptr[k + 1]"""
+    order = np.argsort(keys, kind="stable")
+    ptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=ptr[1:])
+    return (ptr,) + tuple(column[order] for column in columns)
+
+
+class _Vocabulary:
+    """Append-only term dictionary with a trigram index for fuzzy lookups"""
+
+    def __init__(self):
+        self.terms: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.gram_ids: Dict[str, int] = {}
+        self.gram_ptr = np.zeros(1, dtype=np.int64)
+        self.gram_terms = np.empty(0, dtype=np.int64)
+        # Length of each term covered by the trigram CSR arrays
+        self.term_lengths = np.empty(0, dtype=np.int64)
+        # Trigrams of the terms added since the last index_trigrams(), once there was one
+        self.recent_grams: Optional[Dict[str, List[int]]] = None
+
+    def term_id(self, term: str) -> int:
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.terms.append(term)
+            self.ids[term] = term_id
+            if self.recent_grams is not None:
+                for gram in trigrams(term):
+                    self.recent_grams.setdefault(gram, []).append(term_id)
+        return term_id
+
+    def index_trigrams(self) -> None:
+        """Move the terms added since the last call into the trigram CSR arrays"""
+        first = len(self.term_lengths)
+        grams, owners = [], []
+        for term_id in range(first, len(self.terms)):
+            for gram in trigrams(self.terms[term_id]):
+                grams.append(self.gram_ids.setdefault(gram, len(self.gram_ids)))
+                owners.append(term_id)
+        indexed_grams = np.repeat(np.arange(len(self.gram_ptr) - 1), np.diff(self.gram_ptr))
+        self.gram_ptr, self.gram_terms = _csr(
+            np.concatenate([indexed_grams, np.array(grams, dtype=np.int64)]),
+            len(self.gram_ids),
+            np.concatenate([self.gram_terms, np.array(owners, dtype=np.int64)]),
+        )
+        self.term_lengths = np.concatenate([
+            self.term_lengths,
+            np.fromiter((len(t) for t in self.terms[first:]), dtype=np.int64),
+        ])
+        self.recent_grams = {}
+
+    def similar(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and Dice similarities of vocabulary terms sharing trigrams with term"""
+        grams = trigrams(term)
+        candidates = []
+        for gram in grams:
+            gram_id = self.gram_ids.get(gram)
+            if gram_id is not None and gram_id + 1 < len(self.gram_ptr):
+                candidates.append(self.gram_terms[self.gram_ptr[gram_id]:self.gram_ptr[gram_id + 1]])
+            recent = self.recent_grams.get(gram)
+            if recent:
+                candidates.append(np.array(recent, dtype=np.int64))
+        if not candidates:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        term_ids, shared = np.unique(np.concatenate(candidates), return_counts=True)
+        indexed = term_ids < len(self.term_lengths)
+        lengths = np.empty(len(term_ids), dtype=np.int64)
+        lengths[indexed] = self.term_lengths[term_ids[indexed]]
+        lengths[~indexed] = [len(self.terms[i]) for i in term_ids[~indexed].tolist()]
+        # A term of length n has n + 1 padded trigrams
+        similarity = 2.0 * shared / (len(grams) + lengths + 1)
+        return term_ids, similarity
+
+
+class _TextState:
+    """Base segment plus the delta of changes committed since it was built"""
+
+    def __init__(self, vocabulary: _Vocabulary, doc_ids: np.ndarray, doc_lengths: np.ndarray,
+                 post_terms: np.ndarray, post_docs: np.ndarray, post_tfs: np.ndarray):
+        self.vocabulary = vocabulary
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.alive = np.ones(len(doc_ids), dtype=bool)
+        self.id_order = np.argsort(doc_ids, kind="stable")
+        self.post_ptr, self.post_docs, self.post_tfs = _csr(
+            post_terms, len(vocabulary.terms), post_docs, post_tfs
+        )
+        self.doc_ptr, self.doc_terms = _csr(post_docs, len(doc_ids), post_terms.astype(np.int32))
+        # term id -> tombstoned base documents containing it
+        self.dead_df = np.zeros(len(self.post_ptr) - 1, dtype=np.int32)
+        self.total_length = float(doc_lengths.sum())
+        self.live_docs = len(doc_ids)
+        # restaurant id -> (weighted length, {term id: weighted tf})
+        self.delta_docs: Dict[int, Tuple[float, Dict[int, float]]] = {}
+        # term id -> {restaurant id: weighted tf}
+        self.delta_postings: Dict[int, Dict[int, float]] = {}
+
+    def base_position(self, restaurant_id: int) -> Optional[int]:
+        i = np.searchsorted(self.doc_ids, restaurant_id, sorter=self.id_order)
+        if i < len(self.doc_ids) and self.doc_ids[self.id_order[i]] == restaurant_id:
+            return int(self.id_order[i])
+        return None
+
+    def base_postings(self, term_id: int) -> slice:
+        if term_id + 1 < len(self.post_ptr):
+            return slice(int(self.post_ptr[term_id]), int(self.post_ptr[term_id + 1]))
+        return slice(0, 0)
+
+    def base_df(self, term_id: int) -> int:
+        """Live base documents containing the term"""
+        if term_id + 1 < len(self.post_ptr):
+            return int(self.post_ptr[term_id + 1] - self.post_ptr[term_id] - self.dead_df[term_id])
+        return 0
+
+    def tombstone(self, position: int) -> None:
+        self.alive[position] = False
+        self.total_length -= float(self.doc_lengths[position])
+        self.live_docs -= 1
+        # A document's terms are unique, so fancy-indexed += counts each once
+        self.dead_df[self.doc_terms[self.doc_ptr[position]:self.doc_ptr[position + 1]]] += 1
+
+
+def _build_state(vocabulary: _Vocabulary, records: Iterable[RestaurantRecord]) -> _TextState:
+    doc_ids, doc_lengths, post_terms, post_docs, post_tfs = [], [], [], [], []
+    for record in records:
+        counts, length = _term_counts(record, vocabulary.term_id)
+        doc = len(doc_ids)
+        doc_ids.append(record.id)
+        doc_lengths.append(length)
+        post_terms.extend(counts.keys())
+        post_docs.extend([doc] * len(counts))
+        post_tfs.extend(counts.values())
+    vocabulary.index_trigrams()
+    return _TextState(
+        vocabulary,
+        np.array(doc_ids, dtype=np.int64),
+        np.array(doc_lengths, dtype=np.float32),
+        np.array(post_terms, dtype=np.int64),
+        np.array(post_docs, dtype=np.int32),
+        np.array(post_tfs, dtype=np.float32),
+    )
+
+
+class TextIndex(RestaurantIndex):
+    """BM25-ranked, typo-tolerant search over restaurant name, cuisine and description"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = _build_state(_Vocabulary(), [])
+
+    def rebuild(self, records: List[RestaurantRecord]) -> None:
+        state = _build_state(_Vocabulary(), (r for r in records if r.is_active))
+        with self._lock:
+            self._state = state
+
+    def _remove_delta(self, state: _TextState, restaurant_id: int) -> None:
+        length, counts = state.delta_docs.pop(restaurant_id)
+        state.total_length -= length
+        state.live_docs -= 1
+        for term_id in counts:
+            postings = state.delta_postings[term_id]
+            del postings[restaurant_id]
+            if not postings:
+                del state.delta_postings[term_id]
+
+    def apply(self, upserts: List[RestaurantRecord], deleted_ids: List[int]) -> None:
+        with self._lock:
+            state = self._state
+            vocabulary = state.vocabulary
+            for restaurant_id in {r.id for r in upserts} | set(deleted_ids):
+                position = state.base_position(restaurant_id)
+                if position is not None and state.alive[position]:
+                    state.tombstone(position)
+                if restaurant_id in state.delta_docs:
+                    self._remove_delta(state, restaurant_id)
+
+            for record in upserts:
+                if not record.is_active:
+                    continue
+                counts, length = _term_counts(record, vocabulary.term_id)
+                state.delta_docs[record.id] = (length, counts)
+                state.total_length += length
+                state.live_docs += 1
+                for term_id, tf in counts.items():
+                    state.delta_postings.setdefault(term_id, {})[record.id] = tf
+
+            if len(state.delta_docs) > max(TEXT_DELTA_MIN_MERGE, TEXT_DELTA_MERGE_RATIO * len(state.doc_ids)):
+                self._state = self._merge(state)
+
+    def _merge(self, state: _TextState) -> _TextState:
+        """Fold the delta into a new base, dropping tombstoned documents"""
+        keep = state.alive[state.post_docs]
+        # Base documents renumbered without the tombstoned ones
+        renumber = np.cumsum(state.alive, dtype=np.int64) - 1
+        post_terms = np.repeat(np.arange(len(state.post_ptr) - 1), np.diff(state.post_ptr))[keep]
+        post_docs = renumber[state.post_docs[keep]]
+        post_tfs = state.post_tfs[keep]
+
+        doc_ids = [state.doc_ids[state.alive]]
+        doc_lengths = [state.doc_lengths[state.alive]]
+        first = int(state.alive.sum())
+        delta_terms, delta_docs, delta_tfs = [], [], []
+        for offset, (restaurant_id, (length, counts)) in enumerate(state.delta_docs.items()):
+            delta_terms.extend(counts.keys())
+            delta_docs.extend([first + offset] * len(counts))
+            delta_tfs.extend(counts.values())
+        doc_ids.append(np.fromiter(state.delta_docs.keys(), dtype=np.int64))
+        doc_lengths.append(np.array([length for length, _ in state.delta_docs.values()], dtype=np.float32))
+
+        state.vocabulary.index_trigrams()
+        return _TextState(
+            state.vocabulary,
+            np.concatenate(doc_ids),
+            np.concatenate(doc_lengths),
+            np.concatenate([post_terms, np.array(delta_terms, dtype=np.int64)]),
+            np.concatenate([post_docs.astype(np.int32), np.array(delta_docs, dtype=np.int32)]),
+            np.concatenate([post_tfs, np.array(delta_tfs, dtype=np.float32)]),
+        )
+
+    def _expand(self, state: _TextState, token: str) -> List[Tuple[int, float]]:
+        """(term id, weight) pairs a query token matches"""
+        term_id = state.vocabulary.ids.get(token)
+        if term_id is not None:
+            return [(term_id, 1.0)]
+
+        term_ids, similarity = state.vocabulary.similar(token)
+        matches = similarity >= FUZZY_MIN_SIMILARITY
+        term_ids, similarity = term_ids[matches], similarity[matches]
+        best = np.argsort(-similarity, kind="stable")
+        expansions = []
+        for i in best.tolist():
+            candidate = int(term_ids[i])
+            if state.base_df(candidate) or candidate in state.delta_postings:
+                expansions.append((candidate, float(similarity[i])))
+                if len(expansions) == FUZZY_MAX_EXPANSIONS:
+                    break
+        return expansions
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+        """Restaurant ids and BM25 scores of the best matches, best first"""
+        state = self._state
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = max(state.live_docs, 1)
+            avg_length = state.total_length / n_docs if state.total_length > 0 else 1.0
+            expansions: Dict[int, float] = {}
+            for token in tokens:
+                for term_id, weight in self._expand(state, token):
+                    expansions[term_id] = max(weight, expansions.get(term_id, 0.0))
+
+            base_terms = []
+            delta_scores: Dict[int, float] = {}
+            for term_id, weight in expansions.items():
+                postings = state.base_postings(term_id)
+                delta = state.delta_postings.get(term_id, {})
+                # Tombstoned base documents still sit in the postings but are not counted
+                df = state.base_df(term_id) + len(delta)
+                idf = weight * math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+                if postings.stop > postings.start:
+                    base_terms.append((postings, idf))
+                for restaurant_id, tf in delta.items():
+                    length = state.delta_docs[restaurant_id][0]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    delta_scores[restaurant_id] = (
+                        delta_scores.get(restaurant_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    )
+
+        # The base postings never change, so they are scored outside the lock
+        parts_docs, parts_scores = [], []
+        for postings, idf in base_terms:
+            docs = state.post_docs[postings]
+            tfs = state.post_tfs[postings]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * state.doc_lengths[docs] / avg_length)
+            parts_docs.append(docs)
+            parts_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+
+        ids = np.empty(0, dtype=np.int64)
+        scores = np.empty(0)
+        if parts_docs:
+            docs = np.concatenate(parts_docs)
+            partial = np.concatenate(parts_scores)
+            if len(docs) > len(state.doc_ids) // 8:
+                totals = np.bincount(docs, weights=partial, minlength=len(state.doc_ids))
+                matched = np.flatnonzero(totals)
+                totals = totals[matched]
+            else:
+                matched, inverse = np.unique(docs, return_inverse=True)
+                totals = np.bincount(inverse, weights=partial)
+            live = state.alive[matched]
+            ids, scores = state.doc_ids[matched[live]], totals[live]
+
+        if delta_scores:
+            ids = np.concatenate([ids, np.fromiter(delta_scores.keys(), dtype=np.int64)])
+            scores = np.concatenate([scores, np.fromiter(delta_scores.values(), dtype=np.float64)])
+
+        if limit < len(ids):
+            top = np.argpartition(-scores, limit)[:limit]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return list(zip(ids[order].tolist(), scores[order].tolist()))
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "documents": state.live_docs,
+            "terms": len(state.vocabulary.terms),
+            "postings": len(state.post_docs),
+            "delta_documents": len(state.delta_docs),
+        }
+
+
+# Global text index instance
+text_index = register_index(TextIndex())
@@ -0,0 +1,197 @@
+"""
+Periodic cleanup of the refresh_tokens table
+
+Runs as one dedicated process:
+
+    python -m app.utils.token_sweeper --once
+    python -m app.utils.token_sweeper --interval 300
+
+or inside the API process when REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS > 0
+(see main.py). That starts a sweeper in every uvicorn worker, all sweeping
+the same table, so it is only meant for single-worker deployments.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone, timedelta
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.refresh_token import RefreshToken, TokenStatus
+import app.models  # noqa: F401 — registers all models with SQLAlchemy's mapper
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Interval of the sweeper inside the API process; 0 leaves it to the standalone sweeper
+REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS = int(
+    os.getenv("REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS", "0")
+)
+STANDALONE_SWEEP_INTERVAL_SECONDS = 300
+REFRESH_TOKEN_SWEEP_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_SWEEP_BATCH_SIZE", "1000"))
+MAX_ACTIVE_TOKENS_PER_USER = 5
+REVOKED_TOKEN_RETENTION_DAYS = 7
+
+
+def _utc_now_naive() -> datetime:
+    # DB stores naive UTC datetimes
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def expire_tokens(db: Session, batch_size: int) -> int:
+    """Mark active tokens past their expiry as EXPIRED, one bounded chunk per commit"""
+    total = 0
+    now = _utc_now_naive()
+    while True:
+        ids = db.scalars(
+            select(RefreshToken.id)
+            .where(
+                RefreshToken.status == TokenStatus.ACTIVE,
+                RefreshToken.expires_at < now,
+            )
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+
+        db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.id.in_(ids))
+            .values(status=TokenStatus.EXPIRED)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        total += len(ids)
+
+
+def enforce_active_token_limit(db: Session) -> int:
+    """
+    Revoke all but the newest MAX_ACTIVE_TOKENS_PER_USER active tokens of every user
+
+    A single UPDATE driven by a ROW_NUMBER() window over each user's tokens.
+    """
+    ranked = (
+        select(
+            RefreshToken.id,
+            func.row_number()
+            .over(
+                partition_by=RefreshToken.user_id,
+                order_by=(RefreshToken.created_at.desc(), RefreshToken.id.desc()),
+            )
+            .label("position"),
+        )
+        .where(RefreshToken.status == TokenStatus.ACTIVE)
+        .subquery()
+    )
+    result = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.id.in_(
+                select(ranked.c.id).where(ranked.c.position > MAX_ACTIVE_TOKENS_PER_USER)
+            )
+        )
+        .values(status=TokenStatus.REVOKED)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def delete_stale_tokens(db: Session, batch_size: int) -> int:
+    """Delete expired or revoked tokens older than the retention period, in bounded chunks"""
+    total = 0
+    cutoff = _utc_now_naive() - timedelta(days=REVOKED_TOKEN_RETENTION_DAYS)
+    while True:
+        ids = db.scalars(
+            select(RefreshToken.id)
+            .where(
+                RefreshToken.status.in_([TokenStatus.EXPIRED, TokenStatus.REVOKED]),
+                RefreshToken.created_at < cutoff,
+            )
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+
+        db.execute(
+            delete(RefreshToken)
+            .where(RefreshToken.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        total += len(ids)
+
+
+def sweep_refresh_tokens(batch_size: int = REFRESH_TOKEN_SWEEP_BATCH_SIZE) -> dict:
+    """
+    Run one full cleanup pass across all users
+
+    Returns:
+        dict: Number of tokens expired, revoked and deleted
+    """
+    db = SessionLocal()
+    try:
+        result = {
+            "expired": expire_tokens(db, batch_size),
+            "revoked": enforce_active_token_limit(db),
+            "deleted": delete_stale_tokens(db, batch_size),
+        }
+        logger.info(
+            f"Refresh token sweep: expired {result['expired']}, "
+            f"revoked {result['revoked']}, deleted {result['deleted']}"
+        )
+        return result
+    except Exception as e:
+        logger.error(f"Error sweeping refresh tokens: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_token_sweeper(
+    interval_seconds: int = REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS,
+    batch_size: int = REFRESH_TOKEN_SWEEP_BATCH_SIZE,
+) -> None:
+    """Sweep forever, in the standalone sweeper or the background of the API process"""
+    while True:
+        try:
+            await run_in_threadpool(sweep_refresh_tokens, batch_size)
+        except Exception:
+            # Already logged; keep the loop alive and try again next interval
+            pass
+        await asyncio.sleep(interval_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Clean up the refresh_tokens table")
+    parser.add_argument("--once", action="store_true", help="Run a single sweep and exit")
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS or STANDALONE_SWEEP_INTERVAL_SECONDS,
+        help="Seconds between sweeps",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=REFRESH_TOKEN_SWEEP_BATCH_SIZE,
+        help="Rows updated or deleted per statement",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        sweep_refresh_tokens(args.batch_size)
+    else:
+        asyncio.run(run_token_sweeper(args.interval, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# How often each worker reloads versions bumped by other workers; 0 disables
+TOKEN_VERSION_REFRESH_SECONDS = int(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "30"))
+# Re-read this far behind the watermark for bumps that committed late or on a skewed clock
+TOKEN_VERSION_WATERMARK_OVERLAP_SECONDS = 5
+
+
+class TokenVersionMap:
+    """
+    In-memory map of token subject -> current token_version
+
+    Access tokens carry the version they were issued with ("ver" claim).
+    Bumping a user's version revokes every outstanding access token at the
+    cost of one dict lookup per request, with no denylist query.
+    """
+
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Newest token_version_changed_at seen; None until the first refresh
+        self._watermark: Optional[datetime] = None
+
+    def get(self, subject: str) -> Optional[int]:
+        return self.versions.get(subject)
+
+    def observe(self, subject: str, version: int) -> None:
+        """Record a version seen in the DB; versions only ever move forward"""
+        with self._lock:
+            if version > self.versions.get(subject, -1):
+                self.versions[subject] = version
+
+    def is_current(self, subject: str, token_version: int) -> bool:
+        current = self.versions.get(subject)
+        return current is None or token_version >= current
+
+    def refresh_from_db(self) -> int:
+        """
+        Load versions bumped elsewhere (e.g. by another worker)
+
+        The first call loads every bumped user; later ones only the users
+        bumped since the watermark, through the token_version_changed_at index.
+        """
+        started_at = _utc_now()
+        query = select(User.user_email, User.token_version, User.token_version_changed_at)
+        if self._watermark is None:
+            query = query.where(User.token_version > 0)
+        else:
+            since = self._watermark - timedelta(seconds=TOKEN_VERSION_WATERMARK_OVERLAP_SECONDS)
+            query = query.where(User.token_version_changed_at > since)
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(query).all()
+        finally:
+            db.close()
+
+        for user_email, version, _ in rows:
+            self.observe(user_email, version)
+        self._watermark = max(
+            (changed_at for _, _, changed_at in rows if changed_at is not None),
+            default=self._watermark or started_at,
+        )
+        return len(rows)
+
+
+def _utc_now() -> datetime:
+    # Naive UTC, as DateTime columns are read back
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Global token version map instance
+token_versions = TokenVersionMap()
+
+
+def bump_token_version(user: User) -> int:
+    """
+    Invalidate all access tokens issued to a user
+
+    Increments the version on the loaded user; the caller commits. Call
+    token_versions.observe() with the result once the commit succeeds.
+    """
+    user.token_version += 1
+    user.token_version_changed_at = _utc_now()
+    return user.token_version
+
+
+async def run_token_version_refresh(
+    interval_seconds: int = TOKEN_VERSION_REFRESH_SECONDS,
+) -> None:
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_in_threadpool(token_versions.refresh_from_db)
+        except Exception as e:
+            logger.error(f"Error refreshing token versions: {str(e)}")
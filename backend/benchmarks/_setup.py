@@ -0,0 +1,37 @@
+"""
+Environment shared by the benchmark scripts
+
+Import before anything from app: app.db reads DATABASE_URL at import. The
+scripts use a throwaway SQLite file unless BENCH_DATABASE_URL is set, e.g.
+to a MySQL database for numbers closer to production.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ["DATABASE_URL"] = os.getenv(
+    "BENCH_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='restaurant-bench-')}/bench.db"
+)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-that-is-long-enough-for-hs256")
+os.environ["DB_ASYNC"] = "false"
+os.environ["EMAIL_OUTBOX_POLL_SECONDS"] = "0"
+os.environ["REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS"] = "0"
+os.environ["RESTAURANT_INDEX_POLL_SECONDS"] = "0"
+os.environ["RESTAURANT_INDEX_REFRESH_SECONDS"] = "0"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+
+def create_schema() -> None:
+    from app.db import Base, engine
+    import app.models  # noqa: F401 — registers all models with SQLAlchemy's mapper
+
+    Base.metadata.create_all(engine)
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
@@ -0,0 +1,108 @@
+"""
+Typeahead latency per keystroke and the cost of applying changes
+
+Suggestions are built from restaurants with names made of common words,
+spread over a few hundred cities. Every prefix of a name or city is one
+keystroke; the target is a sub-millisecond p99. Changes are timed one at
+a time, as the change feed applies a single commit, against the full
+rebuild they replace.
+
+    python benchmarks/autocomplete.py [--restaurants 500000] [--keystrokes 20000] [--changes 2000]
+"""
+
+import argparse
+import random
+import time
+from dataclasses import replace
+
+import _setup
+
+from app.utils.autocomplete_index import AutocompleteIndex
+from app.utils.restaurant_events import RestaurantRecord
+
+CITIES = 400
+WORDS = ["Pizzeria", "Napoli", "Sushi", "Bar", "Kaviareň", "Roma", "Bistro", "Pod", "Hradom", "Zlatý",
+         "Kohút", "Grill", "House", "Garden", "Corner", "Old", "Town", "Tea", "Ramen", "Taverna",
+         "Stará", "Pošta", "Café", "Burger", "Vináreň", "Koliba", "Terasa", "Dvor", "Mlyn", "Most"]
+
+
+def make_record(rng: random.Random, restaurant_id: int, cities: list) -> RestaurantRecord:
+    name = " ".join(rng.sample(WORDS, rng.randint(1, 3))) + f" {restaurant_id}"
+    return RestaurantRecord(
+        id=restaurant_id, name=name, slug=f"r-{restaurant_id}", cuisine="italian", price_range=2,
+        address="", city=rng.choice(cities), country="Slovakia", description=None,
+        latitude=None, longitude=None, cover_image=None, rating=round(rng.uniform(1, 5), 1),
+        review_count=int(rng.paretovariate(1.2)), is_active=True,
+    )
+
+
+def keystrokes(rng: random.Random, records: list, count: int) -> list:
+    typed = []
+    while len(typed) < count:
+        record = rng.choice(records)
+        text = record.city if rng.random() < 0.3 else record.name
+        typed += [text[:length] for length in range(1, min(len(text), 10) + 1)]
+    return typed[:count]
+
+
+def change(rng: random.Random, record: RestaurantRecord, next_id: int, cities: list) -> tuple:
+    """(upserts, deleted_ids) of one commit touching one restaurant"""
+    kind = rng.random()
+    if kind < 0.6:
+        return [replace(record, review_count=record.review_count + 1)], []
+    if kind < 0.75:
+        return [replace(record, name=f"{rng.choice(WORDS)} {record.id}")], []
+    if kind < 0.85:
+        return [replace(record, city=rng.choice(cities))], []
+    if kind < 0.95:
+        return [make_record(rng, next_id, cities)], []
+    return [], [record.id]
+
+
+def timed(call, args_list: list) -> list:
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        call(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--restaurants", type=int, default=500_000)
+    parser.add_argument("--keystrokes", type=int, default=20_000)
+    parser.add_argument("--changes", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(22)
+    cities = [f"{rng.choice(WORDS)} Mesto {i}" for i in range(CITIES)]
+    records = [make_record(rng, i + 1, cities) for i in range(args.restaurants)]
+
+    index = AutocompleteIndex()
+    started = time.perf_counter()
+    index.rebuild(records)
+    rebuild_ms = (time.perf_counter() - started) * 1000
+    print(f"rebuild of {args.restaurants} restaurants: {rebuild_ms:.0f} ms, {index.stats()}")
+
+    timings = timed(index.suggest, [(prefix,) for prefix in keystrokes(rng, records, args.keystrokes)])
+    print(
+        f"suggest: p50 {_setup.percentile(timings, 0.5):.3f} ms, "
+        f"p99 {_setup.percentile(timings, 0.99):.3f} ms over {len(timings)} keystrokes"
+    )
+
+    changes = [
+        change(rng, records[rng.randrange(len(records))], args.restaurants + i + 1, cities)
+        for i in range(args.changes)
+    ]
+    # Deleted restaurants can come up again; apply() ignores unknown ids
+    timings = timed(index.apply, changes)
+    print(
+        f"apply one change: p50 {_setup.percentile(timings, 0.5):.3f} ms, "
+        f"p99 {_setup.percentile(timings, 0.99):.3f} ms over {len(timings)} changes "
+        f"(a rebuild takes {rebuild_ms:.0f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
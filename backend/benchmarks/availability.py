@@ -0,0 +1,92 @@
+"""
+Availability of a busy restaurant: the slot engine alone and with its query
+
+One restaurant open 10:00-23:50 with 15 minute slots, 100 minute turns and
+a random day of reservations, on and off the slot grid.
+
+    python benchmarks/availability.py [--reservations 2000] [--calls 1000]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, time as dtime, timedelta
+
+import _setup
+
+from app.db import SessionLocal
+from app.models.reservation import Reservation, ReservationStatus
+from app.models.restaurant import Restaurant
+from app.models.restaurant_capacity import RestaurantCapacity
+from app.models.user import User
+from app.utils.availability import compute_slots, restaurant_availability
+
+PARTY_SIZE = 4
+
+
+def measure(call, calls: int) -> list:
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list) -> None:
+    print(
+        f"{name:>13}: p50 {_setup.percentile(timings, 0.5):.3f} ms, "
+        f"p99 {_setup.percentile(timings, 0.99):.3f} ms over {len(timings)} calls"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reservations", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+
+    _setup.create_schema()
+    rng = random.Random(3)
+    day = date.today() + timedelta(days=1)
+
+    db = SessionLocal()
+    user = User(first_name="Bench", last_name="User", user_email="bench@example.com",
+                user_password="unused", email_verified=True)
+    db.add(user)
+    db.flush()
+    restaurant = Restaurant(owner_id=user.id, name="Busy", slug="busy", cuisine="italian",
+                            price_range=2, address="Main 1", city="Bratislava", country="Slovakia")
+    db.add(restaurant)
+    db.flush()
+    capacity = RestaurantCapacity(
+        restaurant_id=restaurant.id, day_of_week=day.weekday(), opens_at=dtime(10),
+        closes_at=dtime(23, 50), slot_minutes=15, turn_minutes=100, max_covers=1100,
+        max_arrivals_per_slot=120, max_party_size=12,
+    )
+    db.add(capacity)
+
+    starts = [rng.randint(10 * 60, 22 * 60) for _ in range(args.reservations)]
+    sizes = [rng.randint(1, 6) for _ in range(args.reservations)]
+    db.add_all(
+        Reservation(user_id=user.id, restaurant_id=restaurant.id, party_size=size,
+                    reservation_date=day, reservation_time=dtime(*divmod(start, 60)),
+                    status=ReservationStatus.CONFIRMED.value)
+        for start, size in zip(starts, sizes)
+    )
+    db.commit()
+    restaurant_id = restaurant.id
+
+    try:
+        report("engine", measure(lambda: compute_slots(capacity, starts, sizes, PARTY_SIZE), args.calls))
+        report("with query", measure(
+            lambda: restaurant_availability(db, restaurant_id, day, PARTY_SIZE), args.calls
+        ))
+        slots = restaurant_availability(db, restaurant_id, day, PARTY_SIZE)
+        print(f"{sum(ok for _, ok, _ in slots)} of {len(slots)} start times bookable for {PARTY_SIZE}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
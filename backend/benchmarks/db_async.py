@@ -0,0 +1,102 @@
+"""
+Requests per second with the threadpool DB path vs DB_ASYNC=true
+
+Concurrent clients each redeem refresh tokens on POST /authentication/refresh,
+a verify + revoke + reissue transaction with no bcrypt in it. Each mode runs
+in a child process with BENCH_DB_ASYNC set, since DB_ASYNC is read when
+app.db is imported. SQLite serialises writers, so set BENCH_DATABASE_URL
+to a MySQL database to see what the async driver gains past the
+threadpool size.
+
+    python benchmarks/db_async.py [--requests 5000] [--concurrency 500]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import _setup
+
+# _setup pins DB_ASYNC=false; the mode is chosen before app.db reads it
+os.environ["DB_ASYNC"] = os.getenv("BENCH_DB_ASYNC", "false")
+
+import httpx
+
+from app.db import SessionLocal
+from app.db.database import DB_ASYNC
+from app.models.user import User
+from app.utils.jwt_utils import issue_refresh_token
+from app.utils.refresh_grace import refresh_grace_cache
+from main import API
+
+
+def run_mode(requests: int, concurrency: int) -> None:
+    _setup.create_schema()
+    logging.disable(logging.WARNING)
+    # Every request presents a fresh token; the grace cache would only add noise
+    refresh_grace_cache.grace_seconds = 0
+
+    with SessionLocal() as db:
+        users = [
+            User(first_name="Bench", last_name="User", user_email=f"bench{i}@example.com",
+                 user_password="unused", email_verified=True)
+            for i in range(concurrency)
+        ]
+        db.add_all(users)
+        db.flush()
+        tokens = [issue_refresh_token(users[i % concurrency].id, db) for i in range(requests)]
+        db.commit()
+
+    async def replay() -> tuple:
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = Counter()
+        timings = []
+
+        async def refresh(client, token):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/authentication/refresh", json={"refresh_token": token})
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] += 1
+
+        async with API.router.lifespan_context(API):
+            transport = httpx.ASGITransport(app=API)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                started = time.perf_counter()
+                await asyncio.gather(*(refresh(client, token) for token in tokens))
+                return time.perf_counter() - started, statuses, timings
+
+    elapsed, statuses, timings = asyncio.run(replay())
+    mode = "async" if DB_ASYNC else "threadpool"
+    print(
+        f"{mode:>10}: {requests / elapsed:.0f} requests/s at {concurrency} clients, "
+        f"p50 {_setup.percentile(timings, 0.5):.1f} ms, p99 {_setup.percentile(timings, 0.99):.1f} ms, "
+        f"statuses {dict(sorted(statuses.items()))}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    args = parser.parse_args()
+
+    if "BENCH_DB_ASYNC" in os.environ:
+        run_mode(args.requests, args.concurrency)
+        return
+    for db_async in ("false", "true"):
+        subprocess.run(
+            [sys.executable, __file__, "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency)],
+            env={**os.environ, "BENCH_DB_ASYNC": db_async},
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Geo index queries at 1M points: radius, k-nearest, viewport and updates
+
+Points are spread around a few hundred city centres plus a uniform
+background, so dense and empty areas both show up. Radius queries are
+also timed as a brute-force haversine over every point, the cost of
+filtering rows one by one.
+
+    python benchmarks/geo_index.py [--points 1000000] [--queries 1000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import _setup
+
+from app.utils.geo_index import GeoIndex, haversine_m
+from app.utils.restaurant_events import RestaurantRecord
+
+CITIES = 300
+# Share of the points around city centres; the rest are spread uniformly
+CITY_SHARE = 0.9
+UPDATE_BATCH = 100
+
+
+def _record(restaurant_id: int, lat: float, lon: float) -> RestaurantRecord:
+    return RestaurantRecord(
+        id=restaurant_id, name="", slug="", cuisine="", price_range=1, address="", city="",
+        country="", description=None, latitude=lat, longitude=lon, cover_image=None,
+        rating=None, review_count=0, is_active=True,
+    )
+
+
+def make_points(rng: np.random.Generator, count: int) -> tuple:
+    centres = np.column_stack([rng.uniform(-60, 70, CITIES), rng.uniform(-180, 180, CITIES)])
+    in_cities = int(count * CITY_SHARE)
+    around = centres[rng.integers(0, CITIES, in_cities)]
+    background = count - in_cities
+    lats = np.concatenate([around[:, 0] + rng.normal(0, 0.08, in_cities), rng.uniform(-80, 80, background)])
+    lons = np.concatenate([around[:, 1] + rng.normal(0, 0.12, in_cities), rng.uniform(-180, 180, background)])
+    lons = (lons + 180.0) % 360.0 - 180.0
+    return centres, np.clip(lats, -89.9, 89.9), lons
+
+
+def timed(call, args_list: list) -> list:
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        call(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list) -> None:
+    print(
+        f"{name:>22}: p50 {_setup.percentile(timings, 0.5):.3f} ms, "
+        f"p99 {_setup.percentile(timings, 0.99):.3f} ms over {len(timings)} calls"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(19)
+    centres, lats, lons = make_points(rng, args.points)
+    records = [_record(i + 1, la, lo) for i, (la, lo) in enumerate(zip(lats.tolist(), lons.tolist()))]
+
+    index = GeoIndex()
+    started = time.perf_counter()
+    index.rebuild(records)
+    print(f"rebuild of {args.points} points: {time.perf_counter() - started:.2f} s")
+
+    # Half the queries at a city centre, half anywhere
+    picks = centres[rng.integers(0, CITIES, args.queries)]
+    anywhere = np.column_stack([rng.uniform(-60, 70, args.queries), rng.uniform(-180, 180, args.queries)])
+    points = np.where((np.arange(args.queries) % 2 == 0)[:, None], picks, anywhere).tolist()
+
+    for radius_m in (1_000.0, 10_000.0):
+        queries = [(la, lo, radius_m) for la, lo in points]
+        report(f"radius {radius_m / 1000:.0f} km", timed(index.radius, queries))
+    report("10 nearest", timed(index.nearest, [(la, lo, 10) for la, lo in points]))
+    report("viewport (limit 500)", timed(
+        index.bbox, [(la - 0.05, lo - 0.08, la + 0.05, lo + 0.08, 500) for la, lo in points]
+    ))
+    brute = points[: max(args.queries // 20, 1)]
+    report("brute-force radius", timed(
+        lambda la, lo: np.flatnonzero(haversine_m(la, lo, lats, lons) <= 10_000.0), brute
+    ))
+
+    # Moves of existing restaurants, as the change feed applies them: each id once per batch
+    batches = []
+    for _ in range(args.queries // 10):
+        ids = rng.choice(np.arange(1, args.points + 1), UPDATE_BATCH, replace=False)
+        batches.append(([
+            _record(int(i), float(lats[i - 1] + rng.normal(0, 0.01)), float(lons[i - 1])) for i in ids
+        ], []))
+    report(f"apply {UPDATE_BATCH} moves", timed(index.apply, batches))
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
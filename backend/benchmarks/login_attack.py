@@ -0,0 +1,160 @@
+"""
+Credential stuffing: replay an attack trace against POST /authentication/login
+
+The trace mixes attackers, who rotate through a pool of IPs and try wrong
+passwords on existing and made-up accounts, with real users logging in
+from IPs of their own. Each attempt-counter backend replays the same trace
+at a fixed concurrency. Failures are counted in the backend, so the users
+table should only see an UPDATE when an account crosses the lockout
+threshold; the old flow wrote the row on every wrong password.
+
+    python benchmarks/login_attack.py [--attempts 5000] [--accounts 200] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+import zlib
+from collections import Counter
+
+import _setup
+
+import email_validator
+import httpx
+from sqlalchemy import event, update
+
+from app.controllers import authentication_controller
+from app.db import SessionLocal, engine
+from app.models.user import User
+from app.schemas import user_schema
+from app.utils.login_attempts import (
+    FAILED_ATTEMPT_WINDOW_SECONDS,
+    InMemoryAttemptCounter,
+    SQLiteAttemptCounter,
+)
+from app.utils.password_hasher import password_hasher
+from main import API
+
+PASSWORD = "correct-horse-battery"
+# Share of the trace that is real users logging in with the right password
+LEGITIMATE_SHARE = 0.05
+# Attempts per attacker IP on average; the auth rate limit allows 5 per minute
+ATTEMPTS_PER_ATTACKER_IP = 3
+
+
+def build_trace(rng: random.Random, attempts: int, emails: list) -> list:
+    """(ip suffix, email, password, legitimate) in replay order"""
+    attacker_ips = max(attempts // ATTEMPTS_PER_ATTACKER_IP, 1)
+    trace = []
+    for i in range(attempts):
+        if rng.random() < LEGITIMATE_SHARE:
+            user = rng.randrange(len(emails))
+            trace.append((f"user-{user}", emails[user], PASSWORD, True))
+        elif rng.random() < 0.5:
+            trace.append((f"attacker-{rng.randrange(attacker_ips)}", rng.choice(emails), f"password-guess-{i}", False))
+        else:
+            trace.append((f"attacker-{rng.randrange(attacker_ips)}", f"nobody{i}@example.com", "password-guess", False))
+    return trace
+
+
+def ip_address(run: int, suffix: str) -> str:
+    # A fresh address range per run, so the rate limiter starts empty for each backend
+    number = zlib.crc32(f"{run}:{suffix}".encode()) & 0xFFFFFF
+    return f"10.{number >> 16}.{(number >> 8) & 0xFF}.{number & 0xFF}"
+
+
+async def replay(trace: list, run: int, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = Counter()
+    legitimate_ms = []
+
+    async def attempt(client, suffix, email, password, legitimate):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/authentication/login",
+                json={"user_email": email, "user_password": password},
+                headers={"x-forwarded-for": ip_address(run, suffix)},
+            )
+            if legitimate:
+                legitimate_ms.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+
+    transport = httpx.ASGITransport(app=API)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(attempt(client, *entry) for entry in trace))
+        elapsed = time.perf_counter() - started
+    return elapsed, statuses, legitimate_ms
+
+
+async def run_backends(trace: list, concurrency: int, counters: dict) -> None:
+    user_updates = Counter()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_user_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE USERS"):
+            user_updates["count"] += 1
+
+    async with API.router.lifespan_context(API):
+        for run, (name, counter) in enumerate(counters.items()):
+            authentication_controller.login_attempts = counter
+            with SessionLocal() as db:
+                db.execute(update(User).values(locked_until=None))
+                db.commit()
+            user_updates.clear()
+
+            elapsed, statuses, legitimate_ms = await replay(trace, run, concurrency)
+            print(
+                f"{name:>7}: {len(trace) / elapsed:.0f} attempts/s, "
+                f"{user_updates['count']} UPDATE users, real logins p50 "
+                f"{_setup.percentile(legitimate_ms, 0.5):.1f} ms, p99 "
+                f"{_setup.percentile(legitimate_ms, 0.99):.1f} ms"
+            )
+            print(f"         statuses {dict(sorted(statuses.items()))}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=5000)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    _setup.create_schema()
+    # No DNS lookups for the deliverability check
+    user_schema.validate_email = lambda value, **kwargs: email_validator.validate_email(
+        value, check_deliverability=False
+    )
+    logging.disable(logging.WARNING)
+    password_hasher.calibrate()
+    # One hash for every account; only the verification cost matters here
+    password_hash = password_hasher.context.hash(PASSWORD)
+    emails = [f"user{i}@example.com" for i in range(args.accounts)]
+    with SessionLocal() as db:
+        db.add_all(
+            User(first_name="Bench", last_name="User", user_email=email,
+                 user_password=password_hash, email_verified=True)
+            for email in emails
+        )
+        db.commit()
+
+    trace = build_trace(random.Random(9), args.attempts, emails)
+    known = set(emails)
+    wrong = sum(not legitimate and email in known for _, email, _, legitimate in trace)
+    print(f"{len(trace)} attempts, {wrong} wrong passwords for existing accounts")
+    counters = {
+        "memory": InMemoryAttemptCounter(FAILED_ATTEMPT_WINDOW_SECONDS),
+        "sqlite": SQLiteAttemptCounter(
+            FAILED_ATTEMPT_WINDOW_SECONDS, os.path.join(tempfile.mkdtemp(), "attempts.db")
+        ),
+    }
+    asyncio.run(run_backends(trace, args.concurrency, counters))
+
+
+if __name__ == "__main__":
+    main()
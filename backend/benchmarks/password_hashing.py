@@ -0,0 +1,99 @@
+"""
+Logins per second: bcrypt in the request threadpool vs the process pool
+
+Concurrent password verifications run next to a cheap threadpool task
+that stands in for every other route. In the threadpool bcrypt holds the
+GIL for the whole hash, so the cheap task waits behind it; the process
+pool keeps it responsive and scales with PASSWORD_HASH_WORKERS.
+
+    python benchmarks/password_hashing.py [--logins 200] [--rounds 10] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import _setup
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.utils.password_hasher import PasswordHasher, build_crypt_context
+
+# Interval between cheap requests while the logins run
+PING_INTERVAL_SECONDS = 0.005
+
+
+async def threadpool_verify(context, password: str, hashed: str) -> bool:
+    # The old flow: a sync endpoint calling bcrypt directly
+    return await run_in_threadpool(context.verify, password, hashed)
+
+
+async def run(verify, logins: int, concurrency: int) -> tuple:
+    """(logins per second, latencies of the cheap task in ms)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    pings = []
+    done = asyncio.Event()
+
+    async def login():
+        async with semaphore:
+            await verify()
+
+    async def ping():
+        while not done.is_set():
+            started = time.perf_counter()
+            await run_in_threadpool(lambda: None)
+            pings.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(PING_INTERVAL_SECONDS)
+
+    pinger = asyncio.create_task(ping())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await pinger
+    return logins / elapsed, pings
+
+
+def report(name: str, per_second: float, workers: int, pings: list) -> None:
+    print(
+        f"{name:>12}: {per_second:.1f} logins/s ({per_second / workers:.1f} per core), "
+        f"other routes p50 {_setup.percentile(pings, 0.5):.2f} ms, "
+        f"p99 {_setup.percentile(pings, 0.99):.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    context = build_crypt_context(args.rounds)
+    password = "correct-horse-battery"
+    hashed = context.hash(password)
+
+    # max_pending above the concurrency, so no login is turned away with 503
+    hasher = PasswordHasher(args.workers, args.concurrency + 1, budget_ms=0)
+    hasher.configure(args.rounds)
+    try:
+        per_second, pings = asyncio.run(
+            run(lambda: threadpool_verify(context, password, hashed), args.logins, args.concurrency)
+        )
+        # Threadpool bcrypt is serialised by the GIL: one core whatever the thread count
+        report("threadpool", per_second, 1, pings)
+
+        # Start the pool before timing
+        asyncio.run(hasher.verify(password, hashed))
+        per_second, pings = asyncio.run(
+            run(lambda: hasher.verify(password, hashed), args.logins, args.concurrency)
+        )
+        report("process pool", per_second, args.workers, pings)
+    finally:
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Rate limiter checks: per-key timestamp lists vs the sliding window counter
+
+The timestamp-list limiter the app used to have is rebuilt here as the
+baseline. Both see one check for each of --keys distinct keys, then one
+key checked --hot-limit times under a limit that high, where the list is
+rebuilt on every check. Memory is measured with tracemalloc in a separate
+pass over --memory-keys keys, each checked up to the auth limit of 5. The
+sharded counter also runs from several threads at once.
+
+    python benchmarks/rate_limiter.py [--keys 1000000] [--hot-limit 1000] [--memory-keys 100000] [--threads 8]
+"""
+
+import argparse
+import logging
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import _setup
+
+from app.utils.rate_limiter import RateLimiter
+
+WINDOW_SECONDS = 60
+# The auth endpoints' limit
+MAX_REQUESTS = 5
+
+
+class TimestampListRateLimiter:
+    """The old limiter: a list of datetimes per IP, filtered on every check"""
+
+    def __init__(self):
+        self.requests: Dict[str, List[datetime]] = {}
+
+    def is_rate_limited(self, client_ip: str, max_requests: int = 5, window_seconds: int = 60) -> bool:
+        now = datetime.now()
+        window_start = now - timedelta(seconds=window_seconds)
+        if client_ip not in self.requests:
+            self.requests[client_ip] = []
+        self.requests[client_ip] = [t for t in self.requests[client_ip] if t > window_start]
+        if len(self.requests[client_ip]) >= max_requests:
+            return True
+        self.requests[client_ip].append(now)
+        return False
+
+
+def check_keys(limiter, keys: list, max_requests: int) -> float:
+    """Seconds to check every key once"""
+    started = time.perf_counter()
+    for key in keys:
+        limiter.is_rate_limited(key, max_requests, WINDOW_SECONDS)
+    return time.perf_counter() - started
+
+
+def bytes_per_key(make_limiter, keys: list) -> float:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        limiter = make_limiter()
+        for _ in range(MAX_REQUESTS):
+            check_keys(limiter, keys, MAX_REQUESTS)
+        return (tracemalloc.get_traced_memory()[0] - before) / len(keys)
+    finally:
+        tracemalloc.stop()
+
+
+def hot_key_timings(limiter, checks: int) -> list:
+    timings = []
+    for _ in range(checks):
+        started = time.perf_counter()
+        limiter.is_rate_limited("hot", checks, WINDOW_SECONDS)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+def threaded_checks_per_second(limiter, keys: list, threads: int) -> float:
+    slices = [keys[i::threads] for i in range(threads)]
+    workers = [
+        threading.Thread(target=check_keys, args=(limiter, part, MAX_REQUESTS)) for part in slices
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(keys) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--hot-limit", type=int, default=1000)
+    parser.add_argument("--memory-keys", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    # Hot-key checks past the limit would log a warning each
+    logging.disable(logging.WARNING)
+    keys = [f"10.{i >> 16 & 0xFF}.{i >> 8 & 0xFF}.{i & 0xFF}:{i >> 24}" for i in range(args.keys)]
+    limiters = {
+        "timestamp lists": TimestampListRateLimiter,
+        "window counter": lambda: RateLimiter(max_keys=args.keys),
+    }
+
+    for name, make_limiter in limiters.items():
+        seconds = check_keys(make_limiter(), keys, MAX_REQUESTS)
+        hot = hot_key_timings(make_limiter(), args.hot_limit)
+        memory = bytes_per_key(make_limiter, keys[:args.memory_keys])
+        print(
+            f"{name:>15}: {args.keys / seconds / 1000:.0f}k new keys/s, "
+            f"{memory:.0f} bytes/key, hot key at {args.hot_limit} "
+            f"requests p50 {_setup.percentile(hot, 0.5):.1f} us, p99 {_setup.percentile(hot, 0.99):.1f} us"
+        )
+
+    per_second = threaded_checks_per_second(RateLimiter(max_keys=args.keys), keys, args.threads)
+    print(f"{'window counter':>15}: {per_second / 1000:.0f}k checks/s from {args.threads} threads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Refresh latency: single-transaction rotation vs the old three-commit flow
+
+The old flow verified the token, revoked it and issued a new one with a
+commit each (and could let two concurrent refreshes both succeed). It is
+rebuilt here from the remaining primitives as the baseline.
+
+    python benchmarks/refresh_rotation.py [--refreshes 500]
+"""
+
+import argparse
+import time
+
+import _setup
+
+from app.db import SessionLocal
+from app.models.user import User
+from app.utils.jwt_utils import (
+    create_access_token,
+    issue_refresh_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+    verify_and_get_refresh_token,
+)
+from app.utils.refresh_grace import refresh_grace_cache
+
+
+def three_commit_refresh(token: str, db) -> dict:
+    db_token = verify_and_get_refresh_token(token, db)
+    user = db.get(User, db_token.user_id)
+    revoke_refresh_token(token, db)
+    new_token = issue_refresh_token(user.id, db)
+    db.commit()
+    return {
+        "access_token": create_access_token({"sub": user.user_email, "ver": user.token_version}),
+        "refresh_token": new_token,
+        "token_type": "bearer",
+    }
+
+
+def measure(refresh, user_id: int, refreshes: int) -> list:
+    db = SessionLocal()
+    try:
+        token = issue_refresh_token(user_id, db)
+        db.commit()
+        timings = []
+        for _ in range(refreshes):
+            started = time.perf_counter()
+            token = refresh(token, db)["refresh_token"]
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--refreshes", type=int, default=500)
+    args = parser.parse_args()
+
+    _setup.create_schema()
+    # Each refresh presents a fresh token; the grace cache would only add noise
+    refresh_grace_cache.grace_seconds = 0
+
+    db = SessionLocal()
+    user = User(first_name="Bench", last_name="User", user_email="bench@example.com",
+                user_password="unused", email_verified=True)
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    for name, refresh in (("three commits", three_commit_refresh), ("rotation", rotate_refresh_token)):
+        timings = measure(refresh, user_id, args.refreshes)
+        print(
+            f"{name:>14}: p50 {_setup.percentile(timings, 0.5):.2f} ms, "
+            f"p99 {_setup.percentile(timings, 0.99):.2f} ms over {args.refreshes} refreshes"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Refresh token lookups: full JWT string key vs SHA-256 digest key on SQLite
+
+Both tables hold the same signed refresh tokens, one keyed by the encoded
+JWT in a unique VARCHAR(255) like the old refresh_tokens.token, the other
+by the 32-byte digest the app stores now. Lookups include hashing the
+presented token, as verify_and_get_refresh_token does. The request asked
+for 10M rows; that takes a while to generate, so pass --rows 10000000.
+
+    python benchmarks/refresh_token_index.py [--rows 200000] [--lookups 20000]
+"""
+
+import argparse
+import os
+import random
+import secrets
+import sqlite3
+import tempfile
+import time
+
+import _setup
+
+import jwt
+
+from app.utils.jwt_utils import ALGORITHM, SECRET_KEY, hash_refresh_token
+
+BATCH_SIZE = 50_000
+
+SCHEMAS = {
+    "jwt string": (
+        "CREATE TABLE refresh_tokens (id INTEGER PRIMARY KEY, token VARCHAR(255) NOT NULL, "
+        "expires_at DATETIME NOT NULL, status VARCHAR(20) NOT NULL, user_id INTEGER NOT NULL)",
+        "CREATE UNIQUE INDEX ix_refresh_tokens_key ON refresh_tokens (token)",
+        "SELECT id, status FROM refresh_tokens WHERE token = ?",
+    ),
+    "sha-256": (
+        "CREATE TABLE refresh_tokens (id INTEGER PRIMARY KEY, token_hash BINARY(32) NOT NULL, "
+        "expires_at DATETIME NOT NULL, status VARCHAR(20) NOT NULL, user_id INTEGER NOT NULL)",
+        "CREATE UNIQUE INDEX ix_refresh_tokens_key ON refresh_tokens (token_hash)",
+        "SELECT id, status FROM refresh_tokens WHERE token_hash = ?",
+    ),
+}
+
+
+def make_tokens(rows: int) -> list:
+    expires = time.time() + 30 * 86400
+    return [
+        jwt.encode(
+            {"sub": str(i % 100_000), "exp": expires + i, "jti": secrets.token_hex(16)},
+            SECRET_KEY,
+            algorithm=ALGORITHM,
+        )
+        for i in range(rows)
+    ]
+
+
+def build(path: str, name: str, tokens: list) -> sqlite3.Connection:
+    create_table, create_index, _ = SCHEMAS[name]
+    key = hash_refresh_token if name == "sha-256" else str
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(create_table)
+    # Indexed while inserting, like the live table
+    conn.execute(create_index)
+    for start in range(0, len(tokens), BATCH_SIZE):
+        conn.executemany(
+            "INSERT INTO refresh_tokens VALUES (NULL, ?, '2030-01-01 00:00:00', 'active', ?)",
+            ((key(token), i % 100_000) for i, token in enumerate(tokens[start:start + BATCH_SIZE], start)),
+        )
+        conn.commit()
+    return conn
+
+
+def index_bytes(conn: sqlite3.Connection) -> int:
+    (size,) = conn.execute(
+        "SELECT SUM(pgsize) FROM dbstat WHERE name = 'ix_refresh_tokens_key'"
+    ).fetchone()
+    return size
+
+
+def measure(conn: sqlite3.Connection, name: str, presented: list) -> list:
+    query = SCHEMAS[name][2]
+    key = hash_refresh_token if name == "sha-256" else str
+    timings = []
+    for token in presented:
+        started = time.perf_counter()
+        row = conn.execute(query, (key(token),)).fetchone()
+        timings.append((time.perf_counter() - started) * 1000)
+        assert row is not None
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.rows)
+    presented = random.Random(4).choices(tokens, k=args.lookups)
+    directory = tempfile.mkdtemp(prefix="refresh-index-")
+    print(f"{args.rows} tokens of {len(tokens[0])} characters")
+
+    for name in SCHEMAS:
+        path = os.path.join(directory, f"{name.replace(' ', '-')}.db")
+        started = time.perf_counter()
+        conn = build(path, name, tokens)
+        build_seconds = time.perf_counter() - started
+        try:
+            timings = measure(conn, name, presented)
+            print(
+                f"{name:>10}: index {index_bytes(conn) / 2**20:.1f} MiB, "
+                f"file {os.path.getsize(path) / 2**20:.1f} MiB, built in {build_seconds:.1f} s, "
+                f"lookup p50 {_setup.percentile(timings, 0.5) * 1000:.1f} us, "
+                f"p99 {_setup.percentile(timings, 0.99) * 1000:.1f} us"
+            )
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
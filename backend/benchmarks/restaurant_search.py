@@ -0,0 +1,132 @@
+"""
+GET /restaurants at deep pages: keyset cursors vs OFFSET on a large table
+
+Fills the restaurants table (1M rows by default, with the composite
+search indexes), walks the pages of a few searches by following
+next_cursor and times chosen depths. Each depth is fetched again with
+the cursor that leads to it and with the equivalent OFFSET query.
+
+    python benchmarks/restaurant_search.py [--restaurants 1000000] [--depths 1,10,100,1000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+
+import _setup
+
+from sqlalchemy import select
+
+from app.controllers.restaurant_controller import search_restaurants
+from app.db import SessionLocal, engine
+from app.models.restaurant import Restaurant
+from app.models.user import User
+from app.schemas.restaurant_schema import RestaurantSort, RestaurantSummary
+
+PAGE_SIZE = 20
+BATCH_SIZE = 50_000
+# Timed fetches per depth; the median is reported
+REPEATS = 5
+CITIES = [f"City {i}" for i in range(40)]
+CUISINES = ["italian", "japanese", "slovak", "indian", "mexican", "french", "thai", "greek"]
+WORDS = ["Golden", "Red", "Old", "Little", "Blue", "Royal", "Corner", "Garden", "House", "Table",
+         "Kitchen", "Bistro", "Grill", "Tavern", "Oven", "Spoon", "Olive", "Lotus", "Cellar", "Bar"]
+
+
+def fill(count: int, owner_id: int) -> None:
+    """Plain INSERTs in batches; the change feed and its indexes are not involved"""
+    rng = random.Random(18)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, count, BATCH_SIZE):
+            conn.execute(
+                Restaurant.__table__.insert(),
+                [
+                    {
+                        "owner_id": owner_id,
+                        "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+                        "slug": f"restaurant-{i}",
+                        "cuisine": rng.choice(CUISINES),
+                        "price_range": rng.randint(1, 4),
+                        "address": f"Main {i % 300}",
+                        "city": rng.choice(CITIES),
+                        "country": "Slovakia",
+                        # A tenth unrated, the rest on a coarse scale so ratings repeat
+                        "rating": None if rng.random() < 0.1 else rng.randint(10, 50) / 10,
+                        "review_count": rng.randint(0, 500),
+                        "is_active": rng.random() < 0.95,
+                        "created_at": now,
+                    }
+                    for i in range(start, min(start + BATCH_SIZE, count))
+                ],
+            )
+
+
+def median_ms(call) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return _setup.percentile(timings, 0.5)
+
+
+def offset_page(db, city, sort: RestaurantSort, page: int) -> list:
+    """The same page with OFFSET, serialised like the endpoint's items"""
+    query = select(Restaurant).where(Restaurant.is_active.is_(True))
+    if city is not None:
+        query = query.where(Restaurant.city == city)
+    if sort == RestaurantSort.NAME:
+        query = query.order_by(Restaurant.name, Restaurant.id)
+    else:
+        query = query.order_by(Restaurant.rating.desc(), Restaurant.id.desc())
+    rows = db.scalars(query.offset(page * PAGE_SIZE).limit(PAGE_SIZE))
+    return [RestaurantSummary.model_validate(r) for r in rows]
+
+
+def measure(db, city, sort: RestaurantSort, depths: list) -> None:
+    search = dict(city=city, cuisine=None, price_range=None, is_active=True, sort=sort, limit=PAGE_SIZE)
+    cursor, page = None, 1
+    label = f"{sort.value}, {'city ' + city if city else 'all cities'}"
+    for depth in depths:
+        # Walk to the page before the target one
+        while page < depth:
+            cursor = search_restaurants(cursor=cursor, db=db, **search).next_cursor
+            page += 1
+            if cursor is None:
+                print(f"{label}: only {page - 1} pages")
+                return
+        keyset = median_ms(lambda: search_restaurants(cursor=cursor, db=db, **search))
+        offset = median_ms(lambda: offset_page(db, city, sort, depth - 1))
+        print(f"{label:>24} page {depth:>5}: keyset {keyset:7.2f} ms, offset {offset:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--restaurants", type=int, default=1_000_000)
+    parser.add_argument("--depths", default="1,10,100,1000")
+    args = parser.parse_args()
+    depths = sorted(int(d) for d in args.depths.split(","))
+
+    _setup.create_schema()
+    db = SessionLocal()
+    user = User(first_name="Bench", last_name="User", user_email="bench@example.com",
+                user_password="unused", email_verified=True)
+    db.add(user)
+    db.commit()
+
+    started = time.perf_counter()
+    fill(args.restaurants, user.id)
+    print(f"{args.restaurants} restaurants inserted in {time.perf_counter() - started:.0f} s")
+
+    try:
+        for sort in (RestaurantSort.RATING, RestaurantSort.NAME):
+            for city in (None, CITIES[0]):
+                measure(db, city, sort, depths)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
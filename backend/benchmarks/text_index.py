@@ -0,0 +1,107 @@
+"""
+Full-text search latency over 1M restaurants
+
+Names, cuisines and descriptions are drawn from a Zipf-distributed
+vocabulary, so there are very common and very rare terms. Queries are
+single terms, two terms and misspellings that only match fuzzily. A plain
+substring scan over every document, what LIKE '%term%' does, is the
+baseline.
+
+    python benchmarks/text_index.py [--documents 1000000] [--queries 1000]
+"""
+
+import argparse
+import itertools
+import random
+import time
+
+import _setup
+
+from app.utils.restaurant_events import RestaurantRecord
+from app.utils.text_index import TextIndex
+
+VOCABULARY = 20_000
+DESCRIPTION_WORDS = (8, 25)
+CUISINES = ["italian", "japanese", "slovak", "indian", "mexican", "french", "thai", "greek",
+            "vietnamese", "turkish", "spanish", "korean"]
+
+
+def make_words(rng: random.Random) -> list:
+    syllables = ["ka", "ro", "mi", "ne", "ta", "lo", "pi", "za", "ve", "su", "do", "ri", "ba", "ch", "el"]
+    words = set()
+    while len(words) < VOCABULARY:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 5))))
+    return sorted(words)
+
+
+def make_records(rng: random.Random, count: int, words: list) -> list:
+    # Zipf-like: word i drawn with weight 1 / (i + 1)
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(words))))
+    records = []
+    for i in range(count):
+        picked = rng.choices(words, cum_weights=cum_weights, k=2 + rng.randint(*DESCRIPTION_WORDS))
+        records.append(RestaurantRecord(
+            id=i + 1, name=f"{picked[0].title()} {picked[1].title()}", slug=f"r-{i}",
+            cuisine=rng.choice(CUISINES), price_range=2, address="", city="", country="",
+            description=" ".join(picked[2:]), latitude=None, longitude=None, cover_image=None,
+            rating=None, review_count=0, is_active=True,
+        ))
+    return records
+
+
+def misspell(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word) - 1)
+    # Swap two neighbouring letters: "pizzeria" -> "pizzeira"
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def timed(call, queries: list) -> list:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        call(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list) -> None:
+    print(
+        f"{name:>16}: p50 {_setup.percentile(timings, 0.5):.2f} ms, "
+        f"p99 {_setup.percentile(timings, 0.99):.2f} ms over {len(timings)} queries"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(21)
+    words = make_words(rng)
+    records = make_records(rng, args.documents, words)
+
+    index = TextIndex()
+    started = time.perf_counter()
+    index.rebuild(records)
+    print(f"rebuild of {args.documents} documents: {time.perf_counter() - started:.1f} s, {index.stats()}")
+
+    common, rare = words[:100], words[-5000:]
+    queries = {
+        "common term": [rng.choice(common) for _ in range(args.queries)],
+        "rare term": [rng.choice(rare) for _ in range(args.queries)],
+        "two terms": [f"{rng.choice(common)} {rng.choice(words)}" for _ in range(args.queries)],
+        "misspelled term": [misspell(rng, rng.choice(words[:2000])) for _ in range(args.queries)],
+    }
+    for name, batch in queries.items():
+        report(name, timed(lambda q: index.search(q, limit=20), batch))
+
+    texts = [f"{r.name} {r.cuisine} {r.description}".lower() for r in records]
+    report("substring scan", timed(
+        lambda q: [i for i, text in enumerate(texts) if q in text],
+        queries["rare term"][: max(args.queries // 100, 1)],
+    ))
+
+
+if __name__ == "__main__":
+    main()
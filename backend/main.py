@@ -1,14 +1,75 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 import fastapi as fa
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.controllers import ALL_CONTROLLERS
+from app.db import async_engine
+from app.utils.email_worker import EMAIL_OUTBOX_POLL_SECONDS, run_email_worker
+from app.utils.password_hasher import password_hasher
+from app.utils.rate_limit_middleware import RateLimitMiddleware
+from app.utils.restaurant_events import (
+    RESTAURANT_INDEX_POLL_SECONDS,
+    rebuild_indexes,
+    run_change_applier,
+    run_index_refresh,
+)
+from app.utils.token_sweeper import (
+    REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS,
+    run_token_sweeper,
+)
+from app.utils.token_versions import (
+    TOKEN_VERSION_REFRESH_SECONDS,
+    run_token_version_refresh,
+    token_versions,
+)
 import app.models  # noqa: F401 — registers all models with SQLAlchemy's mapper
 
-API = fa.FastAPI(title="API", version="0.1.0", root_path="/api")
+
+@asynccontextmanager
+async def lifespan(app: fa.FastAPI):
+    await run_in_threadpool(password_hasher.calibrate)
+
+    await run_in_threadpool(token_versions.refresh_from_db)
+
+    # In-memory restaurant indexes (geo, catalog, ...) are registered by their controllers' imports
+    await run_in_threadpool(rebuild_indexes)
+
+    # Applies this worker's restaurant commits to the indexes outside the requests
+    background_tasks = [asyncio.create_task(run_change_applier())]
+    # Off by default, since every uvicorn worker would sweep the same table;
+    # run `python -m app.utils.token_sweeper` as one dedicated process instead
+    if REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_token_sweeper()))
+    if TOKEN_VERSION_REFRESH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_token_version_refresh()))
+    if RESTAURANT_INDEX_POLL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_index_refresh()))
+    # Off by default like the sweeper; run `python -m app.utils.email_worker` instead
+    if EMAIL_OUTBOX_POLL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_email_worker()))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    password_hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+API = fa.FastAPI(title="API", version="0.1.0", root_path="/api", lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
 ]
 
+# Added before CORS so that 429 responses still carry the CORS headers
+API.add_middleware(RateLimitMiddleware)
+
 API.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # TODO: z env
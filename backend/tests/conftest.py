@@ -0,0 +1,64 @@
+"""
+Shared test setup
+
+app.db reads DATABASE_URL when it is first imported, so the environment is
+set here, before any test module imports the app. Tests run against a
+throwaway SQLite file unless TEST_DATABASE_URL points at a real server.
+"""
+
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_TMP_DIR = tempfile.mkdtemp(prefix="restaurant-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_TMP_DIR}/test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-that-is-long-enough-for-hs256")
+os.environ["DB_ASYNC"] = "false"
+# No background loops in the app under test
+os.environ["EMAIL_OUTBOX_POLL_SECONDS"] = "0"
+os.environ["REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS"] = "0"
+os.environ["RESTAURANT_INDEX_POLL_SECONDS"] = "0"
+os.environ["RESTAURANT_INDEX_REFRESH_SECONDS"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+
+@pytest.fixture(scope="session")
+def tmp_dir() -> str:
+    return _TMP_DIR
+
+
+@pytest.fixture(scope="session")
+def db_engine():
+    from app.db import Base, engine
+    import app.models  # noqa: F401 — registers all models with SQLAlchemy's mapper
+
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def make_user(db_engine):
+    """Factory inserting a user with a unique email; returns (id, email)"""
+    from app.db import SessionLocal
+    from app.models.user import User
+
+    def make(password_hash: str = "unused") -> tuple:
+        db = SessionLocal()
+        try:
+            user = User(
+                first_name="Test",
+                last_name="User",
+                user_email=f"user-{uuid.uuid4().hex[:12]}@example.com",
+                user_password=password_hash,
+                email_verified=True,
+            )
+            db.add(user)
+            db.commit()
+            return user.id, user.user_email
+        finally:
+            db.close()
+
+    return make
@@ -0,0 +1,78 @@
+"""
+Typeahead suggestions after incremental changes
+
+apply() bisects each changed restaurant and its city in and out of the
+sorted keys and patches the precomputed top lists. An index that got to a
+set of restaurants that way must suggest exactly what a rebuild of that set
+suggests, for precomputed short prefixes and ranked longer ones alike.
+"""
+
+import random
+from dataclasses import replace
+
+import pytest
+
+from app.utils.autocomplete_index import AutocompleteIndex
+from app.utils.restaurant_events import RestaurantRecord
+
+WORDS = ["Pizzeria", "Napoli", "Sushi", "Bar", "Kaviareň", "Roma", "Bistro", "Pod", "Hradom"]
+CITIES = ["Bratislava", "Banská Bystrica", "Košice", "Brno", "Prešov"]
+PREFIXES = ["b", "br", "bra", "p", "pi", "piz", "pizz", "k", "ka", "kav", "kos", "s", "su", "nap", "ro", "pod h"]
+
+
+def _record(rng: random.Random, restaurant_id: int, is_active: bool = True) -> RestaurantRecord:
+    name = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+    return RestaurantRecord(
+        id=restaurant_id, name=name, slug=f"r-{restaurant_id}", cuisine="italian", price_range=2,
+        address="Main 1", city=rng.choice(CITIES), country="Slovakia", description=None,
+        latitude=None, longitude=None, cover_image=None, rating=None,
+        # Distinct weights, so ties cannot order rebuilt and patched lists differently
+        review_count=rng.randrange(10_000) * 1000 + restaurant_id, is_active=is_active,
+    )
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_changes_match_a_rebuild(seed):
+    rng = random.Random(seed)
+    records = {i: _record(rng, i) for i in range(1, 150)}
+    index = AutocompleteIndex()
+    index.rebuild(list(records.values()))
+
+    for _ in range(200):
+        ids = rng.sample(range(1, 200), rng.randint(1, 4))
+        deleted_ids = ids[:1] if rng.random() < 0.2 else []
+        upserts = []
+        for restaurant_id in ids[len(deleted_ids):]:
+            record = _record(rng, restaurant_id, is_active=rng.random() > 0.15)
+            if restaurant_id in records and rng.random() < 0.5:
+                # Popularity change only, same name and city
+                record = replace(records[restaurant_id], review_count=record.review_count)
+            upserts.append(record)
+        index.apply(upserts, deleted_ids)
+        for record in upserts:
+            records[record.id] = record
+        for restaurant_id in deleted_ids:
+            records.pop(restaurant_id, None)
+
+    rebuilt = AutocompleteIndex()
+    rebuilt.rebuild([r for r in records.values() if r.is_active])
+    for prefix in PREFIXES:
+        assert index.suggest(prefix) == rebuilt.suggest(prefix), prefix
+    assert index.stats() == rebuilt.stats()
+
+
+def test_city_is_suggested_until_its_last_restaurant_goes():
+    rng = random.Random(3)
+    first = replace(_record(rng, 1), city="Žilina")
+    second = replace(_record(rng, 2), city="Zilina")
+    index = AutocompleteIndex()
+    index.rebuild([first, second])
+
+    def cities():
+        return [s.text for s in index.suggest("zil") if s.kind == "city"]
+
+    assert cities() == ["Žilina"]
+    index.apply([], [1])
+    assert cities() == ["Žilina"]
+    index.apply([], [2])
+    assert cities() == []
@@ -0,0 +1,95 @@
+"""
+Reservation times offered for one day
+
+The last reservation starts turn_minutes before closes_at, even when the
+turn or the opening hours are not a multiple of the slot. The vectorized
+occupancy must agree with counting every reservation over every slot.
+"""
+
+import random
+from datetime import time
+
+import pytest
+
+from app.models.restaurant_capacity import RestaurantCapacity
+from app.utils.availability import compute_slots
+
+
+def _capacity(closes_at: time, slot_minutes: int, turn_minutes: int, **limits) -> RestaurantCapacity:
+    return RestaurantCapacity(
+        opens_at=time(11), closes_at=closes_at, slot_minutes=slot_minutes,
+        turn_minutes=turn_minutes, max_covers=limits.get("max_covers", 40),
+        max_arrivals_per_slot=limits.get("max_arrivals_per_slot"), max_party_size=12,
+    )
+
+
+@pytest.mark.parametrize(
+    "closes_at, slot_minutes, turn_minutes, last_start",
+    [
+        (time(22), 30, 45, time(21)),
+        (time(22), 30, 60, time(21)),
+        (time(21, 45), 30, 45, time(21)),
+        (time(22), 45, 30, time(21, 30)),
+        (time(22), 40, 45, time(21)),
+        (time(22), 15, 100, time(20, 15)),
+    ],
+)
+def test_last_start_is_turn_minutes_before_closing(closes_at, slot_minutes, turn_minutes, last_start):
+    slots = compute_slots(_capacity(closes_at, slot_minutes, turn_minutes), [], [], 2)
+
+    assert slots[0][0] == time(11)
+    assert slots[-1][0] == last_start
+
+
+def test_no_start_when_a_stay_does_not_fit_before_closing():
+    assert compute_slots(_capacity(time(11, 30), 30, 45), [], [], 2) == []
+
+
+def test_a_stay_ending_mid_slot_holds_that_slot():
+    # 21:00 + 45 min runs into the 21:30 slot, so a party arriving at 21:30 overlaps it
+    capacity = _capacity(time(22, 30), 30, 45, max_covers=10)
+
+    slots = {start: free for start, _, free in compute_slots(capacity, [21 * 60], [8], 2)}
+
+    assert slots[time(20, 30)] == 2
+    assert slots[time(21, 30)] == 2
+    assert slots[time(20)] == 10
+
+
+def _expected(capacity: RestaurantCapacity, starts: list, sizes: list, party_size: int) -> list:
+    opens = capacity.opens_at.hour * 60 + capacity.opens_at.minute
+    closes = capacity.closes_at.hour * 60 + capacity.closes_at.minute
+    slot, turn = capacity.slot_minutes, capacity.turn_minutes
+    expected = []
+    start = opens
+    while start + turn <= closes:
+        # Every slot the stay touches, each counted with every reservation overlapping it
+        covered = range(start, start + turn, slot)
+        seated = max(
+            sum(z for s, z in zip(starts, sizes) if s < q + slot and s + turn > q) for q in covered
+        )
+        arriving = sum(z for s, z in zip(starts, sizes) if start <= s < start + slot)
+        free = max(capacity.max_covers - seated, 0)
+        ok = free >= party_size and party_size <= capacity.max_party_size
+        if capacity.max_arrivals_per_slot is not None:
+            ok = ok and arriving + party_size <= capacity.max_arrivals_per_slot
+        expected.append((time(*divmod(start, 60)), ok, free))
+        start += slot
+    return expected
+
+
+@pytest.mark.parametrize("slot_minutes, turn_minutes", [(15, 90), (15, 100), (30, 45), (40, 45)])
+def test_matches_counting_every_reservation(slot_minutes, turn_minutes):
+    rng = random.Random(slot_minutes * 1000 + turn_minutes)
+    capacity = _capacity(time(23, 50), slot_minutes, turn_minutes, max_arrivals_per_slot=30)
+    for _ in range(50):
+        count = rng.randint(0, 40)
+        # On and off the slot grid, some before opening or after closing
+        starts = [rng.randint(10 * 60, 24 * 60 - 1) for _ in range(count)]
+        sizes = [rng.randint(1, 12) for _ in range(count)]
+        capacity.max_covers = rng.randint(5, 80)
+        party_size = rng.randint(1, 12)
+
+        got = compute_slots(capacity, starts, sizes, party_size)
+
+        assert got == _expected(capacity, starts, sizes, party_size)
@@ -0,0 +1,138 @@
+"""
+Map clusters per zoom level against grouping every point into its cell
+
+At each zoom the tiles must return one cluster per non-empty cell with the
+number of restaurants in it, so the counts over all tiles add up to the
+number of located active restaurants. This has to hold after a rebuild,
+with changes waiting in the overlay and after the overlay is folded in.
+"""
+
+from collections import Counter, defaultdict
+
+import numpy as np
+import pytest
+
+from app.utils import cluster_index as cluster_module
+from app.utils.cluster_index import (
+    CLUSTER_CELL_BITS, CLUSTER_MAX_ZOOM, ClusterIndex, _DEEPEST_GRID, project,
+)
+from app.utils.restaurant_events import RestaurantRecord
+
+CENTRES = [(48.15, 17.11), (48.72, 21.26), (0.0, 0.0), (-33.9, 151.2), (64.1, -21.9)]
+POINTS_PER_CENTRE = 300
+ZOOMS = [0, 1, 2, 4, 7, 10, 13, CLUSTER_MAX_ZOOM, CLUSTER_MAX_ZOOM + 2]
+
+
+def _record(restaurant_id: int, lat, lon, is_active: bool = True) -> RestaurantRecord:
+    return RestaurantRecord(
+        id=restaurant_id, name="", slug="", cuisine="", price_range=1, address="", city="",
+        country="", description=None, latitude=lat, longitude=lon, cover_image=None,
+        rating=None, review_count=0, is_active=is_active,
+    )
+
+
+def _random_points(rng: np.random.Generator, first_id: int, centres=CENTRES) -> dict:
+    points = {}
+    restaurant_id = first_id
+    for lat, lon in centres:
+        # Tight and loose groups, so cells hold one or many restaurants at every zoom
+        for spread in (0.001, 0.05, 2.0):
+            for _ in range(POINTS_PER_CENTRE // 3):
+                points[restaurant_id] = (
+                    float(np.clip(lat + rng.normal(0, spread), -80, 80)),
+                    float((lon + rng.normal(0, spread) + 180.0) % 360.0 - 180.0),
+                )
+                restaurant_id += 1
+    return points
+
+
+def _expected_tiles(points: dict, zoom: int) -> dict:
+    """(tile x, tile y) -> sorted [(count, id when count == 1)] from grouping every point"""
+    ids = np.array(list(points), dtype=np.int64)
+    x, y = project(
+        np.array([p[0] for p in points.values()]), np.array([p[1] for p in points.values()])
+    )
+    col, row = (x * _DEEPEST_GRID).astype(np.int64), (y * _DEEPEST_GRID).astype(np.int64)
+    level_zoom = min(zoom, CLUSTER_MAX_ZOOM)
+    shift = CLUSTER_MAX_ZOOM - level_zoom
+
+    cells = defaultdict(list)
+    for i, c, r in zip(range(len(ids)), (col >> shift).tolist(), (row >> shift).tolist()):
+        cells[c, r].append(i)
+
+    tiles = defaultdict(list)
+    for (c, r), members in cells.items():
+        if zoom <= CLUSTER_MAX_ZOOM:
+            tile = (c >> CLUSTER_CELL_BITS, r >> CLUSTER_CELL_BITS)
+        else:
+            # Deepest cells go to the tile their centroid falls in
+            scale = 1 << zoom
+            tile = (int(x[members].mean() * scale), int(y[members].mean() * scale))
+        tiles[tile].append((len(members), int(ids[members[0]]) if len(members) == 1 else None))
+    return {tile: sorted(clusters, key=repr) for tile, clusters in tiles.items()}
+
+
+def _assert_matches(index: ClusterIndex, points: dict) -> None:
+    for zoom in ZOOMS:
+        expected = _expected_tiles(points, zoom)
+        total = 0
+        for (tx, ty), clusters in expected.items():
+            got = index.tile(zoom, tx, ty)
+            assert sorted(((n, i) for _, _, n, i in got), key=repr) == clusters, (zoom, tx, ty)
+            total += sum(n for _, _, n, _ in got)
+        assert total == len(points), zoom
+
+        if zoom <= 2:
+            # Every tile of the level, including the empty ones
+            side = 1 << zoom
+            counts = [n for tx in range(side) for ty in range(side) for _, _, n, _ in index.tile(zoom, tx, ty)]
+            assert sum(counts) == len(points)
+            assert Counter(counts) == Counter(n for c in expected.values() for n, _ in c)
+
+
+@pytest.fixture
+def points():
+    return _random_points(np.random.default_rng(20), 1)
+
+
+def test_counts_per_zoom_after_rebuild(points):
+    index = ClusterIndex()
+    index.rebuild([_record(i, lat, lon) for i, (lat, lon) in points.items()])
+
+    _assert_matches(index, points)
+    assert index.stats()["points"] == len(points)
+
+
+@pytest.mark.parametrize("overlay_max_changes", [100_000, 50])
+def test_counts_per_zoom_after_changes(points, monkeypatch, overlay_max_changes):
+    # 50 folds the overlay back into the levels several times over
+    monkeypatch.setattr(cluster_module, "CLUSTER_OVERLAY_MAX_CHANGES", overlay_max_changes)
+    rng = np.random.default_rng(overlay_max_changes)
+    index = ClusterIndex()
+    index.rebuild([_record(i, lat, lon) for i, (lat, lon) in points.items()])
+
+    ids = list(points)
+    for _ in range(3):
+        moved = rng.choice(ids, 60, replace=False).tolist()
+        deleted = [i for i in rng.choice(ids, 60, replace=False).tolist() if i not in moved]
+        hidden = [i for i in rng.choice(ids, 30, replace=False).tolist() if i not in moved + deleted]
+        added = _random_points(rng, max(ids) + 1, centres=CENTRES[:2])
+
+        upserts = []
+        for i in moved:
+            lat, lon = points[i]
+            points[i] = (lat + float(rng.normal(0, 0.5)), lon)
+            upserts.append(_record(i, *points[i]))
+        for i in hidden:
+            lat, lon = points.pop(i)
+            upserts.append(_record(i, lat, lon, is_active=False))
+        upserts.append(_record(max(added) + 1, None, None))
+        upserts.extend(_record(i, lat, lon) for i, (lat, lon) in added.items())
+        for i in deleted:
+            points.pop(i, None)
+        points.update(added)
+        ids = list(points)
+
+        index.apply(upserts, deleted)
+
+        _assert_matches(index, points)
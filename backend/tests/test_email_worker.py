@@ -0,0 +1,165 @@
+"""
+Outbox delivery against a real SMTP server
+
+An aiosmtpd server on localhost stands in for the relay. A batch must go
+out over one connection, a connection the server dropped between batches
+must be replaced transparently, and a recipient the server rejects for
+good must fail only its own row.
+"""
+
+import asyncio
+import smtplib
+import socket
+import time
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.db import SessionLocal
+from app.models.email_outbox import EmailOutbox, OutboxStatus
+from app.utils.email_templates import VERIFY_EMAIL_TEMPLATE
+from app.utils.email_worker import SCRUBBED_CONTEXT, SMTPSession, drain_outbox, enqueue_email
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    """Accepts mail for everyone except bounce-* addresses; remembers each delivery's connection"""
+
+    def __init__(self):
+        self.deliveries = []
+        self.drop_after_data = False
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce-"):
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.deliveries.append((session.peer, tuple(envelope.rcpt_tos)))
+        if self.drop_after_data:
+            # Like a relay closing an idle connection once the reply is out
+            asyncio.get_running_loop().call_later(0.05, server.transport.close)
+        return "250 Message accepted"
+
+
+class PlainSMTPService:
+    """EmailService.connect without STARTTLS and LOGIN, which the test server does not offer"""
+
+    from_email = "noreply@example.com"
+
+    def __init__(self, port: int):
+        self.port = port
+        self.connections = 0
+
+    def connect(self) -> smtplib.SMTP:
+        self.connections += 1
+        return smtplib.SMTP("127.0.0.1", self.port)
+
+
+def _free_port() -> int:
+    # The controller probes its port after starting, so it needs a fixed one
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    try:
+        yield handler, controller.port
+    finally:
+        controller.stop()
+
+
+@pytest.fixture
+def outbox(db_engine):
+    """Empty outbox; returns a function queueing emails to the given addresses"""
+    db = SessionLocal()
+    db.execute(delete(EmailOutbox))
+    db.commit()
+    db.close()
+
+    def queue(*addresses: str) -> None:
+        db = SessionLocal()
+        try:
+            for address in addresses:
+                enqueue_email(db, address, VERIFY_EMAIL_TEMPLATE, {"verification_token": "t"})
+            db.commit()
+        finally:
+            db.close()
+
+    return queue
+
+
+def _rows() -> dict:
+    db = SessionLocal()
+    try:
+        return {
+            row.to_email: (row.status, row.attempts, row.context)
+            for row in db.scalars(select(EmailOutbox))
+        }
+    finally:
+        db.close()
+
+
+def test_batch_is_sent_over_one_connection(smtp_server, outbox):
+    handler, port = smtp_server
+    service = PlainSMTPService(port)
+    outbox(*(f"guest-{i}@example.com" for i in range(5)))
+
+    smtp = SMTPSession(service)
+    try:
+        assert drain_outbox(smtp) == {"sent": 5, "retried": 0, "failed": 0}
+    finally:
+        smtp.close()
+
+    assert service.connections == 1
+    assert len({peer for peer, _ in handler.deliveries}) == 1
+    assert {status for status, _, _ in _rows().values()} == {OutboxStatus.SENT}
+
+
+def test_dropped_connection_is_replaced_and_the_email_sent(smtp_server, outbox):
+    handler, port = smtp_server
+    service = PlainSMTPService(port)
+    smtp = SMTPSession(service)
+    try:
+        handler.drop_after_data = True
+        outbox("first@example.com")
+        assert drain_outbox(smtp)["sent"] == 1
+        # The server has closed the connection the session still holds
+        time.sleep(0.3)
+
+        outbox("second@example.com")
+        assert drain_outbox(smtp) == {"sent": 1, "retried": 0, "failed": 0}
+    finally:
+        smtp.close()
+
+    assert service.connections == 2
+    assert [rcpts for _, rcpts in handler.deliveries] == [
+        ("first@example.com",), ("second@example.com",)
+    ]
+    assert _rows()["second@example.com"][:2] == (OutboxStatus.SENT, 1)
+
+
+def test_permanent_rejection_fails_only_that_row(smtp_server, outbox):
+    handler, port = smtp_server
+    service = PlainSMTPService(port)
+    outbox("before@example.com", "bounce-me@example.com", "after@example.com")
+
+    smtp = SMTPSession(service)
+    try:
+        assert drain_outbox(smtp) == {"sent": 2, "retried": 0, "failed": 1}
+    finally:
+        smtp.close()
+
+    # The 550 left the connection usable for the rest of the batch
+    assert service.connections == 1
+    rows = _rows()
+    assert rows["bounce-me@example.com"] == (OutboxStatus.FAILED, 1, SCRUBBED_CONTEXT)
+    assert rows["before@example.com"][0] == OutboxStatus.SENT
+    assert rows["after@example.com"][0] == OutboxStatus.SENT
@@ -0,0 +1,76 @@
+"""
+Geo index queries against a brute-force haversine scan
+
+Points cluster around centres at several latitudes, including near a pole
+and across the antimeridian, where the bounding box around a radius has to
+widen in longitude the most.
+"""
+
+import numpy as np
+import pytest
+
+from app.utils.geo_index import GeoIndex, haversine_m
+from app.utils.restaurant_events import RestaurantRecord
+
+POINTS_PER_CENTRE = 2_000
+CENTRES = [(48.15, 17.11), (0.0, 0.0), (-33.9, 151.2), (64.1, -21.9), (78.2, 15.6), (-52.0, 179.9)]
+RADII_M = [500.0, 5_000.0, 50_000.0, 400_000.0, 1_500_000.0]
+
+
+def _record(restaurant_id: int, lat: float, lon: float) -> RestaurantRecord:
+    return RestaurantRecord(
+        id=restaurant_id, name="", slug="", cuisine="", price_range=1, address="", city="",
+        country="", description=None, latitude=lat, longitude=lon, cover_image=None,
+        rating=None, review_count=0, is_active=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(19)
+    lats, lons = [], []
+    for lat, lon in CENTRES:
+        lats.append(np.clip(lat + rng.normal(0, 3.0, POINTS_PER_CENTRE), -89.9, 89.9))
+        lons.append((lon + rng.normal(0, 6.0, POINTS_PER_CENTRE) + 180.0) % 360.0 - 180.0)
+    lats, lons = np.concatenate(lats), np.concatenate(lons)
+    return np.arange(1, len(lats) + 1, dtype=np.int64), lats, lons
+
+
+@pytest.fixture(scope="module")
+def index(points):
+    ids, lats, lons = points
+    geo = GeoIndex()
+    # Half in the sorted base, half in the delta buffer
+    half = len(ids) // 2
+    geo.rebuild([_record(*p) for p in zip(ids[:half].tolist(), lats[:half].tolist(), lons[:half].tolist())])
+    geo.apply([_record(*p) for p in zip(ids[half:].tolist(), lats[half:].tolist(), lons[half:].tolist())], [])
+    return geo
+
+
+def _queries():
+    # Each centre plus a point offset poleward, where a too narrow box shows first
+    for lat, lon in CENTRES:
+        yield lat, lon
+        yield lat + (4.0 if lat >= 0 else -4.0), lon
+
+
+@pytest.mark.parametrize("radius_m", RADII_M)
+def test_radius_matches_brute_force(index, points, radius_m):
+    ids, lats, lons = points
+    for lat, lon in _queries():
+        expected = set(ids[haversine_m(lat, lon, lats, lons) <= radius_m].tolist())
+        found, distances = index.radius(lat, lon, radius_m)
+        assert set(found.tolist()) == expected, (lat, lon, radius_m)
+        assert np.all(np.diff(distances) >= 0)
+
+
+@pytest.mark.parametrize("k", [1, 10, 250])
+def test_nearest_matches_brute_force(index, points, k):
+    ids, lats, lons = points
+    for lat, lon in _queries():
+        distances = haversine_m(lat, lon, lats, lons)
+        expected = np.sort(distances)[:k]
+        found, found_distances = index.nearest(lat, lon, k)
+        assert len(found) == k
+        np.testing.assert_allclose(found_distances, expected)
+        np.testing.assert_allclose(haversine_m(lat, lon, lats[found - 1], lons[found - 1]), found_distances)
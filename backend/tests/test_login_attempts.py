@@ -0,0 +1,46 @@
+"""Expiry and purging of the failed-login counters"""
+
+import time
+
+import pytest
+
+from app.utils import login_attempts as attempts_module
+from app.utils.login_attempts import InMemoryAttemptCounter, SQLiteAttemptCounter
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def counter(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryAttemptCounter(window_seconds=1)
+    return SQLiteAttemptCounter(window_seconds=1, path=str(tmp_path / "attempts.db"))
+
+
+def test_counts_within_the_window_and_forgets_after_it(counter):
+    assert [counter.increment("ip:1") for _ in range(3)] == [1, 2, 3]
+    assert counter.get("ip:1") == 3
+
+    time.sleep(1.05)
+    assert counter.get("ip:1") == 0
+    assert counter.increment("ip:1") == 1
+
+
+def test_idle_memory_counters_are_purged_by_any_later_call():
+    counter = InMemoryAttemptCounter(window_seconds=1)
+    for i in range(1000):
+        counter.increment(f"ip:{i}")
+
+    time.sleep(1.05)
+    counter.get("ip:other")
+    assert len(counter.counters) == 0
+
+
+def test_sqlite_purges_expired_rows_on_a_timer(tmp_path, monkeypatch):
+    monkeypatch.setattr(attempts_module, "PURGE_INTERVAL_SECONDS", 0)
+    counter = SQLiteAttemptCounter(window_seconds=1, path=str(tmp_path / "attempts.db"))
+    for i in range(50):
+        counter.increment(f"ip:{i}")
+
+    time.sleep(1.05)
+    counter.get("ip:other")
+    (rows,) = counter._connect().execute("SELECT COUNT(*) FROM login_attempts").fetchone()
+    assert rows == 0
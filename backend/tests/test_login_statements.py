@@ -0,0 +1,98 @@
+"""
+SQL statements and commits per successful login
+
+Guards the single-transaction login path: one SELECT of the user, one
+INSERT of the refresh token and a single commit, plus the conditional
+UPDATE only when there is a stale lock to clear.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import email_validator
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, update
+
+import app.schemas.user_schema as user_schema
+from app.db import SessionLocal
+from app.models.user import User
+from app.utils.password_hasher import password_hasher
+
+PASSWORD = "Passw0rdX"
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.commits = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split(None, 1)[0].upper())
+
+    def _on_commit(self, conn):
+        self.commits += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        event.listen(self.engine, "commit", self._on_commit)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        event.remove(self.engine, "commit", self._on_commit)
+
+    @property
+    def round_trips(self) -> int:
+        return len(self.statements) + self.commits
+
+
+@pytest.fixture
+def client(db_engine, monkeypatch):
+    # No DNS lookups for the deliverability check
+    monkeypatch.setattr(
+        user_schema,
+        "validate_email",
+        lambda value, **kwargs: email_validator.validate_email(value, check_deliverability=False),
+    )
+    from main import API
+
+    with TestClient(API) as client:
+        yield client
+
+
+def _login(client, db_engine, email: str) -> StatementCounter:
+    with StatementCounter(db_engine) as counter:
+        response = client.post(
+            "/authentication/login", json={"user_email": email, "user_password": PASSWORD}
+        )
+    assert response.status_code == 200, response.text
+    return counter
+
+
+def test_login_is_one_select_one_insert_and_one_commit(client, db_engine, make_user):
+    _, email = make_user(password_hasher.context.hash(PASSWORD))
+
+    counter = _login(client, db_engine, email)
+
+    assert counter.statements == ["SELECT", "INSERT"]
+    assert counter.commits == 1
+    assert counter.round_trips == 3
+
+
+def test_login_clears_a_stale_lock_in_the_same_commit(client, db_engine, make_user):
+    user_id, email = make_user(password_hasher.context.hash(PASSWORD))
+    db = SessionLocal()
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(locked_until=datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=1))
+    )
+    db.commit()
+    db.close()
+
+    counter = _login(client, db_engine, email)
+
+    assert counter.statements == ["SELECT", "UPDATE", "INSERT"]
+    assert counter.commits == 1
+    assert counter.round_trips == 4
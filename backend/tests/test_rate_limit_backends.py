@@ -0,0 +1,86 @@
+"""
+Shared rate limiter backends under several worker processes
+
+PROCESSES processes, standing in for uvicorn workers, hit one key at the
+same time through their own backend instance on the same file. Every
+increment must land: exactly max_requests checks are allowed in total,
+however they interleave.
+"""
+
+import multiprocessing
+
+import pytest
+
+from app.utils.rate_limit_backends import SharedMemoryRateLimiter, SQLiteRateLimiter
+
+PROCESSES = 4
+CHECKS_PER_PROCESS = 5000
+# Long enough that the window does not roll during the test
+WINDOW_SECONDS = 86400
+
+
+def _open_backend(kind: str, path: str):
+    if kind == "shm":
+        return SharedMemoryRateLimiter(path, slots=1024)
+    return SQLiteRateLimiter(path)
+
+
+def _hammer(kind: str, path: str, key: str, max_requests: int, barrier, results) -> None:
+    # Opened in the child: connections and locks must not cross the fork
+    backend = _open_backend(kind, path)
+    barrier.wait()
+    results.put(sum(
+        not backend.check(key, max_requests, WINDOW_SECONDS).limited
+        for _ in range(CHECKS_PER_PROCESS)
+    ))
+
+
+def _run_processes(kind: str, path: str, key: str, max_requests: int) -> list:
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(PROCESSES)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_hammer, args=(kind, path, key, max_requests, barrier, results))
+        for _ in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    outcome = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(timeout=10)
+        assert process.exitcode == 0
+    return outcome
+
+
+@pytest.mark.parametrize("kind", ["shm", "sqlite"])
+@pytest.mark.parametrize("attempts_per_limit", [1, 2])
+def test_processes_share_one_limit(kind, attempts_per_limit, tmp_dir):
+    # With twice the attempts the limit is hit; with as many it is exactly used up
+    checks = PROCESSES * CHECKS_PER_PROCESS
+    max_requests = checks // attempts_per_limit
+    path = f"{tmp_dir}/rate_limits_{attempts_per_limit}.{kind}"
+    # Creates the file (and the SQLite table) before the workers race for it
+    _open_backend(kind, path)
+
+    outcome = _run_processes(kind, path, "/authentication/login|10.0.0.1", max_requests)
+
+    assert len(outcome) == PROCESSES
+    assert sum(outcome) == max_requests
+
+
+def test_sqlite_purges_expired_rows_on_elapsed_time(tmp_dir, monkeypatch):
+    backend = SQLiteRateLimiter(f"{tmp_dir}/purge.sqlite", purge_interval_seconds=60)
+    now = 1_000_000.0
+    monkeypatch.setattr("app.utils.rate_limit_backends.time.time", lambda: now)
+    backend.check("stale", 10, window_seconds=1)
+    assert backend._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone() == (1,)
+
+    # Expired, but the interval has not passed yet
+    now += 30
+    backend.check("fresh", 10, window_seconds=1)
+    assert backend._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone() == (2,)
+
+    # The first check after the interval deletes them, however few checks came before it
+    now += 31
+    backend.check("fresh", 10, window_seconds=1)
+    assert backend._connect().execute("SELECT key FROM rate_limits").fetchall() == [("fresh|1",)]
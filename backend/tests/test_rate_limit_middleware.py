@@ -0,0 +1,115 @@
+"""
+RateLimitMiddleware on raw ASGI requests
+
+Policies are keyed by the route path without root_path, so a request is
+limited the same whether the proxy in front keeps the /api prefix in the
+path or strips it. A limited request is answered with 429 and Retry-After
+by the middleware; the application never sees it.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import app.utils.rate_limit_middleware as rate_limit_middleware
+from app.utils.rate_limit_middleware import AUTH_POLICY, RateLimitMiddleware
+from app.utils.rate_limiter import RateLimiter
+
+
+class App:
+    """ASGI app answering 200 and counting the requests that reach it"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+
+def _request(middleware, path: str, root_path: str, body: dict = None, client_ip: str = "10.0.0.1"):
+    """Run one POST through the middleware; returns (status, headers)"""
+    raw = json.dumps(body or {}).encode()
+    scope = {
+        "type": "http", "method": "POST", "path": path, "root_path": root_path,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(raw)).encode())],
+        "client": (client_ip, 50000),
+    }
+    messages = [{"type": "http.request", "body": raw, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = sent[0]
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}
+
+
+@pytest.fixture
+def app_and_middleware():
+    app = App()
+    return app, RateLimitMiddleware(app, limiter=RateLimiter())
+
+
+@pytest.mark.parametrize(
+    "path, root_path",
+    [
+        ("/api/authentication/login", "/api"),
+        ("/authentication/login", "/api"),
+        ("/authentication/login", ""),
+    ],
+)
+def test_login_is_limited_with_retry_after(app_and_middleware, path, root_path):
+    app, middleware = app_and_middleware
+
+    statuses = [_request(middleware, path, root_path)[0] for _ in range(AUTH_POLICY.max_requests)]
+    status, headers = _request(middleware, path, root_path)
+
+    assert statuses == [200] * AUTH_POLICY.max_requests
+    assert status == 429
+    assert 0 < int(headers["retry-after"]) <= AUTH_POLICY.window_seconds
+    assert headers["x-ratelimit-remaining"] == "0"
+    assert app.calls == AUTH_POLICY.max_requests
+
+
+def test_allowed_responses_carry_the_remaining_budget(app_and_middleware):
+    _, middleware = app_and_middleware
+
+    status, headers = _request(middleware, "/api/authentication/login", "/api")
+
+    assert status == 200
+    assert headers["x-ratelimit-limit"] == str(AUTH_POLICY.max_requests)
+    assert headers["x-ratelimit-remaining"] == str(AUTH_POLICY.max_requests - 1)
+    assert "retry-after" not in headers
+
+
+def test_unlisted_routes_pass_through(app_and_middleware):
+    app, middleware = app_and_middleware
+
+    statuses = {_request(middleware, "/api/restaurants", "/api")[0] for _ in range(20)}
+
+    assert statuses == {200}
+    assert app.calls == 20
+
+
+def test_forgot_password_counts_per_email_across_ips(app_and_middleware, monkeypatch):
+    monkeypatch.setattr(rate_limit_middleware, "RATE_LIMIT_BY_EMAIL", True)
+    app, middleware = app_and_middleware
+    body = {"user_email": "Victim@Example.com"}
+
+    statuses = [
+        _request(middleware, "/api/authentication/forgot-password", "/api", body, f"10.0.1.{i}")[0]
+        for i in range(4)
+    ]
+
+    assert statuses == [200, 200, 200, 429]
+    # The body was replayed to the application
+    assert app.calls == 3
@@ -0,0 +1,88 @@
+"""
+Concurrent refreshes of one refresh token
+
+N threads, each with its own session, present the same token at the same
+moment. The conditional revoke must let exactly one of them rotate it.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.db import SessionLocal
+from app.models.refresh_token import RefreshToken, TokenStatus
+from app.utils.jwt_utils import issue_refresh_token, rotate_refresh_token
+from app.utils.refresh_grace import refresh_grace_cache
+
+PARALLEL_REFRESHES = 8
+
+
+def _issue_token(user_id: int) -> str:
+    db = SessionLocal()
+    try:
+        token = issue_refresh_token(user_id, db)
+        db.commit()
+        return token
+    finally:
+        db.close()
+
+
+def _refresh_in_parallel(token: str) -> list:
+    barrier = threading.Barrier(PARALLEL_REFRESHES)
+
+    def refresh(_):
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            return rotate_refresh_token(token, db)
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(PARALLEL_REFRESHES) as pool:
+        return list(pool.map(refresh, range(PARALLEL_REFRESHES)))
+
+
+def _token_counts(user_id: int) -> tuple:
+    db = SessionLocal()
+    try:
+        total = db.scalar(select(func.count()).where(RefreshToken.user_id == user_id))
+        active = db.scalar(
+            select(func.count()).where(
+                RefreshToken.user_id == user_id, RefreshToken.status == TokenStatus.ACTIVE
+            )
+        )
+        return total, active
+    finally:
+        db.close()
+
+
+def test_exactly_one_parallel_refresh_wins(make_user, monkeypatch):
+    monkeypatch.setattr(refresh_grace_cache, "grace_seconds", 0)
+    user_id, _ = make_user()
+    token = _issue_token(user_id)
+
+    results = _refresh_in_parallel(token)
+
+    winners = [r for r in results if isinstance(r, dict)]
+    assert len(winners) == 1
+    assert sorted(r for r in results if not isinstance(r, dict)) == [401] * (PARALLEL_REFRESHES - 1)
+    # The original token plus the single rotated one, and only the new one is active
+    assert _token_counts(user_id) == (2, 1)
+
+
+def test_parallel_refreshes_within_grace_share_one_rotation(make_user):
+    if refresh_grace_cache.grace_seconds <= 0:
+        pytest.skip("REFRESH_GRACE_SECONDS is 0")
+    user_id, _ = make_user()
+    token = _issue_token(user_id)
+
+    results = _refresh_in_parallel(token)
+
+    assert all(isinstance(r, dict) for r in results)
+    assert len({r["refresh_token"] for r in results}) == 1
+    assert _token_counts(user_id) == (2, 1)
@@ -0,0 +1,104 @@
+"""
+Browsing restaurants from the in-memory catalog
+
+Each test works in a city of its own, since the database is shared by the
+whole session. The catalog is filled by the change feed.
+"""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import SessionLocal
+from app.models.restaurant import Restaurant
+from app.utils.restaurant_events import apply_queued_changes
+
+
+@pytest.fixture
+def client(db_engine):
+    from main import API
+
+    with TestClient(API) as client:
+        yield client
+
+
+@pytest.fixture
+def city() -> str:
+    return f"Browse {uuid.uuid4().hex[:8]}"
+
+
+def _add_restaurants(owner_id: int, city: str, names_and_ratings) -> list:
+    db = SessionLocal()
+    try:
+        restaurants = [
+            Restaurant(
+                owner_id=owner_id, name=name, slug=f"browse-{uuid.uuid4().hex[:12]}",
+                cuisine="italian", price_range=2, address="Main 1", city=city,
+                country="Slovakia", rating=rating,
+            )
+            for name, rating in names_and_ratings
+        ]
+        db.add_all(restaurants)
+        db.commit()
+        return [r.id for r in restaurants]
+    finally:
+        db.close()
+
+
+def _browse(client, city: str, sort: str) -> list:
+    response = client.get("/restaurants/browse", params={"city": city, "sort": sort, "limit": 100})
+    assert response.status_code == 200, response.text
+    return response.json()["items"]
+
+
+def test_name_order_ignores_case_and_accents(client, make_user, city):
+    owner_id, _ = make_user()
+    _add_restaurants(owner_id, city, [("Gamma", None), ("beta", None), ("Épice", None), ("Alpha", None)])
+    apply_queued_changes()
+
+    # Byte order would put "Gamma" before "beta" and "Épice" last
+    assert [r["name"] for r in _browse(client, city, "name")] == ["Alpha", "beta", "Épice", "Gamma"]
+
+
+def _keyset_ids(client, city: str, sort: str) -> list:
+    """Every page of GET /restaurants, following next_cursor"""
+    ids, cursor = [], None
+    while True:
+        params = {"city": city, "sort": sort, "limit": 7}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/restaurants", params=params).json()
+        ids += [r["id"] for r in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort", ["rating", "name"])
+def test_browse_matches_keyset_pages_after_changes(client, make_user, city, sort):
+    owner_id, _ = make_user()
+    # Lowercase ASCII names order the same under every collation; ratings repeat and go missing
+    ratings = [4.5, None, 3.25, 4.5, 5.0, None, 2.0, 3.25]
+    ids = _add_restaurants(
+        owner_id, city, [(f"place {chr(97 + i % 5)}", ratings[i % len(ratings)]) for i in range(30)]
+    )
+
+    db = SessionLocal()
+    try:
+        for restaurant_id in ids[:6]:
+            restaurant = db.get(Restaurant, restaurant_id)
+            restaurant.name = f"renamed {restaurant_id % 3}"
+            restaurant.rating = 4.75
+        for restaurant_id in ids[6:10]:
+            db.get(Restaurant, restaurant_id).is_active = False
+        db.delete(db.get(Restaurant, ids[10]))
+        db.commit()
+    finally:
+        db.close()
+    _add_restaurants(owner_id, city, [("added", 3.0), ("another", None)])
+    apply_queued_changes()
+
+    expected = _keyset_ids(client, city, sort)
+    assert len(expected) == 30 - 4 - 1 + 2
+    assert [r["id"] for r in _browse(client, city, sort)] == expected
@@ -0,0 +1,134 @@
+"""
+Restaurant change feed: rebuilds, polls and publishes
+
+A rebuild scans the table and then replaces each index. Changes published
+in between must survive it, and rows written without the ORM must reach
+the indexes through the poll.
+"""
+
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import insert
+
+from app.db import SessionLocal
+from app.models.restaurant import Restaurant
+from app.utils import restaurant_events
+from app.utils.restaurant_events import RestaurantIndex, RestaurantRecord
+
+
+class RecordingIndex(RestaurantIndex):
+    """Active restaurants by id; rebuild can be held after the scan"""
+
+    def __init__(self):
+        self.records = {}
+        self.scanned = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def rebuild(self, records):
+        self.scanned.set()
+        self.release.wait(timeout=10)
+        self.records = {r.id: r for r in records}
+
+    def apply(self, upserts, deleted_ids):
+        for restaurant_id in deleted_ids:
+            self.records.pop(restaurant_id, None)
+        for record in upserts:
+            if record.is_active:
+                self.records[record.id] = record
+            else:
+                self.records.pop(record.id, None)
+
+
+@pytest.fixture
+def index(db_engine, monkeypatch):
+    index = RecordingIndex()
+    monkeypatch.setattr(restaurant_events, "_indexes", [index])
+    # Commits of earlier tests
+    restaurant_events.apply_queued_changes()
+    restaurant_events.rebuild_indexes()
+    # Rows they wrote within the watermark overlap are read once more by the first poll
+    restaurant_events.poll_changes()
+    return index
+
+
+def _insert_restaurant(owner_id: int, name: str) -> int:
+    """Plain INSERT, bypassing the ORM events like a write from another worker"""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            insert(Restaurant).values(
+                owner_id=owner_id, name=name, slug=f"{name}-{uuid.uuid4().hex[:8]}",
+                cuisine="italian", price_range=2, address="Main 1", city="Bratislava",
+                country="Slovakia", review_count=0, is_active=True,
+                created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            )
+        )
+        db.commit()
+        return result.inserted_primary_key[0]
+    finally:
+        db.close()
+
+
+def _record(restaurant_id: int, name: str) -> RestaurantRecord:
+    return RestaurantRecord(
+        id=restaurant_id, name=name, slug=name, cuisine="italian", price_range=2,
+        address="Main 1", city="Bratislava", country="Slovakia", description=None,
+        latitude=None, longitude=None, cover_image=None, rating=None, review_count=0,
+        is_active=True,
+    )
+
+
+def test_changes_published_during_a_rebuild_survive_it(index):
+    index.release.clear()
+    index.scanned.clear()
+    rebuild = threading.Thread(target=restaurant_events.rebuild_indexes)
+    rebuild.start()
+    assert index.scanned.wait(timeout=10)
+
+    # Committed after the scan; the rebuild is about to replace the index with older data
+    restaurant_events.publish([_record(10_000_001, "published-during-rebuild")], [])
+    index.release.set()
+    rebuild.join(timeout=10)
+
+    assert index.records[10_000_001].name == "published-during-rebuild"
+
+
+def test_poll_publishes_rows_written_by_other_workers_once(index, make_user):
+    owner_id, _ = make_user()
+    restaurant_id = _insert_restaurant(owner_id, "polled")
+    assert restaurant_id not in index.records
+
+    assert restaurant_events.poll_changes() == 1
+    assert index.records[restaurant_id].name == "polled"
+    # The overlap reads the row again, but it has not changed
+    assert restaurant_events.poll_changes() == 0
+
+
+def test_commits_are_queued_and_applied_outside_the_request(index, make_user):
+    owner_id, _ = make_user()
+    db = SessionLocal()
+    try:
+        restaurant = Restaurant(
+            owner_id=owner_id, name="queued", slug=f"queued-{uuid.uuid4().hex[:8]}",
+            cuisine="italian", price_range=2, address="Main 1", city="Bratislava",
+            country="Slovakia",
+        )
+        db.add(restaurant)
+        db.commit()
+        restaurant.name = "queued-renamed"
+        db.commit()
+        restaurant_id = restaurant.id
+    finally:
+        db.close()
+
+    # The commits left the index alone
+    assert restaurant_id not in index.records
+
+    # Both commits of the restaurant collapse into its latest state
+    assert restaurant_events.apply_queued_changes() == 1
+    assert index.records[restaurant_id].name == "queued-renamed"
+    assert restaurant_events.apply_queued_changes() == 0
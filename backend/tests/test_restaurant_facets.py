@@ -0,0 +1,126 @@
+"""
+Facet counts against a SQL GROUP BY after inserts, updates and deletes
+
+Each test uses cities and cuisines of its own and selects all of them, since
+the database is shared by the whole session: every facet then only counts
+rows written here. The first request fills the facet cache, so the second
+one also checks that committed changes drop it.
+"""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.db import SessionLocal
+from app.models.restaurant import Restaurant
+from app.utils.restaurant_events import apply_queued_changes
+
+
+@pytest.fixture
+def client(db_engine):
+    from main import API
+
+    with TestClient(API) as client:
+        yield client
+
+
+@pytest.fixture
+def names():
+    tag = uuid.uuid4().hex[:8]
+    return [f"Facet {tag} {i}" for i in range(3)], [f"facet-{tag}-{i}" for i in range(3)]
+
+
+def _add_restaurants(owner_id: int, rows) -> list:
+    db = SessionLocal()
+    try:
+        restaurants = [
+            Restaurant(
+                owner_id=owner_id, name="Facet", slug=f"facet-{uuid.uuid4().hex[:12]}",
+                cuisine=cuisine, price_range=price_range, address="Main 1", city=city,
+                country="Slovakia",
+            )
+            for city, cuisine, price_range in rows
+        ]
+        db.add_all(restaurants)
+        db.commit()
+        return [r.id for r in restaurants]
+    finally:
+        db.close()
+
+
+def _expected(cuisines: list, selected_cities: list) -> dict:
+    """The facets of the selection computed with one GROUP BY per facet"""
+    db = SessionLocal()
+    try:
+        def group_by(column, *conditions):
+            rows = db.execute(
+                select(column, func.count())
+                .where(Restaurant.is_active.is_(True), *conditions)
+                .group_by(column)
+            ).all()
+            return sorted(([value, count] for value, count in rows), key=lambda r: (-r[1], str(r[0])))
+
+        in_city = Restaurant.city.in_(selected_cities)
+        in_cuisine = Restaurant.cuisine.in_(cuisines)
+        return {
+            "total": db.scalar(
+                select(func.count()).where(Restaurant.is_active.is_(True), in_city, in_cuisine)
+            ),
+            # Each facet ignores its own selection
+            "cuisine": group_by(Restaurant.cuisine, in_city),
+            "price_range": group_by(Restaurant.price_range, in_city, in_cuisine),
+            "city": group_by(Restaurant.city, in_cuisine),
+        }
+    finally:
+        db.close()
+
+
+def _facets(client, cities: list, cuisines: list) -> dict:
+    response = client.get("/restaurants/facets", params={"city": cities, "cuisine": cuisines})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    # Selected values are listed with 0; GROUP BY has no row for them
+    return {
+        "total": body["total"],
+        **{
+            facet: [[v["value"], v["count"]] for v in body[facet] if v["count"]]
+            for facet in ("cuisine", "price_range", "city")
+        },
+    }
+
+
+@pytest.mark.parametrize("selected", [slice(None), slice(1, 2)])
+def test_facets_match_group_by_after_changes(client, make_user, names, selected):
+    owner_id, _ = make_user()
+    cities, cuisines = names
+    ids = _add_restaurants(
+        owner_id,
+        [(cities[i % 3], cuisines[i * 7 % 3], 1 + i * 5 % 4) for i in range(40)],
+    )
+    apply_queued_changes()
+    selected_cities = cities[selected]
+    assert _facets(client, selected_cities, cuisines) == _expected(cuisines, selected_cities)
+
+    db = SessionLocal()
+    try:
+        # Moves between cities, cuisines and price ranges
+        for restaurant_id in ids[:8]:
+            restaurant = db.get(Restaurant, restaurant_id)
+            restaurant.city = cities[1]
+            restaurant.cuisine = cuisines[restaurant_id % 3]
+            restaurant.price_range = 4
+        for restaurant_id in ids[8:13]:
+            db.get(Restaurant, restaurant_id).is_active = False
+        for restaurant_id in ids[13:16]:
+            db.delete(db.get(Restaurant, restaurant_id))
+        db.commit()
+    finally:
+        db.close()
+    _add_restaurants(owner_id, [(cities[1], cuisines[0], 3), (cities[2], cuisines[2], 1)])
+    apply_queued_changes()
+
+    got = _facets(client, selected_cities, cuisines)
+    assert got == _expected(cuisines, selected_cities)
+    assert got["total"] > 0
@@ -0,0 +1,53 @@
+"""
+Token versions bumped by other workers
+
+Each refresh after the first must read only the users bumped since the
+previous one, not every user with a version.
+"""
+
+from app.db import SessionLocal
+from app.models.user import User
+from app.utils import token_versions as token_versions_module
+from app.utils.token_versions import TokenVersionMap, bump_token_version
+
+
+def _bump(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        version = bump_token_version(db.get(User, user_id))
+        db.commit()
+        return version
+    finally:
+        db.close()
+
+
+def test_refresh_reads_only_versions_bumped_since_the_last_one(make_user, monkeypatch):
+    monkeypatch.setattr(token_versions_module, "TOKEN_VERSION_WATERMARK_OVERLAP_SECONDS", 0)
+    first_id, first_email = make_user()
+    second_id, second_email = make_user()
+    _bump(first_id)
+    versions = TokenVersionMap()
+
+    assert versions.refresh_from_db() >= 1
+    assert versions.get(first_email) == 1
+    assert versions.refresh_from_db() == 0
+
+    assert _bump(second_id) == 1
+    assert _bump(first_id) == 2
+    assert versions.refresh_from_db() == 2
+    assert versions.get(first_email) == 2
+    assert versions.get(second_email) == 1
+    assert not versions.is_current(first_email, 1)
+
+
+def test_overlap_reads_recent_bumps_again_without_moving_versions_back(make_user):
+    user_id, user_email = make_user()
+    versions = TokenVersionMap()
+    versions.refresh_from_db()
+
+    _bump(user_id)
+    _bump(user_id)
+    assert versions.refresh_from_db() >= 1
+    # Inside the overlap, so read again; observe() keeps the newest version
+    assert versions.refresh_from_db() >= 1
+    assert versions.get(user_email) == 2